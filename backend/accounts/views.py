@@ -13,6 +13,12 @@ from .serializers import (
     UserUpdateSerializer
 )
 
+try:
+    from courses.scoping import visible_students
+except ImportError:
+    def visible_students(teacher):
+        return User.objects.filter(role='student')
+
 
 def get_tokens_for_user(user):
     """为用户生成JWT tokens"""
@@ -178,8 +184,8 @@ def get_students(request):
         }, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        # 获取所有学生
-        students = User.objects.filter(role='student').values('id', 'real_name', 'username')
+        # 获取所教课程的学生（没有课程时为全部学生）
+        students = visible_students(request.user).values('id', 'real_name', 'username')
         
         return Response({
             'code': 200,
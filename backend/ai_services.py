@@ -1,12 +1,12 @@
 """
 AI服务模块 - 封装Google Gemini API调用
-支持文本对话、系统提示词、流式响应和图片输入
+支持文本对话、系统提示词、流式响应和图片输入，并提供基于 generate_content_async 的异步接口
 """
 
 import os
 import base64
 import logging
-from typing import List, Dict, Any, Optional, Union, Generator
+from typing import List, Dict, Any, Optional, Union, Generator, Tuple
 from io import BytesIO
 from PIL import Image
 
@@ -86,6 +86,45 @@ class GeminiAIService:
             logger.error(f"图片数据准备失败: {e}")
             raise ValueError(f"图片数据处理错误: {e}")
     
+    def _prepare_request(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        images: Optional[List[Union[str, bytes, Image.Image]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Tuple[Any, List[Any], Dict[str, Any]]:
+        """
+        准备一次生成调用所需的模型实例、内容和生成配置
+        
+        Returns:
+            (模型实例, 内容列表, 生成配置)
+        """
+        # 创建模型实例
+        model = genai.GenerativeModel(
+            model_name=self.model_name,
+            safety_settings=self.safety_settings,
+            system_instruction=system_prompt
+        )
+        
+        # 准备生成配置
+        config = self.generation_config.copy()
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens is not None:
+            config["max_output_tokens"] = max_tokens
+        
+        # 准备内容
+        content = [prompt]
+        
+        # 添加图片（如果有）
+        if images:
+            for image in images:
+                image_part = self._prepare_image(image)
+                content.append(image_part)
+        
+        return model, content, config
+    
     def generate_text(
         self,
         prompt: str,
@@ -108,29 +147,10 @@ class GeminiAIService:
             生成的文本响应
         """
         try:
-            # 创建模型实例
-            model = genai.GenerativeModel(
-                model_name=self.model_name,
-                safety_settings=self.safety_settings,
-                system_instruction=system_prompt
+            model, content, config = self._prepare_request(
+                prompt, system_prompt, images, temperature, max_tokens
             )
             
-            # 准备生成配置
-            config = self.generation_config.copy()
-            if temperature is not None:
-                config["temperature"] = temperature
-            if max_tokens is not None:
-                config["max_output_tokens"] = max_tokens
-            
-            # 准备内容
-            content = [prompt]
-            
-            # 添加图片（如果有）
-            if images:
-                for image in images:
-                    image_part = self._prepare_image(image)
-                    content.append(image_part)
-            
             # 生成响应
             response = model.generate_content(
                 content,
@@ -147,6 +167,44 @@ class GeminiAIService:
             logger.error(f"文本生成失败: {e}")
             raise Exception(f"AI服务调用失败: {e}")
     
+    async def generate_text_async(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        images: Optional[List[Union[str, bytes, Image.Image]]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        异步生成文本响应（非流式）
+        
+        与 generate_text 参数一致，但基于 generate_content_async 实现，
+        等待模型响应期间不占用线程，供ASGI异步视图使用。
+        
+        Returns:
+            生成的文本响应
+        """
+        try:
+            model, content, config = self._prepare_request(
+                prompt, system_prompt, images, temperature, max_tokens
+            )
+            
+            # 异步生成响应
+            response = await model.generate_content_async(
+                content,
+                generation_config=config
+            )
+            
+            if response.text:
+                return response.text
+            else:
+                logger.warning("API返回空响应")
+                return "抱歉，我无法生成响应。"
+                
+        except Exception as e:
+            logger.error(f"异步文本生成失败: {e}")
+            raise Exception(f"AI服务调用失败: {e}")
+    
     def generate_text_stream(
         self,
         prompt: str,
@@ -169,29 +227,10 @@ class GeminiAIService:
             逐步生成的文本片段
         """
         try:
-            # 创建模型实例
-            model = genai.GenerativeModel(
-                model_name=self.model_name,
-                safety_settings=self.safety_settings,
-                system_instruction=system_prompt
+            model, content, config = self._prepare_request(
+                prompt, system_prompt, images, temperature, max_tokens
             )
             
-            # 准备生成配置
-            config = self.generation_config.copy()
-            if temperature is not None:
-                config["temperature"] = temperature
-            if max_tokens is not None:
-                config["max_output_tokens"] = max_tokens
-            
-            # 准备内容
-            content = [prompt]
-            
-            # 添加图片（如果有）
-            if images:
-                for image in images:
-                    image_part = self._prepare_image(image)
-                    content.append(image_part)
-            
             # 生成流式响应
             response = model.generate_content(
                 content,
@@ -310,3 +349,33 @@ def ask_gemini(
             images=images,
             **kwargs
         )
+
+
+
+async def ask_gemini_async(
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    images: Optional[List[Union[str, bytes, Image.Image]]] = None,
+    **kwargs
+) -> str:
+    """
+    便捷的Gemini异步调用函数
+    
+    Args:
+        prompt: 用户提示词
+        system_prompt: 系统提示词
+        images: 图片列表
+        **kwargs: 其他参数（temperature, max_tokens等）
+        
+    Returns:
+        文本响应
+    """
+    if not gemini_service:
+        raise Exception("Gemini服务未正确初始化")
+    
+    return await gemini_service.generate_text_async(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        images=images,
+        **kwargs
+    )
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     "qa",
     "reports",
     "chat",
+    "courses",
 ]
 
 MIDDLEWARE = [
@@ -213,3 +214,103 @@ SPECTACULAR_SETTINGS = {
 
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
+
+# Realtime event broker (chat push events)
+# 单进程部署使用进程内实现；多工作进程部署时改为 realtime.CacheEventBroker 并配置共享缓存（如Redis）
+REALTIME_BROKER = {
+    'BACKEND': 'realtime.InProcessEventBroker',
+    'OPTIONS': {},
+}
+
+# Learning report background generation
+# MAX_WORKERS: 同时生成的报告数；EAGER: 在请求线程中同步执行（调试用）；
+# STALE_AFTER: generating 状态超过该秒数视为任务丢失并标记为失败
+REPORT_TASKS = {
+    'MAX_WORKERS': 2,
+    'EAGER': False,
+    'STALE_AFTER': 600,
+}
+
+# 报告统计使用学生每日学习汇总表（StudentDailyStats），按天累加而不扫描原始记录
+# 汇总表由信号实时维护，可用 python manage.py rebuild_daily_stats 重建
+REPORT_DAILY_ROLLUP = True
+
+# 学习数据未变化时复用该时间范围内（秒）生成的报告，None 表示不限
+REPORT_REUSE_MAX_AGE = 7 * 24 * 3600
+
+# 学习报告提示词的令牌预算（估算值），超出时按优先级舍弃并按科目汇总其余内容
+REPORT_PROMPT_TOKEN_BUDGET = 6000
+
+# 增量学习报告（mode=delta）：基于同范围最近一份已完成报告，只发送其后新增的学习数据
+# MAX_AGE: 基准报告最长间隔（秒）；MAX_CHAIN: 连续增量次数上限，超过后重新完整生成
+REPORT_DELTA = {
+    'MAX_AGE': 14 * 24 * 3600,
+    'MAX_CHAIN': 3,
+}
+
+# 学习报告与班级报告分部分并发生成后按顺序拼接（总耗时约为最长单个部分，输入令牌数随部分数增加）
+# 批量生成不使用分段模式，以免AI调用数成倍增加
+REPORT_SECTIONS = {
+    'ENABLED': True,
+    'MAX_WORKERS': 5,
+}
+
+# 批量生成学习报告（教师为全班生成）
+# CONCURRENCY: 同时进行的AI调用数；RATE_LIMIT: 每分钟最多AI调用数（0不限）；
+# MAX_RETRIES / RETRY_BACKOFF: 单份报告失败后的重试次数与首次退避秒数；CHUNK_SIZE: 每次收集数据的学生数；
+# MAX_WORKERS: 同时运行的批量任务数（独立线程池，不占用 REPORT_TASKS 的报告生成线程）
+REPORT_BATCH = {
+    'CONCURRENCY': 4,
+    'RATE_LIMIT': 30,
+    'MAX_RETRIES': 2,
+    'RETRY_BACKOFF': 2.0,
+    'CHUNK_SIZE': 50,
+    'MAX_WORKERS': 1,
+}
+
+# 学习趋势接口（/reports/trends/）结果缓存秒数，有新的批改、提交或提问时缓存自动失效；0表示不缓存
+REPORT_TRENDS = {
+    'CACHE_TIMEOUT': 600,
+}
+
+# 班级成绩分析（/reports/class/analytics/）使用的进程内列式成绩快照
+# REBUILD_AFTER: 完整重新加载间隔（秒）；REFRESH_INTERVAL: 两次增量刷新的最小间隔（秒）
+REPORT_ANALYTICS = {
+    'REBUILD_AFTER': 3600,
+    'REFRESH_INTERVAL': 5,
+}
+
+# 班级报告的高频问题主题：学生首轮提问按字符n-gram TF-IDF 聚类（NumPy，进程内缓存每个提问的主题）
+# CLUSTERS: 主题数上限；TOP_TOPICS / EXAMPLES: 写入报告的主题数与每个主题的代表性提问数；
+# REFIT_RATIO: 新增提问超过训练规模的该比例时重新训练；MAX_FIT_QUESTIONS: 训练使用的最近提问数上限
+REPORT_TOPICS = {
+    'ENABLED': True,
+    'CLUSTERS': 16,
+    'TOP_TOPICS': 5,
+    'EXAMPLES': 3,
+    'REFIT_RATIO': 0.3,
+    'MAX_FIT_QUESTIONS': 100000,
+}
+
+# 学生知识点掌握度：已批改答案按题目知识点增量更新（python manage.py rebuild_knowledge_mastery 可重建）
+# HALF_LIFE_DAYS: 近期得分率的衰减半衰期（天）；WEAK_THRESHOLD: 近期得分率低于该值（%）视为薄弱；
+# PROMPT_LIMIT: 写入学习报告、班级报告与答疑提示词的知识点数
+REPORT_MASTERY = {
+    'HALF_LIFE_DAYS': 30,
+    'WEAK_THRESHOLD': 60,
+    'PROMPT_LIMIT': 8,
+}
+
+# 闲时报告预生成（python manage.py precompute_reports，可用 --loop 常驻或由 cron 在窗口开始时调用）
+# WINDOW: 本地时间窗口，结束早于开始表示跨越午夜；WEEKDAYS: 窗口开始日的星期（0为周一），None 为每天；
+# JITTER: 启动前随机等待的最大秒数；RATE_LIMIT: 全局每分钟AI调用数（多进程共享需配置共享缓存）；
+# CONCURRENCY: 同时进行的AI调用数；CLASS_REPORTS: 是否为每位教师预生成班级报告
+REPORT_PRECOMPUTE = {
+    'WINDOW': ('01:00', '06:00'),
+    'WEEKDAYS': None,
+    'PERIODS': ['week', 'month'],
+    'JITTER': 900,
+    'RATE_LIMIT': 20,
+    'CONCURRENCY': 2,
+    'CLASS_REPORTS': True,
+}
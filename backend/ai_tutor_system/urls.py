@@ -26,6 +26,7 @@ urlpatterns = [
     path('api/v1/qa/', include('qa.urls')),
     path('api/v1/reports/', include('reports.urls')),
     path('api/v1/chat/', include('chat.urls')),  # 添加这行
+    path('api/v1/courses/', include('courses.urls')),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 ]
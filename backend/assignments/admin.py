@@ -1,12 +1,13 @@
 from django.contrib import admin
-from .models import Assignment, Question, Submission, Answer
+from .models import Assignment, Question, Submission, Answer, KnowledgePoint
 
 
 class QuestionInline(admin.TabularInline):
     """问题内联编辑"""
     model = Question
     extra = 1
-    fields = ('question_text', 'reference_answer', 'score', 'order')
+    fields = ('question_text', 'reference_answer', 'score', 'order', 'knowledge_points')
+    filter_horizontal = ('knowledge_points',)
 
 
 @admin.register(Assignment)
@@ -42,11 +43,21 @@ class SubmissionAdmin(admin.ModelAdmin):
 class QuestionAdmin(admin.ModelAdmin):
     """问题管理"""
     list_display = ('assignment', 'question_text', 'score', 'order')
-    list_filter = ('assignment', 'score')
+    list_filter = ('assignment', 'score', 'knowledge_points')
     search_fields = ('question_text', 'assignment__title')
+    filter_horizontal = ('knowledge_points',)
     ordering = ('assignment', 'order')
 
 
+@admin.register(KnowledgePoint)
+class KnowledgePointAdmin(admin.ModelAdmin):
+    """知识点管理"""
+    list_display = ('name', 'subject', 'created_at')
+    list_filter = ('subject',)
+    search_fields = ('name', 'subject')
+    ordering = ('subject', 'name')
+
+
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
     """答案管理"""
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_answer_answer_image_alter_answer_answer_text'),
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='course',
+            field=models.ForeignKey(blank=True, help_text='为空时对所有学生可见', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='courses.course', verbose_name='所属课程'),
+        ),
+    ]
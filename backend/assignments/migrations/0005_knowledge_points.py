@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:44
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_assignment_course'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgePoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=50, verbose_name='科目')),
+                ('name', models.CharField(max_length=100, verbose_name='知识点名称')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '知识点',
+                'verbose_name_plural': '知识点',
+                'db_table': 'knowledge_points',
+                'ordering': ['subject', 'name'],
+                'constraints': [models.UniqueConstraint(fields=('subject', 'name'), name='knowledge_point_unique_name')],
+            },
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='knowledge_points',
+            field=models.ManyToManyField(blank=True, related_name='questions', to='assignments.knowledgepoint', verbose_name='知识点'),
+        ),
+    ]
@@ -16,6 +16,15 @@ class Assignment(models.Model):
         related_name='created_assignments',
         verbose_name='创建者'
     )
+    course = models.ForeignKey(
+        'courses.Course',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='assignments',
+        verbose_name='所属课程',
+        help_text='为空时对所有学生可见'
+    )
     deadline = models.DateTimeField(verbose_name='截止时间')
     total_score = models.IntegerField(verbose_name='总分')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -36,6 +45,26 @@ class Assignment(models.Model):
         return self.submissions.count()
 
 
+class KnowledgePoint(models.Model):
+    """知识点模型（按科目区分，同一科目内名称唯一）"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=50, verbose_name='科目')
+    name = models.CharField(max_length=100, verbose_name='知识点名称')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'knowledge_points'
+        verbose_name = '知识点'
+        verbose_name_plural = '知识点'
+        ordering = ['subject', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['subject', 'name'], name='knowledge_point_unique_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} - {self.name}"
+
+
 class Question(models.Model):
     """作业问题模型"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -49,6 +78,12 @@ class Question(models.Model):
     reference_answer = models.TextField(verbose_name='参考答案')
     score = models.IntegerField(verbose_name='分值')
     order = models.IntegerField(default=0, verbose_name='排序')
+    knowledge_points = models.ManyToManyField(
+        KnowledgePoint,
+        blank=True,
+        related_name='questions',
+        verbose_name='知识点'
+    )
 
     class Meta:
         db_table = 'questions'
@@ -1,34 +1,86 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Assignment, Question, Submission, Answer
-from ai_services import ask_gemini
+from .models import Assignment, Question, Submission, Answer, KnowledgePoint
+from ai_services import ask_gemini, ask_gemini_async
+import asyncio
 import re
 
+
+def resolve_knowledge_points(subject, names):
+    """按名称获取（不存在时创建）科目下的知识点，名称去除首尾空白并去重"""
+    points = []
+    seen = set()
+    for name in names:
+        name = name.strip()
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        point, _ = KnowledgePoint.objects.get_or_create(subject=subject, name=name)
+        points.append(point)
+    return points
+
+
+class KnowledgePointNamesField(serializers.ListField):
+    """知识点名称列表：写入时为名称列表，读取时输出题目关联的知识点名称"""
+    child = serializers.CharField(max_length=100)
+
+    def to_representation(self, value):
+        return [point.name for point in value.all()]
+
+
 class QuestionSerializer(serializers.ModelSerializer):
     """问题序列化器"""
+    knowledge_points = KnowledgePointNamesField(
+        required=False,
+        help_text='知识点名称列表（可选），不存在的知识点按作业科目自动创建'
+    )
+
     class Meta:
         model = Question
-        fields = ['id', 'question_text', 'reference_answer', 'score']
+        fields = ['id', 'question_text', 'reference_answer', 'score', 'knowledge_points']
         extra_kwargs = {
             'id': {'read_only': True},
         }
 
+
+class QuestionKnowledgePointsSerializer(serializers.Serializer):
+    """题目知识点设置序列化器"""
+    knowledge_points = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        allow_empty=True,
+        help_text='知识点名称列表，替换题目原有的知识点（空列表表示清除）'
+    )
+
 class AssignmentCreateSerializer(serializers.ModelSerializer):
     """作业创建序列化器"""
     questions = QuestionSerializer(many=True)
     class Meta:
         model = Assignment
-        fields = ['title', 'description', 'subject', 'questions', 'deadline', 'total_score']
+        fields = ['title', 'description', 'subject', 'course', 'questions', 'deadline', 'total_score']
+        extra_kwargs = {
+            'course': {'required': False, 'help_text': '所属课程ID（可选，为空时对所有学生可见）'},
+        }
+
+    def validate_course(self, course):
+        """只能为自己所教的课程布置作业"""
+        request = self.context.get('request')
+        if course is not None and request is not None:
+            if not course.memberships.filter(user=request.user, role='teacher').exists():
+                raise serializers.ValidationError('只能为自己所教的课程布置作业')
+        return course
     
     def create(self, validated_data):
         questions_data = validated_data.pop('questions')
         assignment = Assignment.objects.create(**validated_data)
         for i, question_data in enumerate(questions_data):
-            Question.objects.create(
+            knowledge_points = question_data.pop('knowledge_points', [])
+            question = Question.objects.create(
                 assignment=assignment,
                 order=i + 1,
                 **question_data
             )
+            if knowledge_points:
+                question.knowledge_points.set(resolve_knowledge_points(assignment.subject, knowledge_points))
         return assignment
 
 class AssignmentListSerializer(serializers.ModelSerializer):
@@ -38,7 +90,7 @@ class AssignmentListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Assignment
         fields = [
-            'id', 'title', 'description', 'subject', 'deadline',
+            'id', 'title', 'description', 'subject', 'course', 'deadline',
             'total_score', 'submission_count', 'is_completed',
             'obtained_score', 'created_at'
         ]
@@ -73,7 +125,7 @@ class AssignmentDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Assignment
         fields = [
-            'id', 'title', 'description', 'subject', 'questions',
+            'id', 'title', 'description', 'subject', 'course', 'questions',
             'deadline', 'total_score', 'is_completed',
             'obtained_score', 'created_at'
         ]
@@ -191,13 +243,93 @@ class AssignmentSubmissionSerializer(serializers.Serializer):
         
         return submission
 
+    async def acreate(self, validated_data):
+        """异步提交并批改作业，各题的OCR与AI批改并发进行"""
+        assignment = self.context['assignment']
+        student = self.context['student']
+        answers_data = validated_data['answers']
+
+        if await Submission.objects.filter(assignment=assignment, student=student).aexists():
+            raise serializers.ValidationError("您已经提交过这个作业")
+
+        submission = await Submission.objects.acreate(
+            assignment=assignment,
+            student=student,
+            status='grading'
+        )
+
+        questions = []
+        for answer_data in answers_data:
+            try:
+                question = await Question.objects.aget(
+                    id=answer_data['question_id'],
+                    assignment=assignment
+                )
+            except Question.DoesNotExist:
+                await submission.adelete()
+                raise serializers.ValidationError(f"问题 {answer_data['question_id']} 不存在")
+            questions.append(question)
+
+        graded_answers = await asyncio.gather(*[
+            self._agrade_answer_data(question, answer_data)
+            for question, answer_data in zip(questions, answers_data)
+        ])
+
+        total_score = 0
+        for question, (student_answer_text, answer_image_file, ai_score, ai_feedback) in zip(questions, graded_answers):
+            await Answer.objects.acreate(
+                submission=submission,
+                question=question,
+                answer_text=student_answer_text,
+                answer_image=answer_image_file,
+                obtained_score=ai_score,
+                ai_feedback=ai_feedback
+            )
+            total_score += ai_score
+
+        submission.obtained_score = total_score
+        submission.status = 'graded'
+        submission.graded_at = timezone.now()
+        submission.overall_feedback = await self._agenerate_overall_feedback(submission)
+        await submission.asave()
+
+        return submission
+
+    async def _agrade_answer_data(self, question, answer_data):
+        """异步识别并批改单个答案，返回 (答案文本, 图片文件, 分数, 反馈)"""
+        answer_image_file = None
+
+        if 'answer_image' in answer_data and answer_data['answer_image']:
+            answer_image_file = answer_data['answer_image']
+            student_answer_text = await self._aocr_image_with_ai(answer_image_file)
+        else:
+            student_answer_text = answer_data.get('answer_text', '')
+
+        ai_score, ai_feedback = self._check_exact_match(question, student_answer_text)
+
+        if ai_score is None:
+            ai_score, ai_feedback = await self._agrade_answer_with_ai(question, student_answer_text)
+
+        return student_answer_text, answer_image_file, ai_score, ai_feedback
+
+    OCR_PROMPT = "请精确地识别并提取这张图片中的所有手写或印刷文字，并以纯文本形式返回。"
+
     def _ocr_image_with_ai(self, image_file):
         """使用AI识别图片中的文字"""
         try:
             image_bytes = image_file.read()
-            prompt = "请精确地识别并提取这张图片中的所有手写或印刷文字，并以纯文本形式返回。"
             
-            extracted_text = ask_gemini(prompt, images=[image_bytes], temperature=0.1)
+            extracted_text = ask_gemini(self.OCR_PROMPT, images=[image_bytes], temperature=0.1)
+            return extracted_text if extracted_text else "图片识别失败，未能提取到文字。"
+        except Exception as e:
+            return f"图片识别失败，错误：{str(e)}"
+
+    async def _aocr_image_with_ai(self, image_file):
+        """使用AI识别图片中的文字（异步）"""
+        try:
+            image_bytes = image_file.read()
+
+            extracted_text = await ask_gemini_async(self.OCR_PROMPT, images=[image_bytes], temperature=0.1)
             return extracted_text if extracted_text else "图片识别失败，未能提取到文字。"
         except Exception as e:
             return f"图片识别失败，错误：{str(e)}"
@@ -211,10 +343,9 @@ class AssignmentSubmissionSerializer(serializers.Serializer):
             return question.score, "你的答案完全正确！"
         
         return None, None
-    def _grade_answer_with_ai(self, question, student_answer):
-        """使用AI批改单个答案"""
-        try:
-            prompt = f"""
+    def _build_grading_prompt(self, question, student_answer):
+        """构建单题批改提示词"""
+        return f"""
 请作为一名专业教师，批改以下学生答案。
 
 题目：{question.question_text}
@@ -235,44 +366,58 @@ class AssignmentSubmissionSerializer(serializers.Serializer):
 <feedback>详细的批改意见和建议，包括优点、不足和改进建议</feedback>
 """
 
-            ai_response = ask_gemini(prompt, temperature=0.3)
+    def _parse_grading_response(self, question, ai_response):
+        """解析批改结果，返回 (分数, 反馈)"""
+        score = 0
+        feedback = "AI批改暂时不可用"
 
+        try:
+            score_match = re.search(r'<score>(.*?)</score>', ai_response, re.DOTALL)
+            if score_match:
+                score_text = score_match.group(1).strip()
+                score_numbers = re.findall(r'\d+', score_text)
+                if score_numbers:
+                    score = int(score_numbers[0])
+                    score = max(0, min(score, question.score))
+        except Exception:
             score = 0
-            feedback = "AI批改暂时不可用"
 
-            try:
-                score_match = re.search(r'<score>(.*?)</score>', ai_response, re.DOTALL)
-                if score_match:
-                    score_text = score_match.group(1).strip()
-                    score_numbers = re.findall(r'\d+', score_text)
-                    if score_numbers:
-                        score = int(score_numbers[0])
-                        score = max(0, min(score, question.score))
-            except Exception:
-                score = 0
-
-            try:
-                feedback_match = re.search(r'<feedback>(.*?)</feedback>', ai_response, re.DOTALL)
-                if feedback_match:
-                    feedback = feedback_match.group(1).strip()
-                else:
-                    feedback = ai_response.strip()
-            except Exception:
+        try:
+            feedback_match = re.search(r'<feedback>(.*?)</feedback>', ai_response, re.DOTALL)
+            if feedback_match:
+                feedback = feedback_match.group(1).strip()
+            else:
                 feedback = ai_response.strip()
-            return score, feedback
+        except Exception:
+            feedback = ai_response.strip()
+        return score, feedback
+
+    def _grade_answer_with_ai(self, question, student_answer):
+        """使用AI批改单个答案"""
+        try:
+            prompt = self._build_grading_prompt(question, student_answer)
+            ai_response = ask_gemini(prompt, temperature=0.3)
+            return self._parse_grading_response(question, ai_response)
 
         except Exception as e:
             return 0, f"AI批改失败，请联系教师人工批改。错误：{str(e)}"
-    
-    def _generate_overall_feedback(self, submission):
-        """生成总体反馈"""
+
+    async def _agrade_answer_with_ai(self, question, student_answer):
+        """使用AI批改单个答案（异步）"""
         try:
-            answers = submission.answers.all()
-            total_possible = submission.assignment.total_score
-            total_obtained = submission.obtained_score
-            percentage = (total_obtained / total_possible) * 100 if total_possible > 0 else 0
+            prompt = self._build_grading_prompt(question, student_answer)
+            ai_response = await ask_gemini_async(prompt, temperature=0.3)
+            return self._parse_grading_response(question, ai_response)
 
-            prompt = f"""
+        except Exception as e:
+            return 0, f"AI批改失败，请联系教师人工批改。错误：{str(e)}"
+
+    def _build_overall_feedback_prompt(self, submission, answers, percentage):
+        """构建总体反馈提示词"""
+        total_possible = submission.assignment.total_score
+        total_obtained = submission.obtained_score
+
+        prompt = f"""
 请为学生的作业提交生成一个总体评价和建议。
 
 作业标题：{submission.assignment.title}
@@ -282,35 +427,68 @@ class AssignmentSubmissionSerializer(serializers.Serializer):
 
 各题详情：
 """
-            for answer in answers:
-                prompt += f"- {answer.question.question_text[:50]}... 得分：{answer.obtained_score}/{answer.question.score}\n"
+        for answer in answers:
+            prompt += f"- {answer.question.question_text[:50]}... 得分：{answer.obtained_score}/{answer.question.score}\n"
 
-            prompt += """
+        prompt += """
 请严格按照以下XML格式回复，提供简洁的总体评价和学习建议（100字以内）：
 
 <overall_feedback>总体评价和学习建议</overall_feedback>
 """
+        return prompt
 
+    def _parse_overall_feedback(self, ai_response):
+        """解析总体反馈"""
+        try:
+            feedback_match = re.search(r'<overall_feedback>(.*?)</overall_feedback>', ai_response, re.DOTALL)
+            if feedback_match:
+                return feedback_match.group(1).strip()
+            else:
+                return ai_response.strip()
+        except:
+            return ai_response.strip()
+
+    def _fallback_overall_feedback(self, percentage):
+        """AI不可用时根据得分率给出的总体反馈"""
+        if percentage >= 90:
+            return "优秀！继续保持这种学习状态。"
+        elif percentage >= 80:
+            return "良好，还有进步空间，建议复习错误的知识点。"
+        elif percentage >= 60:
+            return "及格，需要加强基础知识的学习和理解。"
+        else:
+            return "需要努力，建议重新学习相关知识点并多做练习。"
+
+    def _submission_percentage(self, submission):
+        """计算提交的得分率"""
+        total_possible = submission.assignment.total_score
+        return (submission.obtained_score / total_possible) * 100 if total_possible > 0 else 0
+
+    def _generate_overall_feedback(self, submission):
+        """生成总体反馈"""
+        percentage = self._submission_percentage(submission)
+        try:
+            answers = submission.answers.all()
+            prompt = self._build_overall_feedback_prompt(submission, answers, percentage)
             ai_response = ask_gemini(prompt, temperature=0.5, max_tokens=200)
+            return self._parse_overall_feedback(ai_response)
 
-            try:
-                feedback_match = re.search(r'<overall_feedback>(.*?)</overall_feedback>', ai_response, re.DOTALL)
-                if feedback_match:
-                    return feedback_match.group(1).strip()
-                else:
-                    return ai_response.strip()
-            except:
-                return ai_response.strip()
+        except Exception:
+            return self._fallback_overall_feedback(percentage)
+
+    async def _agenerate_overall_feedback(self, submission):
+        """生成总体反馈（异步）"""
+        percentage = self._submission_percentage(submission)
+        try:
+            answers = [
+                answer async for answer in submission.answers.select_related('question')
+            ]
+            prompt = self._build_overall_feedback_prompt(submission, answers, percentage)
+            ai_response = await ask_gemini_async(prompt, temperature=0.5, max_tokens=200)
+            return self._parse_overall_feedback(ai_response)
 
         except Exception:
-            if percentage >= 90:
-                return "优秀！继续保持这种学习状态。"
-            elif percentage >= 80:
-                return "良好，还有进步空间，建议复习错误的知识点。"
-            elif percentage >= 60:
-                return "及格，需要加强基础知识的学习和理解。"
-            else:
-                return "需要努力，建议重新学习相关知识点并多做练习。"
+            return self._fallback_overall_feedback(percentage)
 
 
 class AnswerDetailSerializer(serializers.ModelSerializer):
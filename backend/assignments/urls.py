@@ -9,8 +9,11 @@ urlpatterns = [
     path('list/', views.list_assignments, name='list_assignments'),  # GET - 获取作业列表
     path('<uuid:assignment_id>/', views.get_assignment_detail, name='assignment_detail'),  # GET - 获取作业详情
 
+    path('<uuid:assignment_id>/questions/<uuid:question_id>/knowledge-points/', views.set_question_knowledge_points, name='question_knowledge_points'),  # PUT - 设置题目知识点
+
     # 作业提交
     path('<uuid:assignment_id>/submissions/', views.submit_assignment, name='submit_assignment'),  # POST - 提交作业
+    path('<uuid:assignment_id>/submissions/async/', views.submit_assignment_async, name='submit_assignment_async'),  # POST - 提交作业（ASGI异步）
     path('<uuid:assignment_id>/submissions/list/', views.get_submissions_list, name='get_submissions'),  # GET - 获取提交列表
     path('<uuid:assignment_id>/result/', views.get_assignment_result, name='assignment_result'),  # GET - 获取批改结果
     # 保留旧接口以兼容
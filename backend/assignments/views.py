@@ -1,4 +1,4 @@
-from rest_framework import status, generics, permissions
+from rest_framework import status, generics, permissions, serializers
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -7,7 +7,15 @@ from django.db.models import Q
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 from drf_spectacular.openapi import OpenApiTypes
 from django.contrib.auth import get_user_model
-from .models import Assignment, Submission
+from .models import Assignment, Question, Submission
+from async_api import async_api_view, json_response
+from asgiref.sync import sync_to_async
+
+try:
+    from courses.scoping import visible_assignments
+except ImportError:
+    def visible_assignments(user, queryset):
+        return queryset.filter(created_by=user) if user.role == 'teacher' else queryset.filter(course__isnull=True)
 
 User = get_user_model()
 from .serializers import (
@@ -15,7 +23,9 @@ from .serializers import (
     AssignmentListSerializer,
     AssignmentDetailSerializer,
     AssignmentSubmissionSerializer,
-    SubmissionDetailSerializer
+    SubmissionDetailSerializer,
+    QuestionKnowledgePointsSerializer,
+    resolve_knowledge_points
 )
 
 
@@ -31,6 +41,11 @@ class IsStudent(permissions.BasePermission):
         return request.user.is_authenticated and request.user.role == 'student'
 
 
+def can_access_assignment(user, assignment):
+    """教师：自己创建或所教课程的作业；学生：所在课程的作业或未指定课程的作业"""
+    return visible_assignments(user, Assignment.objects.filter(id=assignment.id)).exists()
+
+
 @extend_schema(
     request=AssignmentCreateSerializer,
     responses={
@@ -44,7 +59,7 @@ class IsStudent(permissions.BasePermission):
 @permission_classes([IsTeacher])
 def create_assignment(request):
     """创建作业 - 仅教师"""
-    serializer = AssignmentCreateSerializer(data=request.data)
+    serializer = AssignmentCreateSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         assignment = serializer.save(created_by=request.user)
         return Response({
@@ -89,9 +104,8 @@ def list_assignments(request):
     # 构建查询
     queryset = Assignment.objects.all()
 
-    # 根据用户角色过滤
-    if request.user.role == 'teacher':
-        queryset = queryset.filter(created_by=request.user)
+    # 根据用户角色与所在课程过滤
+    queryset = visible_assignments(request.user, queryset)
 
     # 科目过滤
     if subject_filter:
@@ -161,10 +175,10 @@ def list_assignments(request):
 @permission_classes([permissions.IsAuthenticated])
 def get_assignment_detail(request, assignment_id):
     """获取作业详情"""
-    assignment = get_object_or_404(Assignment, id=assignment_id)
+    assignment = get_object_or_404(Assignment.objects.prefetch_related('questions__knowledge_points'), id=assignment_id)
 
-    # 权限检查：教师只能看自己创建的作业
-    if request.user.role == 'teacher' and assignment.created_by != request.user:
+    # 权限检查：教师只能看自己创建或所教课程的作业，学生只能看所在课程的作业
+    if not can_access_assignment(request.user, assignment):
         return Response({
             'code': 403,
             'message': '权限不足'
@@ -195,6 +209,12 @@ def submit_assignment(request, assignment_id):
     """提交作业 - 仅学生"""
     assignment = get_object_or_404(Assignment, id=assignment_id)
 
+    if not can_access_assignment(request.user, assignment):
+        return Response({
+            'code': 403,
+            'message': '权限不足：该作业不属于您所在的课程'
+        }, status=status.HTTP_403_FORBIDDEN)
+
     # 检查截止时间
     from django.utils import timezone
     if timezone.now() > assignment.deadline:
@@ -227,6 +247,63 @@ def submit_assignment(request, assignment_id):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@async_api_view(['POST'], permission_classes=[IsStudent], parser_classes=[MultiPartParser, FormParser])
+async def submit_assignment_async(request, assignment_id):
+    """提交作业（异步版本，各题并发批改）- 仅学生"""
+    try:
+        assignment = await Assignment.objects.aget(id=assignment_id)
+    except Assignment.DoesNotExist:
+        return json_response({
+            'code': 404,
+            'message': '作业不存在'
+        }, status.HTTP_404_NOT_FOUND)
+
+    if not await sync_to_async(can_access_assignment)(request.user, assignment):
+        return json_response({
+            'code': 403,
+            'message': '权限不足：该作业不属于您所在的课程'
+        }, status.HTTP_403_FORBIDDEN)
+
+    # 检查截止时间
+    from django.utils import timezone
+    if timezone.now() > assignment.deadline:
+        return json_response({
+            'code': 400,
+            'message': '作业已过截止时间'
+        }, status.HTTP_400_BAD_REQUEST)
+
+    serializer = AssignmentSubmissionSerializer(
+        data=request.data,
+        context={'assignment': assignment, 'student': request.user}
+    )
+
+    if serializer.is_valid():
+        try:
+            submission = await serializer.acreate(serializer.validated_data)
+        except serializers.ValidationError as e:
+            return json_response({
+                'code': 400,
+                'message': '作业提交失败',
+                'errors': e.detail
+            }, status.HTTP_400_BAD_REQUEST)
+
+        return json_response({
+            'code': 201,
+            'message': '作业提交成功',
+            'data': {
+                'submission_id': str(submission.id),
+                'submitted_at': submission.submitted_at,
+                'status': submission.status
+            }
+        }, status.HTTP_201_CREATED)
+
+    return json_response({
+        'code': 400,
+        'message': '作业提交失败',
+        'errors': serializer.errors
+    }, status.HTTP_400_BAD_REQUEST)
+
+
 @extend_schema(
     responses={
         200: SubmissionDetailSerializer,
@@ -255,8 +332,8 @@ def get_submission_result(request, assignment_id, submission_id):
                 'message': '权限不足'
             }, status=status.HTTP_403_FORBIDDEN)
     elif request.user.role == 'teacher':
-        # 教师只能查看自己创建的作业的提交
-        if assignment.created_by != request.user:
+        # 教师只能查看自己创建或所教课程的作业的提交
+        if not can_access_assignment(request.user, assignment):
             return Response({
                 'code': 403,
                 'message': '权限不足'
@@ -298,10 +375,10 @@ def get_assignment_result(request, assignment_id):
         target_student = request.user
     elif request.user.role == 'teacher':
         # 教师可以查看指定学生的结果
-        if assignment.created_by != request.user:
+        if not can_access_assignment(request.user, assignment):
             return Response({
                 'code': 403,
-                'message': '权限不足：您只能查看自己创建的作业的提交结果'
+                'message': '权限不足：您只能查看自己创建或所教课程的作业的提交结果'
             }, status=status.HTTP_403_FORBIDDEN)
 
         student_id = request.query_params.get('student_id')
@@ -359,11 +436,11 @@ def get_submissions_list(request, assignment_id):
 
     # 权限检查
     if request.user.role == 'teacher':
-        # 教师只能查看自己创建的作业的提交
-        if assignment.created_by != request.user:
+        # 教师只能查看自己创建或所教课程的作业的提交
+        if not can_access_assignment(request.user, assignment):
             return Response({
                 'code': 403,
-                'message': '权限不足：您只能查看自己创建的作业的提交情况'
+                'message': '权限不足：您只能查看自己创建或所教课程的作业的提交情况'
             }, status=status.HTTP_403_FORBIDDEN)
     elif request.user.role == 'student':
         # 学生只能查看自己的提交
@@ -433,3 +510,48 @@ def get_submissions_list(request, assignment_id):
             }
         }
     }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=QuestionKnowledgePointsSerializer,
+    responses={
+        200: OpenApiResponse(description="设置成功"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+        404: OpenApiResponse(description="题目不存在"),
+    },
+    description="教师设置题目的知识点（替换原有知识点，已有答案的掌握度随之重算）"
+)
+@api_view(['PUT'])
+@permission_classes([IsTeacher])
+def set_question_knowledge_points(request, assignment_id, question_id):
+    """设置题目知识点 - 仅教师"""
+    assignment = get_object_or_404(Assignment, id=assignment_id)
+    question = get_object_or_404(Question, id=question_id, assignment=assignment)
+
+    if not can_access_assignment(request.user, assignment):
+        return Response({
+            'code': 403,
+            'message': '权限不足：您只能修改自己创建或所教课程的作业'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = QuestionKnowledgePointsSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    points = resolve_knowledge_points(assignment.subject, serializer.validated_data['knowledge_points'])
+    question.knowledge_points.set(points)
+
+    return Response({
+        'code': 200,
+        'message': '设置成功',
+        'data': {
+            'question_id': str(question.id),
+            'subject': assignment.subject,
+            'knowledge_points': [point.name for point in points]
+        }
+    }, status=status.HTTP_200_OK)
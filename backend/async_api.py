@@ -0,0 +1,94 @@
+"""
+异步接口模块 - 为AI调用密集型接口提供ASGI原生异步视图支持
+DRF的 @api_view 只支持同步视图，这里提供等价的认证、权限和请求解析流程，
+使视图在等待Gemini响应时不占用工作线程
+"""
+
+from functools import wraps
+from typing import List, Optional, Sequence
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    """返回与DRF JSONRenderer格式一致的JSON响应（支持UUID、datetime等类型）"""
+    return JsonResponse(
+        data,
+        status=status_code,
+        encoder=JSONEncoder,
+        safe=False,
+        json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _authenticate(request):
+    """触发DRF认证流程（JWT认证需要查询数据库，必须在同步线程中执行）"""
+    return request.user
+
+
+def async_api_view(
+    http_method_names: Sequence[str],
+    permission_classes: Optional[List[type]] = None,
+    parser_classes: Optional[List[type]] = None
+):
+    """
+    异步视图装饰器，对应DRF的 @api_view + @permission_classes
+
+    Args:
+        http_method_names: 允许的HTTP方法列表
+        permission_classes: 权限类列表（默认使用REST_FRAMEWORK配置）
+        parser_classes: 请求解析器列表（默认支持JSON和表单）
+
+    被装饰的视图接收DRF的 Request 对象，应返回 json_response(...)
+    """
+    allowed_methods = [method.upper() for method in http_method_names]
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in allowed_methods:
+                return json_response(
+                    {'detail': f'方法 “{request.method}” 不被允许。'},
+                    status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+
+            parsers = parser_classes or [JSONParser, FormParser, MultiPartParser]
+            drf_request = Request(
+                request,
+                parsers=[parser() for parser in parsers],
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+            )
+
+            try:
+                await sync_to_async(_authenticate)(drf_request)
+            except exceptions.APIException as e:
+                return json_response({'detail': str(e.detail)}, e.status_code)
+
+            permissions = permission_classes or api_settings.DEFAULT_PERMISSION_CLASSES
+            for permission_class in permissions:
+                if not permission_class().has_permission(drf_request, None):
+                    if not drf_request.user or not drf_request.user.is_authenticated:
+                        return json_response(
+                            {'detail': '身份认证信息未提供。'},
+                            status.HTTP_401_UNAUTHORIZED
+                        )
+                    return json_response(
+                        {'detail': '您没有执行该操作的权限。'},
+                        status.HTTP_403_FORBIDDEN
+                    )
+
+            try:
+                return await func(drf_request, *args, **kwargs)
+            except exceptions.ParseError as e:
+                return json_response({'detail': str(e.detail)}, e.status_code)
+
+        return csrf_exempt(wrapper)
+
+    return decorator
@@ -0,0 +1,93 @@
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_sessions(apps, schema_editor):
+    """根据已有消息为每对用户建立会话，并回填已读游标和未读数"""
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatSession = apps.get_model('chat', 'ChatSession')
+    ChatParticipant = apps.get_model('chat', 'ChatParticipant')
+
+    # 旧会话表从未被使用，没有可迁移的数据
+    ChatSession.objects.all().delete()
+
+    # 按 (接收者, 发送者) 统计未读数和最后一条已读消息的时间
+    stats = {}
+    for row in ChatMessage.objects.values('receiver_id', 'sender_id').annotate(
+        unread=Count('id', filter=Q(is_read=False)),
+        last_read=Max('created_at', filter=Q(is_read=True)),
+    ):
+        stats[(row['receiver_id'], row['sender_id'])] = row
+
+    sessions = {}
+    for receiver_id, sender_id in stats:
+        key = ':'.join(sorted([str(receiver_id), str(sender_id)]))
+        if key not in sessions:
+            sessions[key] = (ChatSession.objects.create(conversation_key=key), receiver_id, sender_id)
+
+    participants = []
+    for session, user_a, user_b in sessions.values():
+        for user_id, peer_id in ((user_a, user_b), (user_b, user_a)):
+            row = stats.get((user_id, peer_id), {})
+            participants.append(ChatParticipant(
+                session=session,
+                user_id=user_id,
+                unread_count=row.get('unread') or 0,
+                last_read_at=row.get('last_read'),
+            ))
+    ChatParticipant.objects.bulk_create(participants, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_chatmessage_sync_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='chatsession',
+            name='participants',
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='conversation_key',
+            field=models.CharField(max_length=80, null=True),
+        ),
+        migrations.CreateModel(
+            name='ChatParticipant',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='chat.chatsession')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_participations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'chat_participants',
+                'indexes': [
+                    models.Index(fields=['user', 'unread_count'], name='chat_part_user_unread_idx'),
+                    models.Index(fields=['user', 'updated_at'], name='chat_part_user_updated_idx'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('session', 'user'), name='chat_participant_unique'),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='participants',
+            field=models.ManyToManyField(related_name='chat_sessions', through='chat.ChatParticipant', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_sessions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatsession',
+            name='conversation_key',
+            field=models.CharField(max_length=80, unique=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 import uuid
 
@@ -16,19 +17,103 @@ class ChatMessage(models.Model):
     class Meta:
         db_table = 'chat_messages'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['receiver', 'created_at'], name='chat_msg_receiver_created_idx'),
+            # 增量同步按 (updated_at, id) 游标读取收发两个方向的消息
+            models.Index(fields=['receiver', 'updated_at'], name='chat_msg_receiver_updated_idx'),
+            models.Index(fields=['sender', 'updated_at'], name='chat_msg_sender_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # 验证发送者和接收者角色
         if self.sender.role == self.receiver.role:
             raise ValueError('只能与不同角色的用户聊天')
-        super().save(*args, **kwargs)
+
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                ChatSession.record_messages(self.sender_id, self.receiver_id)
+
+
+def conversation_key(user_a_id, user_b_id):
+    """两个用户之间会话的唯一标识（与参数顺序无关）"""
+    return ':'.join(sorted([str(user_a_id), str(user_b_id)]))
 
 
 class ChatSession(models.Model):
+    """一对一会话，每个参与者的已读游标和未读数保存在 ChatParticipant 中"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    participants = models.ManyToManyField(User, related_name='chat_sessions')
+    conversation_key = models.CharField(max_length=80, unique=True)
+    participants = models.ManyToManyField(User, through='ChatParticipant', related_name='chat_sessions')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'chat_sessions'
+
+    @classmethod
+    def get_for_users(cls, user_a_id, user_b_id):
+        """获取两个用户之间的会话，不存在时创建"""
+        session, created = cls.objects.get_or_create(conversation_key=conversation_key(user_a_id, user_b_id))
+        if created:
+            ChatParticipant.objects.bulk_create([
+                ChatParticipant(session=session, user_id=user_a_id),
+                ChatParticipant(session=session, user_id=user_b_id),
+            ], ignore_conflicts=True)
+        return session
+
+    @classmethod
+    def get_for_peers(cls, user_id, peer_ids):
+        """
+        批量获取某用户与多个用户之间的会话，缺失的会话批量创建
+
+        Returns:
+            {peer_id: ChatSession}
+        """
+        keys = {conversation_key(user_id, peer_id): peer_id for peer_id in peer_ids}
+        cls.objects.bulk_create(
+            [cls(conversation_key=key) for key in keys],
+            batch_size=500,
+            ignore_conflicts=True
+        )
+        sessions = {
+            keys[session.conversation_key]: session
+            for session in cls.objects.filter(conversation_key__in=list(keys))
+        }
+
+        participants = []
+        for peer_id, session in sessions.items():
+            participants.append(ChatParticipant(session=session, user_id=user_id))
+            participants.append(ChatParticipant(session=session, user_id=peer_id))
+        ChatParticipant.objects.bulk_create(participants, batch_size=500, ignore_conflicts=True)
+        return sessions
+
+    @classmethod
+    def record_messages(cls, sender_id, receiver_id, count=1):
+        """记录新消息：接收者的未读数加count（单行更新）"""
+        session = cls.get_for_users(sender_id, receiver_id)
+        ChatParticipant.objects.filter(session=session, user_id=receiver_id).update(
+            unread_count=F('unread_count') + count
+        )
+        return session
+
+
+class ChatParticipant(models.Model):
+    """会话参与者：已读游标与维护的未读计数"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_participations')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chat_participants'
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'user'], name='chat_participant_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'unread_count'], name='chat_part_user_unread_idx'),
+            models.Index(fields=['user', 'updated_at'], name='chat_part_user_updated_idx'),
+        ]
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.db import models
-from .models import ChatMessage
+from .models import ChatMessage, ChatParticipant, conversation_key
 
 User = get_user_model()
 
@@ -16,16 +16,29 @@ class ChatUserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'real_name', 'role', 'unread_count', 'last_message']
 
     def get_unread_count(self, obj):
+        # 列表查询已通过注解一次性取得未读数
+        if hasattr(obj, 'annotated_unread_count'):
+            return obj.annotated_unread_count or 0
+
         request = self.context.get('request')
         if request and request.user:
-            return ChatMessage.objects.filter(
-                sender=obj,
-                receiver=request.user,
-                is_read=False
-            ).count()
+            participant = ChatParticipant.objects.filter(
+                session__conversation_key=conversation_key(obj.id, request.user.id),
+                user=request.user
+            ).first()
+            return participant.unread_count if participant else 0
         return 0
 
     def get_last_message(self, obj):
+        if hasattr(obj, 'last_message_at'):
+            if obj.last_message_at is None:
+                return None
+            return {
+                'content': obj.last_message_content,
+                'created_at': obj.last_message_at.isoformat(),
+                'is_read': obj.last_message_is_read
+            }
+
         request = self.context.get('request')
         if request and request.user:
             last_msg = ChatMessage.objects.filter(
@@ -37,7 +50,7 @@ class ChatUserSerializer(serializers.ModelSerializer):
                 return {
                     'content': last_msg.content,
                     'created_at': last_msg.created_at.isoformat(),
-                    'is_read': last_msg.is_read
+                    'is_read': ChatMessageSerializer(last_msg).data['is_read']
                 }
         return None
 
@@ -46,11 +59,28 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     """聊天消息序列化器"""
     sender_name = serializers.CharField(source='sender.real_name', read_only=True)
     receiver_name = serializers.CharField(source='receiver.real_name', read_only=True)
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatMessage
-        fields = ['id', 'sender', 'receiver', 'content', 'is_read', 'created_at', 'sender_name', 'receiver_name']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'sender', 'receiver', 'content', 'is_read', 'created_at', 'updated_at', 'sender_name', 'receiver_name']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def get_is_read(self, obj):
+        """消息在接收者的已读游标之前即为已读"""
+        if obj.is_read:
+            return True
+
+        key = (conversation_key(obj.sender_id, obj.receiver_id), obj.receiver_id)
+        read_cursors = self.context.get('read_cursors')
+        if read_cursors is not None:
+            last_read_at = read_cursors.get(key)
+        else:
+            last_read_at = ChatParticipant.objects.filter(
+                session__conversation_key=key[0],
+                user_id=obj.receiver_id
+            ).values_list('last_read_at', flat=True).first()
+        return bool(last_read_at and obj.created_at <= last_read_at)
 
 
 class SendMessageSerializer(serializers.ModelSerializer):
@@ -83,3 +113,20 @@ class SendMessageSerializer(serializers.ModelSerializer):
 
 
 
+
+
+class BroadcastMessageSerializer(serializers.Serializer):
+    """群发消息序列化器"""
+    receiver_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=False,
+        help_text='接收者ID列表'
+    )
+    all_students = serializers.BooleanField(default=False, help_text='发送给所有学生（所教课程的学生，没有课程时为全部学生）')
+    content = serializers.CharField()
+
+    def validate(self, attrs):
+        if not attrs.get('all_students') and not attrs.get('receiver_ids'):
+            raise serializers.ValidationError("请指定接收者或选择发送给所有学生")
+        return attrs
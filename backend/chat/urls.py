@@ -3,8 +3,12 @@ from . import views
 
 urlpatterns = [
     path('users/', views.get_chat_users, name='chat-users'),
+    path('messages/broadcast/', views.broadcast_message, name='broadcast-message'),
     path('messages/<str:user_id>/', views.get_chat_messages, name='chat-messages'),
     path('messages/', views.send_message, name='send-message'),
     path('messages/<str:user_id>/read/', views.mark_messages_read, name='mark-read'),
     path('unread-count/', views.get_unread_count, name='unread-count'),
+    path('sync/', views.sync_messages, name='chat-sync'),
+    path('events/', views.stream_events, name='chat-events'),
+    path('events/poll/', views.poll_events, name='chat-events-poll'),
 ]
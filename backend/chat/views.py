@@ -1,25 +1,153 @@
+import uuid
+
 from rest_framework import status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, authentication_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Count, Max, Subquery, OuterRef
+from django.db import transaction
+from django.db.models import Q, F, Sum, Max, Subquery, OuterRef, Case, When, Value, BooleanField
 from django.core.paginator import Paginator
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
-from .models import ChatMessage, ChatSession
+from .models import ChatMessage, ChatSession, ChatParticipant, conversation_key
+from realtime import (
+    EventStreamRenderer,
+    QueryTokenJWTAuthentication,
+    get_broker,
+    publish_to_user,
+    stream_user_events,
+    user_channel,
+)
 from .serializers import (
     ChatUserSerializer, 
     ChatMessageSerializer, 
-    SendMessageSerializer
+    SendMessageSerializer,
+    BroadcastMessageSerializer
 )
 
 User = get_user_model()
 
+try:
+    from courses.scoping import visible_students, visible_teachers
+except ImportError:
+    def visible_students(teacher):
+        return User.objects.filter(role='student')
+
+    def visible_teachers(student):
+        return User.objects.filter(role='teacher')
+
+
+CHAT_USERS_MAX_PAGE_SIZE = 100
+
+
+def parse_positive_int(request, name, default, maximum=None):
+    """
+    解析正整数查询参数，超过maximum时取maximum
+
+    Returns:
+        (value, error)，未传时为default
+    """
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default, None
+    try:
+        value = int(value)
+    except ValueError:
+        return None, f'{name}参数格式错误，应为正整数'
+    if value < 1:
+        return None, f'{name}参数应为正整数'
+    if maximum is not None:
+        value = min(value, maximum)
+    return value, None
+
+
+def annotate_chat_users(users, current_user):
+    """为联系人查询集注解未读数和最后一条消息，整个列表只需一次查询"""
+    conversation = ChatMessage.objects.filter(
+        Q(sender=OuterRef('pk'), receiver=current_user) |
+        Q(sender=current_user, receiver=OuterRef('pk'))
+    ).order_by('-created_at')
+
+    # 当前用户与对方在同一会话中的参与者记录
+    own_participant = ChatParticipant.objects.filter(
+        user=current_user,
+        session__members__user=OuterRef('pk')
+    )
+    peer_participant = ChatParticipant.objects.filter(
+        user=OuterRef('pk'),
+        session__members__user=current_user
+    )
+
+    users = users.annotate(
+        annotated_unread_count=Subquery(own_participant.values('unread_count')[:1]),
+        own_last_read_at=Subquery(own_participant.values('last_read_at')[:1]),
+        peer_last_read_at=Subquery(peer_participant.values('last_read_at')[:1]),
+        last_message_content=Subquery(conversation.values('content')[:1]),
+        last_message_at=Subquery(conversation.values('created_at')[:1]),
+        last_message_sender_id=Subquery(conversation.values('sender')[:1]),
+        last_message_flag_read=Subquery(conversation.values('is_read')[:1]),
+    )
+
+    # 最后一条消息是否已读：由接收者的已读游标决定
+    return users.annotate(
+        last_message_is_read=Case(
+            When(last_message_flag_read=True, then=Value(True)),
+            When(
+                Q(last_message_sender_id=F('pk')) & Q(own_last_read_at__gte=F('last_message_at')),
+                then=Value(True)
+            ),
+            When(
+                Q(last_message_sender_id=current_user.pk) & Q(peer_last_read_at__gte=F('last_message_at')),
+                then=Value(True)
+            ),
+            default=Value(False),
+            output_field=BooleanField()
+        )
+    )
+
+
+def get_read_cursors(participants):
+    """
+    构建消息序列化所需的已读游标
+
+    Returns:
+        {(conversation_key, 读者ID): last_read_at}
+    """
+    return {
+        (participant.session.conversation_key, participant.user_id): participant.last_read_at
+        for participant in participants.select_related('session')
+        if participant.last_read_at
+    }
+
 
 @extend_schema(
     summary="获取可聊天用户列表",
-    description="获取当前用户可以聊天的用户列表（教师获取学生列表，学生获取教师列表）",
+    description="获取当前用户可以聊天的用户列表（教师获取学生列表，学生获取教师列表），按最近会话排序",
+    parameters=[
+        OpenApiParameter(
+            name='search',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description='按用户名、姓名或学号搜索'
+        ),
+        OpenApiParameter(
+            name='page',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='页码'
+        ),
+        OpenApiParameter(
+            name='page_size',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='每页数量（不传则返回全部，最大100）'
+        ),
+    ],
     responses={200: ChatUserSerializer(many=True)}
 )
 @api_view(['GET'])
@@ -28,36 +156,169 @@ def get_chat_users(request):
     """获取可聊天的用户列表"""
     current_user = request.user
     
-    # 根据当前用户角色获取可聊天的用户
+    # 根据当前用户角色获取可聊天的用户（按所在课程的成员范围）
     if current_user.role == 'teacher':
-        # 教师获取学生列表
-        target_role = 'student'
+        # 教师获取所教课程的学生
+        users = visible_students(current_user)
     elif current_user.role == 'student':
-        # 学生获取教师列表
-        target_role = 'teacher'
+        # 学生获取所在课程的教师
+        users = visible_teachers(current_user)
     else:
         return Response({
             'code': 400,
             'message': '无效的用户角色'
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # 获取目标角色的用户
-    users = User.objects.filter(
-        role=target_role,
-        is_active=True
-    ).order_by('real_name')
-    
+
+    users = users.filter(is_active=True)
+
+    # 搜索
+    search = request.GET.get('search', '').strip()
+    if search:
+        users = users.filter(
+            Q(username__icontains=search) |
+            Q(real_name__icontains=search) |
+            Q(student_id__icontains=search)
+        )
+
+    # 注解未读数和最后一条消息，按最近会话排序
+    users = annotate_chat_users(users, current_user).order_by(
+        F('last_message_at').desc(nulls_last=True),
+        'real_name'
+    )
+
+    response_data = {
+        'code': 200,
+        'message': '获取成功',
+    }
+
+    # 分页（传入page_size时生效）
+    if request.GET.get('page_size'):
+        page, error = parse_positive_int(request, 'page', 1)
+        if not error:
+            page_size, error = parse_positive_int(request, 'page_size', None, CHAT_USERS_MAX_PAGE_SIZE)
+        if error:
+            return Response({
+                'code': 400,
+                'message': error
+            }, status=status.HTTP_400_BAD_REQUEST)
+        total = users.count()
+        start = (page - 1) * page_size
+        users = users[start:start + page_size]
+        response_data['pagination'] = {
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'total_pages': (total + page_size - 1) // page_size
+        }
+
     # 序列化用户数据
     serializer = ChatUserSerializer(
         users, 
         many=True, 
         context={'request': request}
     )
-    
+    response_data['data'] = serializer.data
+
+    return Response(response_data)
+
+
+SYNC_PAGE_SIZE = 200
+BROADCAST_BATCH_SIZE = 500
+
+
+def parse_sync_cursor(request):
+    """
+    解析增量同步游标 (since, since_id)
+
+    Returns:
+        (since, since_id, error)，未传since时since为None
+    """
+    since_value = request.GET.get('since')
+    if not since_value:
+        return None, None, None
+
+    # 查询字符串中的"+"会被解码为空格
+    since = parse_datetime(since_value.replace(' ', '+'))
+    if since is None:
+        return None, None, 'since参数格式错误，应为ISO 8601时间'
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    since_id = request.GET.get('since_id')
+    if since_id:
+        try:
+            since_id = uuid.UUID(since_id)
+        except ValueError:
+            return None, None, 'since_id参数格式错误'
+
+    return since, since_id, None
+
+
+def build_sync_response(queryset, participants, since, since_id, page_size):
+    """
+    返回游标之后新建或更新的消息（按 (updated_at, id) 升序）及已读状态变化
+
+    Args:
+        queryset: 消息查询集
+        participants: 相关会话的参与者查询集，用于已读游标
+    """
+    cursor_filter = Q(updated_at__gt=since)
+    if since_id:
+        cursor_filter |= Q(updated_at=since, id__gt=since_id)
+    else:
+        cursor_filter |= Q(updated_at=since)
+
+    messages = list(
+        queryset.filter(cursor_filter)
+        .select_related('sender', 'receiver')
+        .order_by('updated_at', 'id')[:page_size + 1]
+    )
+    has_more = len(messages) > page_size
+    messages = messages[:page_size]
+
+    # 已读状态保存在会话参与者上，游标之后有变化的一并返回
+    read_states = list(
+        participants.filter(updated_at__gt=since, last_read_at__isnull=False)
+        .select_related('session')
+        .order_by('updated_at')
+    )
+
+    cursor_time, cursor_id = since, since_id
+    if messages:
+        cursor_time, cursor_id = messages[-1].updated_at, messages[-1].id
+    # 消息已全部返回时，游标可以推进到最后一次已读变化之后
+    if not has_more and read_states and read_states[-1].updated_at > cursor_time:
+        cursor_time, cursor_id = read_states[-1].updated_at, None
+    next_cursor = {'since': cursor_time.isoformat(), 'since_id': str(cursor_id) if cursor_id else None}
+
+    # 只读取本页消息所在会话的已读游标，轮询开销与会话总数无关
+    page_keys = {conversation_key(message.sender_id, message.receiver_id) for message in messages}
+    read_cursors = get_read_cursors(participants.filter(session__conversation_key__in=page_keys)) if page_keys else {}
+    serializer = ChatMessageSerializer(
+        messages,
+        many=True,
+        context={'read_cursors': read_cursors}
+    )
+
     return Response({
         'code': 200,
         'message': '获取成功',
-        'data': serializer.data
+        'data': {
+            'messages': serializer.data,
+            'read_states': [
+                {
+                    'reader_id': state.user_id,
+                    'peer_id': next(
+                        user_id for user_id in state.session.conversation_key.split(':')
+                        if user_id != str(state.user_id)
+                    ),
+                    'last_read_at': state.last_read_at,
+                }
+                for state in read_states
+            ],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
     })
 
 
@@ -83,6 +344,18 @@ def get_chat_users(request):
             location=OpenApiParameter.QUERY,
             description='每页数量'
         ),
+        OpenApiParameter(
+            name='since',
+            type=OpenApiTypes.DATETIME,
+            location=OpenApiParameter.QUERY,
+            description='增量同步：只返回该时间之后新建或更新的消息'
+        ),
+        OpenApiParameter(
+            name='since_id',
+            type=OpenApiTypes.UUID,
+            location=OpenApiParameter.QUERY,
+            description='增量同步：与since组成游标，用于区分同一时间的消息'
+        ),
     ],
     responses={200: ChatMessageSerializer(many=True)}
 )
@@ -112,6 +385,25 @@ def get_chat_messages(request, user_id):
         Q(sender=current_user, receiver=other_user) |
         Q(sender=other_user, receiver=current_user)
     ).order_by('-created_at')
+    participants = ChatParticipant.objects.filter(
+        session__conversation_key=conversation_key(current_user.id, other_user.id)
+    )
+
+    # 增量同步模式
+    since, since_id, error = parse_sync_cursor(request)
+    if error:
+        return Response({
+            'code': 400,
+            'message': error
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if since is not None:
+        page_size, error = parse_positive_int(request, 'page_size', SYNC_PAGE_SIZE, SYNC_PAGE_SIZE)
+        if error:
+            return Response({
+                'code': 400,
+                'message': error
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return build_sync_response(messages, participants, since, since_id, page_size)
     
     # 分页
     page = int(request.GET.get('page', 1))
@@ -121,7 +413,11 @@ def get_chat_messages(request, user_id):
     page_obj = paginator.get_page(page)
     
     # 序列化消息
-    serializer = ChatMessageSerializer(page_obj.object_list, many=True)
+    serializer = ChatMessageSerializer(
+        page_obj.object_list,
+        many=True,
+        context={'read_cursors': get_read_cursors(participants)}
+    )
     
     return Response({
         'code': 200,
@@ -156,8 +452,12 @@ def send_message(request):
     if serializer.is_valid():
         message = serializer.save()
         
-        # 返回创建的消息
-        response_serializer = ChatMessageSerializer(message)
+        # 返回创建的消息（新消息必然未读，无需查询已读游标）
+        response_serializer = ChatMessageSerializer(message, context={'read_cursors': {}})
+
+        # 推送新消息事件（接收者及发送者的其他客户端）
+        publish_to_user(message.receiver_id, 'message', response_serializer.data)
+        publish_to_user(message.sender_id, 'message', response_serializer.data)
         return Response({
             'code': 201,
             'message': '发送成功',
@@ -171,6 +471,82 @@ def send_message(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    summary="群发消息",
+    description="教师向多个学生（或所有学生）发送同一条消息，所有消息在一个请求内批量写入",
+    request=BroadcastMessageSerializer
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def broadcast_message(request):
+    """教师群发消息"""
+    current_user = request.user
+    if current_user.role != 'teacher':
+        return Response({
+            'code': 403,
+            'message': '只有教师可以群发消息'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = BroadcastMessageSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '发送失败',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # 一次查询完成接收者的角色与课程范围校验
+    receivers = visible_students(current_user).filter(is_active=True)
+    receiver_ids = serializer.validated_data.get('receiver_ids')
+    if not serializer.validated_data['all_students']:
+        receivers = receivers.filter(id__in=set(receiver_ids))
+    receivers = list(receivers.only('id', 'real_name', 'role'))
+
+    if not receivers:
+        return Response({
+            'code': 400,
+            'message': '没有可发送的学生'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    content = serializer.validated_data['content']
+    messages = [
+        ChatMessage(sender=current_user, receiver=receiver, content=content)
+        for receiver in receivers
+    ]
+
+    with transaction.atomic():
+        sessions = ChatSession.get_for_peers(current_user.id, [receiver.id for receiver in receivers])
+        ChatMessage.objects.bulk_create(messages, batch_size=BROADCAST_BATCH_SIZE)
+
+        # 每个接收者的未读数各加1，一条UPDATE完成
+        ChatParticipant.objects.filter(
+            session__in=list(sessions.values()),
+            user__in=receivers
+        ).update(unread_count=F('unread_count') + 1)
+        ChatSession.objects.filter(
+            pk__in=[session.pk for session in sessions.values()]
+        ).update(updated_at=timezone.now())
+
+        # 推送新消息事件
+        message_data = ChatMessageSerializer(messages, many=True, context={'read_cursors': {}}).data
+        for message, data in zip(messages, message_data):
+            publish_to_user(message.receiver_id, 'message', data)
+        publish_to_user(current_user.id, 'broadcast', {
+            'content': content,
+            'receiver_count': len(messages)
+        })
+
+    skipped = 0 if serializer.validated_data['all_students'] else len(set(receiver_ids)) - len(receivers)
+    return Response({
+        'code': 201,
+        'message': f'已发送给 {len(messages)} 名学生',
+        'data': {
+            'sent_count': len(messages),
+            'skipped_count': skipped
+        }
+    }, status=status.HTTP_201_CREATED)
+
+
 @extend_schema(
     summary="标记消息为已读",
     description="标记与指定用户的所有未读消息为已读",
@@ -197,12 +573,38 @@ def mark_messages_read(request, user_id):
             'message': '用户不存在'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    # 标记对方发给当前用户的未读消息为已读
-    updated_count = ChatMessage.objects.filter(
-        sender=other_user,
-        receiver=current_user,
-        is_read=False
-    ).update(is_read=True)
+    # 只需更新当前用户在该会话中的已读游标和未读数（单行更新）
+    participants = ChatParticipant.objects.filter(
+        session__conversation_key=conversation_key(current_user.id, other_user.id),
+        user=current_user
+    )
+    updated_count = 0
+    read_at = timezone.now()
+    while True:
+        participant = participants.values('pk', 'unread_count').first()
+        if participant is None:
+            break
+        read_at = timezone.now()
+        # 仅当未读数仍是刚读到的值时清零；期间有新消息计入时重新读取，避免覆盖并发的递增
+        updated = ChatParticipant.objects.filter(
+            pk=participant['pk'],
+            unread_count=participant['unread_count']
+        ).update(
+            unread_count=0,
+            last_read_at=read_at,
+            updated_at=read_at
+        )
+        if updated:
+            updated_count = participant['unread_count']
+            break
+
+    # 推送已读回执给对方
+    if updated_count:
+        publish_to_user(other_user.id, 'read', {
+            'reader_id': str(current_user.id),
+            'count': updated_count,
+            'read_at': read_at
+        })
     
     return Response({
         'code': 200,
@@ -220,11 +622,10 @@ def get_unread_count(request):
     """获取未读消息数量"""
     current_user = request.user
     
-    # 统计当前用户的未读消息总数
-    total_unread = ChatMessage.objects.filter(
-        receiver=current_user,
-        is_read=False
-    ).count()
+    # 汇总当前用户各会话维护的未读数
+    total_unread = ChatParticipant.objects.filter(
+        user=current_user
+    ).aggregate(total=Sum('unread_count'))['total'] or 0
     
     return Response({
         'code': 200,
@@ -232,4 +633,139 @@ def get_unread_count(request):
         'data': {
             'total_unread': total_unread
         }
-    })
\ No newline at end of file
+    })
+
+
+@extend_schema(
+    summary="增量同步所有会话",
+    description="返回当前用户所有会话中游标之后新建或更新的消息，没有变化时返回空列表",
+    parameters=[
+        OpenApiParameter(
+            name='since',
+            type=OpenApiTypes.DATETIME,
+            location=OpenApiParameter.QUERY,
+            description='上次同步的游标时间（必填）'
+        ),
+        OpenApiParameter(
+            name='since_id',
+            type=OpenApiTypes.UUID,
+            location=OpenApiParameter.QUERY,
+            description='上次同步的游标消息ID'
+        ),
+        OpenApiParameter(
+            name='page_size',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='每次最多返回的消息数（最大200）'
+        ),
+    ],
+    responses={200: ChatMessageSerializer(many=True)}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_messages(request):
+    """增量同步当前用户所有会话的消息"""
+    since, since_id, error = parse_sync_cursor(request)
+    if error or since is None:
+        return Response({
+            'code': 400,
+            'message': error or '缺少since参数'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    current_user = request.user
+    messages = ChatMessage.objects.filter(
+        Q(sender=current_user) | Q(receiver=current_user)
+    )
+    participants = ChatParticipant.objects.filter(session__members__user=current_user)
+    page_size, error = parse_positive_int(request, 'page_size', SYNC_PAGE_SIZE, SYNC_PAGE_SIZE)
+    if error:
+        return Response({
+            'code': 400,
+            'message': error
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return build_sync_response(messages, participants, since, since_id, page_size)
+
+
+def _parse_cursor(value):
+    """解析事件游标，无效时返回None"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+@extend_schema(
+    summary="订阅实时事件（SSE）",
+    description="以 text/event-stream 推送新消息（message）和已读回执（read）事件。"
+                "浏览器 EventSource 可通过 ?token= 传递访问令牌，断线重连时自动携带 Last-Event-ID",
+    parameters=[
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='从该事件序号之后开始推送（可选）'
+        ),
+    ]
+)
+@api_view(['GET'])
+@authentication_classes([QueryTokenJWTAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def stream_events(request):
+    """SSE实时事件流"""
+    cursor = _parse_cursor(request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('cursor'))
+
+    response = StreamingHttpResponse(
+        stream_user_events(request.user.id, cursor),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@extend_schema(
+    summary="长轮询获取实时事件",
+    description="SSE不可用时的降级方案：返回游标之后的事件，没有新事件时最多等待timeout秒",
+    parameters=[
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='上次返回的游标，不传则返回当前最新游标'
+        ),
+        OpenApiParameter(
+            name='timeout',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='最长等待秒数（默认25，最大60）'
+        ),
+    ]
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def poll_events(request):
+    """长轮询获取实时事件"""
+    broker = get_broker()
+    channel = user_channel(request.user.id)
+    cursor = _parse_cursor(request.GET.get('cursor'))
+
+    if cursor is None:
+        # 首次请求只返回当前游标
+        events = []
+        cursor = broker.latest_cursor(channel)
+    else:
+        timeout = _parse_cursor(request.GET.get('timeout'))
+        timeout = min(max(25 if timeout is None else timeout, 0), 60)
+        events = broker.wait(channel, cursor, timeout=timeout)
+        if events:
+            cursor = events[-1]['id']
+
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'events': events,
+            'cursor': cursor
+        }
+    })
@@ -0,0 +1,33 @@
+from django.contrib import admin
+from .models import Course, CourseMembership
+
+
+class CourseMembershipInline(admin.TabularInline):
+    model = CourseMembership
+    extra = 0
+    raw_id_fields = ('user',)
+
+
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    """课程管理"""
+    list_display = ('name', 'code', 'created_by', 'created_at')
+    search_fields = ('name', 'code', 'created_by__username', 'created_by__real_name')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-created_at',)
+    inlines = [CourseMembershipInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('created_by')
+
+
+@admin.register(CourseMembership)
+class CourseMembershipAdmin(admin.ModelAdmin):
+    """课程成员管理"""
+    list_display = ('course', 'user', 'role', 'joined_at')
+    list_filter = ('role', 'course')
+    search_fields = ('course__name', 'user__username', 'user__real_name', 'user__student_id')
+    raw_id_fields = ('user',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('course', 'user')
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:25
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, verbose_name='课程名称')),
+                ('code', models.CharField(blank=True, max_length=50, verbose_name='课程代码')),
+                ('description', models.TextField(blank=True, verbose_name='课程描述')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_courses', to=settings.AUTH_USER_MODEL, verbose_name='创建者')),
+            ],
+            options={
+                'verbose_name': '课程',
+                'verbose_name_plural': '课程',
+                'db_table': 'courses',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('teacher', '教师'), ('student', '学生')], max_length=10, verbose_name='课程角色')),
+                ('joined_at', models.DateTimeField(auto_now_add=True, verbose_name='加入时间')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='courses.course', verbose_name='课程')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_memberships', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '课程成员',
+                'verbose_name_plural': '课程成员',
+                'db_table': 'course_memberships',
+                'indexes': [models.Index(fields=['user', 'role', 'course'], name='course_member_user_idx'), models.Index(fields=['course', 'role', 'user'], name='course_member_roster_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course', 'user'), name='course_membership_unique')],
+            },
+        ),
+    ]
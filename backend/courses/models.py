@@ -0,0 +1,68 @@
+import uuid
+from django.db import models
+from django.conf import settings
+
+
+class Course(models.Model):
+    """课程（教学班）模型，教师与学生通过成员关系加入"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=100, verbose_name='课程名称')
+    code = models.CharField(max_length=50, blank=True, verbose_name='课程代码')
+    description = models.TextField(blank=True, verbose_name='课程描述')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='created_courses',
+        verbose_name='创建者'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'courses'
+        verbose_name = '课程'
+        verbose_name_plural = '课程'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class CourseMembership(models.Model):
+    """课程成员（教师或学生）"""
+    ROLE_CHOICES = [
+        ('teacher', '教师'),
+        ('student', '学生'),
+    ]
+
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='memberships',
+        verbose_name='课程'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='course_memberships',
+        verbose_name='用户'
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, verbose_name='课程角色')
+    joined_at = models.DateTimeField(auto_now_add=True, verbose_name='加入时间')
+
+    class Meta:
+        db_table = 'course_memberships'
+        verbose_name = '课程成员'
+        verbose_name_plural = '课程成员'
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'user'], name='course_membership_unique'),
+        ]
+        indexes = [
+            # 用户所在课程（教师的课程列表、学生的课程列表）
+            models.Index(fields=['user', 'role', 'course'], name='course_member_user_idx'),
+            # 课程名单（按角色取学生或教师）
+            models.Index(fields=['course', 'role', 'user'], name='course_member_roster_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course.name} - {self.user_id} ({self.get_role_display()})"
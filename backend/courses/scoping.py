@@ -0,0 +1,106 @@
+"""
+课程范围 - 按课程成员关系确定教师与学生能看到的学生、教师和作业
+
+教师的查询通过成员表（按 (course, role, user) 建有索引）连接到自己课程的名单，
+查询代价随教师自己的学生人数增长，而不是随全校人数增长。
+
+兼容尚未建立课程的数据：教师没有加入任何课程时仍可见全部学生，
+学生没有加入任何课程时仍可见全部教师和未指定课程的作业（课程作业只对课程学生可见）。
+"""
+
+from collections import defaultdict
+
+from django.db.models import Q, Exists, OuterRef
+
+from .models import CourseMembership
+
+try:
+    from accounts.models import User
+except ImportError:
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+
+def course_ids_for(user, role):
+    """用户以指定角色加入的课程ID列表"""
+    return list(
+        CourseMembership.objects.filter(user=user, role=role).values_list('course_id', flat=True)
+    )
+
+
+def course_member_ids(course_ids, role):
+    """课程中指定角色成员的用户ID（子查询，不加载到内存）"""
+    return CourseMembership.objects.filter(course_id__in=course_ids, role=role).values('user_id')
+
+
+def roster_students(teacher):
+    """教师所教课程的学生名单，教师没有课程时返回None（不限范围）"""
+    course_ids = course_ids_for(teacher, 'teacher')
+    if not course_ids:
+        return None
+    return User.objects.filter(role='student', id__in=course_member_ids(course_ids, 'student'))
+
+
+def roster_assignments(teacher, queryset):
+    """教师课程范围内的作业（自己创建的与所教课程的），教师没有课程时返回None（不限范围）"""
+    course_ids = course_ids_for(teacher, 'teacher')
+    if not course_ids:
+        return None
+    return queryset.filter(Q(created_by=teacher) | Q(course_id__in=course_ids))
+
+
+def visible_students(teacher):
+    """教师可见的学生：所教课程的学生，没有课程时为全部学生"""
+    roster = roster_students(teacher)
+    return roster if roster is not None else User.objects.filter(role='student')
+
+
+def visible_teachers(student):
+    """学生可见的教师：所在课程的教师，没有课程时为全部教师"""
+    course_ids = course_ids_for(student, 'student')
+    teachers = User.objects.filter(role='teacher')
+    if not course_ids:
+        return teachers
+    return teachers.filter(id__in=course_member_ids(course_ids, 'teacher'))
+
+
+def visible_assignments(user, queryset):
+    """
+    按课程过滤作业查询集
+
+    - 教师：自己创建的作业，以及所教课程的作业
+    - 学生：所在课程的作业与未指定课程的作业；没有加入课程时只有未指定课程的作业
+    """
+    if user.role == 'teacher':
+        course_ids = course_ids_for(user, 'teacher')
+        if not course_ids:
+            return queryset.filter(created_by=user)
+        return queryset.filter(Q(created_by=user) | Q(course_id__in=course_ids))
+
+    course_ids = course_ids_for(user, 'student')
+    if not course_ids:
+        return queryset.filter(course__isnull=True)
+    return queryset.filter(Q(course__isnull=True) | Q(course_id__in=course_ids))
+
+
+def student_course_ids(student_ids):
+    """多名学生各自加入的课程ID（一次查询）：{学生ID: set(课程ID)}，没有课程的学生不在结果中"""
+    course_ids = defaultdict(set)
+    memberships = CourseMembership.objects.filter(user_id__in=student_ids, role='student')
+    for user_id, course_id in memberships.values_list('user_id', 'course_id'):
+        course_ids[user_id].add(course_id)
+    return course_ids
+
+
+def student_visible_submissions(queryset):
+    """
+    只保留提交学生可见的作业下的提交（未指定课程的作业，或学生所在课程的作业）
+
+    按每条提交的学生关联成员表，用于多名学生的分组查询，结果与逐个学生使用 visible_assignments 一致。
+    """
+    membership = CourseMembership.objects.filter(
+        user_id=OuterRef('student_id'),
+        course_id=OuterRef('assignment__course_id'),
+        role='student'
+    )
+    return queryset.filter(Q(assignment__course__isnull=True) | Exists(membership))
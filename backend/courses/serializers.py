@@ -0,0 +1,53 @@
+from rest_framework import serializers
+from .models import Course, CourseMembership
+
+
+class CourseCreateSerializer(serializers.ModelSerializer):
+    """课程创建序列化器"""
+    student_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=True,
+        write_only=True,
+        help_text="初始学生ID列表（可选）"
+    )
+
+    class Meta:
+        model = Course
+        fields = ['name', 'code', 'description', 'student_ids']
+
+
+class CourseMembersSerializer(serializers.Serializer):
+    """课程成员添加序列化器"""
+    student_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        help_text="学生ID列表"
+    )
+
+
+class CourseListSerializer(serializers.ModelSerializer):
+    """课程列表序列化器"""
+    created_by_name = serializers.CharField(source='created_by.real_name', read_only=True)
+    student_count = serializers.IntegerField(read_only=True)
+    teacher_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = [
+            'id', 'name', 'code', 'description', 'created_by_name',
+            'student_count', 'teacher_count', 'created_at', 'updated_at'
+        ]
+
+
+class CourseMemberSerializer(serializers.ModelSerializer):
+    """课程成员序列化器"""
+    id = serializers.UUIDField(source='user.id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    real_name = serializers.CharField(source='user.real_name', read_only=True)
+    student_id = serializers.CharField(source='user.student_id', read_only=True)
+    role_display = serializers.CharField(source='get_role_display', read_only=True)
+
+    class Meta:
+        model = CourseMembership
+        fields = ['id', 'username', 'real_name', 'student_id', 'role', 'role_display', 'joined_at']
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'courses'
+
+urlpatterns = [
+    path('create/', views.create_course, name='create_course'),  # POST - 创建课程
+    path('list/', views.list_courses, name='list_courses'),  # GET - 我的课程
+    path('<uuid:course_id>/', views.get_course_detail, name='course_detail'),  # GET - 课程详情
+    path('<uuid:course_id>/members/', views.add_course_members, name='add_course_members'),  # POST - 添加学生
+    path('<uuid:course_id>/members/<uuid:user_id>/', views.remove_course_member, name='remove_course_member'),  # DELETE - 移除学生
+]
@@ -0,0 +1,221 @@
+from rest_framework import status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import Count, Q
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema, OpenApiResponse
+
+from .models import Course, CourseMembership
+from .serializers import (
+    CourseCreateSerializer,
+    CourseMembersSerializer,
+    CourseListSerializer,
+    CourseMemberSerializer
+)
+
+try:
+    from accounts.models import User
+except ImportError:
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+
+class IsTeacher(permissions.BasePermission):
+    """教师权限"""
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.role == 'teacher'
+
+
+def with_member_counts(queryset):
+    return queryset.annotate(
+        student_count=Count('memberships', filter=Q(memberships__role='student')),
+        teacher_count=Count('memberships', filter=Q(memberships__role='teacher'))
+    )
+
+
+def add_students(course, student_ids):
+    """将学生加入课程（已在课程中的学生忽略），返回新加入的人数"""
+    students = User.objects.filter(id__in=set(student_ids), role='student').values_list('id', flat=True)
+    existing = set(
+        CourseMembership.objects.filter(course=course, user_id__in=students).values_list('user_id', flat=True)
+    )
+    memberships = [
+        CourseMembership(course=course, user_id=student_id, role='student')
+        for student_id in students if student_id not in existing
+    ]
+    CourseMembership.objects.bulk_create(memberships, ignore_conflicts=True)
+    return len(memberships)
+
+
+def is_course_teacher(course, user):
+    return CourseMembership.objects.filter(course=course, user=user, role='teacher').exists()
+
+
+@extend_schema(
+    request=CourseCreateSerializer,
+    responses={
+        201: OpenApiResponse(description="课程创建成功"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="教师创建课程，创建者自动成为课程教师，可同时加入初始学生"
+)
+@api_view(['POST'])
+@permission_classes([IsTeacher])
+def create_course(request):
+    """创建课程 - 仅教师"""
+    serializer = CourseCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '课程创建失败',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    student_ids = serializer.validated_data.pop('student_ids', [])
+    with transaction.atomic():
+        course = serializer.save(created_by=request.user)
+        CourseMembership.objects.create(course=course, user=request.user, role='teacher')
+        added = add_students(course, student_ids)
+
+    return Response({
+        'code': 201,
+        'message': '课程创建成功',
+        'data': {
+            'course_id': str(course.id),
+            'name': course.name,
+            'student_count': added,
+            'created_at': course.created_at
+        }
+    }, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    responses={
+        200: OpenApiResponse(description="获取成功"),
+    },
+    description="获取我的课程列表（教师为所教课程，学生为所在课程）"
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def list_courses(request):
+    """获取课程列表"""
+    role = 'teacher' if request.user.role == 'teacher' else 'student'
+    course_ids = CourseMembership.objects.filter(user=request.user, role=role).values('course_id')
+    courses = with_member_counts(
+        Course.objects.filter(id__in=course_ids).select_related('created_by')
+    )
+
+    serializer = CourseListSerializer(courses, many=True)
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': serializer.data
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    responses={
+        200: OpenApiResponse(description="获取成功"),
+        403: OpenApiResponse(description="权限不足"),
+        404: OpenApiResponse(description="课程不存在"),
+    },
+    description="获取课程详情（课程成员可见；课程教师可见完整名单，学生只可见课程教师）"
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_course_detail(request, course_id):
+    """获取课程详情"""
+    course = get_object_or_404(with_member_counts(Course.objects.select_related('created_by')), id=course_id)
+    membership = CourseMembership.objects.filter(course=course, user=request.user).first()
+    if membership is None:
+        return Response({
+            'code': 403,
+            'message': '权限不足，只能查看自己所在的课程'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    members = course.memberships.select_related('user').order_by('role', 'user__student_id', 'user__real_name')
+    if membership.role != 'teacher':
+        members = members.filter(role='teacher')
+
+    data = CourseListSerializer(course).data
+    data['members'] = CourseMemberSerializer(members, many=True).data
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': data
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=CourseMembersSerializer,
+    responses={
+        200: OpenApiResponse(description="添加成功"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+        404: OpenApiResponse(description="课程不存在"),
+    },
+    description="课程教师添加学生（已在课程中的学生与非学生用户忽略）"
+)
+@api_view(['POST'])
+@permission_classes([IsTeacher])
+def add_course_members(request, course_id):
+    """添加课程学生"""
+    course = get_object_or_404(Course, id=course_id)
+    if not is_course_teacher(course, request.user):
+        return Response({
+            'code': 403,
+            'message': '权限不足，只有课程教师可以管理成员'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = CourseMembersSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    added = add_students(course, serializer.validated_data['student_ids'])
+    return Response({
+        'code': 200,
+        'message': '添加成功',
+        'data': {
+            'course_id': str(course.id),
+            'added_count': added,
+            'student_count': course.memberships.filter(role='student').count()
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    responses={
+        200: OpenApiResponse(description="移除成功"),
+        403: OpenApiResponse(description="权限不足"),
+        404: OpenApiResponse(description="课程或学生不存在"),
+    },
+    description="课程教师将学生移出课程"
+)
+@api_view(['DELETE'])
+@permission_classes([IsTeacher])
+def remove_course_member(request, course_id, user_id):
+    """移除课程学生"""
+    course = get_object_or_404(Course, id=course_id)
+    if not is_course_teacher(course, request.user):
+        return Response({
+            'code': 403,
+            'message': '权限不足，只有课程教师可以管理成员'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    deleted, _ = CourseMembership.objects.filter(course=course, user_id=user_id, role='student').delete()
+    if not deleted:
+        return Response({
+            'code': 404,
+            'message': '该学生不在课程中'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'code': 200,
+        'message': '移除成功'
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,187 @@
+"""
+会话消息合并模块 - 同一会话的并发消息串行处理
+
+学生重复发送或多个标签页同时向同一会话发消息时，后到的消息不会并行触发AI调用，
+而是排队等待当前调用结束；排队期间到达的多条消息会合并为一次AI调用，
+所有等待者得到同一份回答，消息写入顺序与到达顺序一致。
+
+每个请求只负责处理一个批次：批次完成后先唤醒批次内的请求，再把处理权交给排在队首的等待者，
+因此请求的等待时间只取决于它前面的批次，不会因为会话上持续到达新消息而无限延长。
+
+注意：状态保存在进程内存中，只对同一进程内的并发请求生效。
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+def merge_pending_messages(messages: List[str]) -> List[str]:
+    """合并排队中的消息：去掉连续重复（重复发送）的消息，保持到达顺序"""
+    merged = []
+    for message in messages:
+        if not merged or merged[-1].strip() != message.strip():
+            merged.append(message)
+    return merged
+
+
+class _PendingMessage:
+    """等待处理的消息"""
+
+    def __init__(self, message):
+        self.message = message
+        self.result = None
+        self.error = None
+        self.promoted = False  # 被指定为下一批次的处理者
+        self.done = threading.Event()
+
+
+class _AsyncPendingMessage:
+    """等待处理的消息（异步版本）"""
+
+    def __init__(self, message, loop):
+        self.message = message
+        self.result = loop.create_future()
+        self.promoted = loop.create_future()
+
+
+class _SessionState:
+    """单个会话的处理状态"""
+
+    def __init__(self):
+        self.running = False
+        self.pending: List[Any] = []
+
+
+class SessionMessageGate:
+    """按会话串行化并合并消息处理（同步/线程版本，用于WSGI视图）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[Any, _SessionState] = {}
+
+    def submit(self, session_id, message: str, handler: Callable[[List[str]], str]) -> str:
+        """
+        提交一条消息并等待AI回答
+
+        Args:
+            session_id: 会话ID
+            message: 用户消息
+            handler: 处理函数，接收合并后的消息列表，返回AI回答
+
+        Returns:
+            该消息所在批次的AI回答
+        """
+        entry = _PendingMessage(message)
+
+        with self._lock:
+            state = self._states.setdefault(session_id, _SessionState())
+            state.pending.append(entry)
+            is_leader = not state.running
+            state.running = True
+
+        if not is_leader:
+            # 被唤醒时要么已经得到回答，要么轮到自己处理队列中的下一批次
+            entry.done.wait()
+        if is_leader or entry.promoted:
+            self._process(session_id, state, handler)
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.result
+
+    def _process(self, session_id, state, handler):
+        """处理队列中当前的全部消息（一个批次，包含自己的消息），完成后交出处理权"""
+        with self._lock:
+            batch, state.pending = state.pending, []
+
+        try:
+            result = handler(merge_pending_messages([item.message for item in batch]))
+            for item in batch:
+                item.result = result
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.done.set()
+            with self._lock:
+                if state.pending:
+                    successor = state.pending[0]
+                    successor.promoted = True
+                    successor.done.set()
+                else:
+                    state.running = False
+                    self._states.pop(session_id, None)
+
+
+class AsyncSessionMessageGate:
+    """按会话串行化并合并消息处理（异步版本，用于ASGI视图）"""
+
+    def __init__(self):
+        self._states: Dict[Any, _SessionState] = {}
+
+    async def submit(self, session_id, message: str, handler: Callable[[List[str]], Awaitable[str]]) -> str:
+        """提交一条消息并等待AI回答，参数含义同 SessionMessageGate.submit"""
+        loop = asyncio.get_running_loop()
+        # asyncio原语不能跨事件循环使用，按事件循环区分状态
+        key = (loop, session_id)
+        entry = _AsyncPendingMessage(message, loop)
+
+        state = self._states.setdefault(key, _SessionState())
+        state.pending.append(entry)
+
+        if state.running:
+            try:
+                await asyncio.wait([entry.result, entry.promoted], return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                self._abandon(key, state, entry)
+                raise
+            if entry.result.done():
+                return entry.result.result()
+        else:
+            state.running = True
+
+        await self._process(key, state, handler)
+        return entry.result.result()
+
+    async def _process(self, key, state, handler):
+        """处理队列中当前的全部消息（批次第一条是自己的消息），完成后交出处理权"""
+        batch, state.pending = state.pending, []
+        try:
+            result = await handler(merge_pending_messages([item.message for item in batch]))
+        except asyncio.CancelledError:
+            # 当前请求被取消：其余请求的消息放回队首，由下一个请求接手处理，而不是取消它们
+            state.pending[:0] = batch[1:]
+            raise
+        except Exception as e:
+            for item in batch:
+                if not item.result.done():
+                    item.result.set_exception(e)
+        else:
+            for item in batch:
+                if not item.result.done():
+                    item.result.set_result(result)
+        finally:
+            self._hand_off(key, state)
+
+    def _hand_off(self, key, state):
+        """把处理权交给队首的等待者，队列为空时结束"""
+        if state.pending:
+            successor = state.pending[0]
+            if not successor.promoted.done():
+                successor.promoted.set_result(True)
+        else:
+            state.running = False
+            self._states.pop(key, None)
+
+    def _abandon(self, key, state, entry):
+        """等待中的请求被取消：移出队列，已被指定为处理者时把处理权交给下一个"""
+        if entry in state.pending:
+            state.pending.remove(entry)
+        if entry.promoted.done():
+            self._hand_off(key, state)
+
+
+session_gate = SessionMessageGate()
+async_session_gate = AsyncSessionMessageGate()
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa', '0002_alter_qaanswer_options_alter_qaquestion_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='qamessage',
+            index=models.Index(fields=['session', 'created_at'], name='qa_msg_session_created_idx'),
+        ),
+    ]
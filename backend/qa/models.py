@@ -49,6 +49,10 @@ class QAMessage(models.Model):
         verbose_name = '问答消息'
         verbose_name_plural = '问答消息'
         ordering = ['created_at']
+        indexes = [
+            # 报告按会话分区取前N条消息（窗口函数）
+            models.Index(fields=['session', 'created_at'], name='qa_msg_session_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_role_display()} - {self.content[:50]}"
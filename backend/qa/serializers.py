@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import QASession, QAMessage, QAQuestion, QAAnswer
-from ai_services import ask_gemini
+from ai_services import ask_gemini, ask_gemini_async
+import re
 
 
 # 新的会话和消息序列化器
@@ -82,6 +83,36 @@ class ChatMessageCreateSerializer(serializers.Serializer):
         """获取上下文消息"""
         return session.messages.order_by('-created_at')[:limit][::-1]
 
+    async def acreate_or_get_session(self, student, subject="通用"):
+        """创建或获取会话（异步）"""
+        session_id = self.validated_data.get('session_id')
+
+        if session_id:
+            try:
+                return await QASession.objects.aget(id=session_id, student=student)
+            except QASession.DoesNotExist:
+                raise serializers.ValidationError("会话不存在")
+
+        return await QASession.objects.acreate(
+            student=student,
+            subject=subject
+        )
+
+    async def asave_message(self, session, role, content):
+        """保存消息（异步）"""
+        return await QAMessage.objects.acreate(
+            session=session,
+            role=role,
+            content=content
+        )
+
+    async def aget_context_messages(self, session, limit=10):
+        """获取上下文消息（异步）"""
+        messages = [
+            message async for message in session.messages.order_by('-created_at')[:limit]
+        ]
+        return messages[::-1]
+
 
 # 保留旧的序列化器以兼容现有API
 class QAQuestionCreateSerializer(serializers.ModelSerializer):
@@ -114,25 +145,41 @@ class QAQuestionCreateSerializer(serializers.ModelSerializer):
 
         return question
     
-    def _generate_ai_answer(self, question):
-        """使用AI生成回答 - 使用XML标签格式"""
-        try:
-            # 构建提示词
-            prompt = f"""
+    async def acreate(self, validated_data):
+        """创建问题并生成AI回答（异步）"""
+        question = await QAQuestion.objects.acreate(
+            student=self.context['student'],
+            **validated_data
+        )
+
+        ai_answer = await self._agenerate_ai_answer(question)
+
+        await QAAnswer.objects.acreate(
+            question=question,
+            ai_answer=ai_answer
+        )
+
+        question.ai_answer = ai_answer
+
+        return question
+
+    def _build_ai_prompt(self, question):
+        """构建AI回答提示词 - 使用XML标签格式"""
+        prompt = f"""
 你是一位专业的AI助教，请回答学生的问题。
 
 学生问题：{question.question_text}
 """
-            
-            # 如果有学科信息，添加到提示词中
-            if question.subject:
-                prompt += f"学科领域：{question.subject}\n"
-            
-            # 如果有上下文信息，添加到提示词中
-            if question.context:
-                prompt += f"问题背景：{question.context}\n"
-            
-            prompt += """
+        
+        # 如果有学科信息，添加到提示词中
+        if question.subject:
+            prompt += f"学科领域：{question.subject}\n"
+        
+        # 如果有上下文信息，添加到提示词中
+        if question.context:
+            prompt += f"问题背景：{question.context}\n"
+        
+        prompt += """
 请提供准确、详细、易懂的回答。回答应该：
 1. 直接回答问题的核心
 2. 提供必要的解释和背景知识
@@ -143,21 +190,31 @@ class QAQuestionCreateSerializer(serializers.ModelSerializer):
 
 <answer>详细的回答内容</answer>
 """
-            
-            ai_response = ask_gemini(prompt, temperature=0.7)
-            
-            # 解析AI回答
-            try:
-                import re
-                answer_match = re.search(r'<answer>(.*?)</answer>', ai_response, re.DOTALL)
-                if answer_match:
-                    answer = answer_match.group(1).strip()
-                    return answer
-                else:
-                    return ai_response.strip()
-            except Exception as parse_error:
-                return ai_response.strip()
-                
+        return prompt
+
+    def _parse_ai_answer(self, ai_response):
+        """解析AI回答"""
+        try:
+            answer_match = re.search(r'<answer>(.*?)</answer>', ai_response, re.DOTALL)
+            if answer_match:
+                return answer_match.group(1).strip()
+            return ai_response.strip()
+        except Exception:
+            return ai_response.strip()
+
+    def _generate_ai_answer(self, question):
+        """使用AI生成回答"""
+        try:
+            ai_response = ask_gemini(self._build_ai_prompt(question), temperature=0.7)
+            return self._parse_ai_answer(ai_response)
+        except Exception as e:
+            return f"抱歉，AI助教暂时无法回答您的问题。请稍后重试或联系人工老师。错误信息：{str(e)}"
+
+    async def _agenerate_ai_answer(self, question):
+        """使用AI生成回答（异步）"""
+        try:
+            ai_response = await ask_gemini_async(self._build_ai_prompt(question), temperature=0.7)
+            return self._parse_ai_answer(ai_response)
         except Exception as e:
             return f"抱歉，AI助教暂时无法回答您的问题。请稍后重试或联系人工老师。错误信息：{str(e)}"
 
@@ -13,9 +13,17 @@ from .serializers import (
     QAQuestionDetailSerializer,
     QAQuestionListSerializer
 )
-from ai_services import ask_gemini
+from ai_services import ask_gemini, ask_gemini_async
+from async_api import async_api_view, json_response
+from .coalescing import session_gate, async_session_gate
+from asgiref.sync import sync_to_async
 import json
 
+try:
+    from reports.mastery import student_mastery_summary
+except ImportError:
+    student_mastery_summary = None
+
 
 class IsStudent(permissions.BasePermission):
     """学生权限"""
@@ -29,6 +37,41 @@ class IsTeacher(permissions.BasePermission):
         return request.user.is_authenticated and request.user.role == 'teacher'
 
 
+def tutor_weak_points(student, subject):
+    """学生在会话科目中的薄弱知识点（直接读取掌握度表），通用会话不限科目"""
+    if student_mastery_summary is None:
+        return []
+    subjects = [subject] if subject and subject != '通用' else None
+    return student_mastery_summary(student, subjects)['weak']
+
+
+def build_chat_prompt(context_messages, user_message, weak_points=None):
+    """根据对话历史构建AI提示词"""
+    context_text = ""
+    for msg in context_messages:
+        role_text = "用户" if msg.role == 'user' else "AI助手"
+        context_text += f"{role_text}: {msg.content}\n"
+
+    mastery_text = ""
+    if weak_points:
+        mastery_text = f"""
+该学生作业中掌握较薄弱的知识点（recent 为近期得分率%）：
+{json.dumps(weak_points, ensure_ascii=False, separators=(',', ':'))}
+如果问题涉及这些知识点，请讲解得更细致，并指出常见的易错点。
+"""
+
+    return f"""
+你是一位专业的AI助教，请根据对话历史回答学生的问题。
+{mastery_text}
+对话历史：
+{context_text}
+
+用户: {user_message}
+
+请提供详细、准确的回答。如果是编程问题，请提供代码示例。
+"""
+
+
 # 新的聊天API
 @extend_schema(
     request=ChatMessageCreateSerializer,
@@ -57,38 +100,31 @@ def chat_message(request):
         subject = serializer.validated_data.get('subject', '通用')
         session = serializer.create_or_get_session(request.user, subject)
 
-        # 保存用户消息
-        user_message = serializer.validated_data['message']
-        serializer.save_message(session, 'user', user_message)
-
-        # 获取上下文消息
-        context_messages = serializer.get_context_messages(session)
-
-        # 构建AI提示词
-        context_text = ""
-        for msg in context_messages:
-            role_text = "用户" if msg.role == 'user' else "AI助手"
-            context_text += f"{role_text}: {msg.content}\n"
+        def answer_messages(user_messages):
+            # 保存用户消息（同一会话排队期间到达的消息会合并到一起处理）
+            for message in user_messages:
+                serializer.save_message(session, 'user', message)
 
-        prompt = f"""
-你是一位专业的AI助教，请根据对话历史回答学生的问题。
+            # 获取上下文消息
+            context_messages = serializer.get_context_messages(session)
 
-对话历史：
-{context_text}
-
-用户: {user_message}
+            # 构建AI提示词（附带学生在该科目的薄弱知识点）
+            weak_points = tutor_weak_points(request.user, session.subject)
+            prompt = build_chat_prompt(context_messages, '\n'.join(user_messages), weak_points)
 
-请提供详细、准确的回答。如果是编程问题，请提供代码示例。
-"""
+            # 调用AI生成回答
+            ai_response = ask_gemini(prompt, temperature=0.7)
 
-        # 调用AI生成回答
-        ai_response = ask_gemini(prompt, temperature=0.7)
+            # 保存AI回答
+            serializer.save_message(session, 'ai', ai_response)
 
-        # 保存AI回答
-        serializer.save_message(session, 'ai', ai_response)
+            # 更新会话时间
+            session.save()
+            return ai_response
 
-        # 更新会话时间
-        session.save()
+        # 同一会话的消息串行处理，避免并发AI调用和消息交错写入
+        user_message = serializer.validated_data['message']
+        ai_response = session_gate.submit(session.id, user_message, answer_messages)
 
         return Response({
             'code': 200,
@@ -107,6 +143,62 @@ def chat_message(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@async_api_view(['POST'], permission_classes=[IsStudent])
+async def chat_message_async(request):
+    """发送聊天消息（异步版本，等待AI回答期间不占用工作线程）"""
+    serializer = ChatMessageCreateSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return json_response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # 创建或获取会话
+        subject = serializer.validated_data.get('subject', '通用')
+        session = await serializer.acreate_or_get_session(request.user, subject)
+
+        async def answer_messages(user_messages):
+            # 保存用户消息
+            for message in user_messages:
+                await serializer.asave_message(session, 'user', message)
+
+            # 获取上下文消息并构建提示词
+            context_messages = await serializer.aget_context_messages(session)
+            weak_points = await sync_to_async(tutor_weak_points)(request.user, session.subject)
+            prompt = build_chat_prompt(context_messages, '\n'.join(user_messages), weak_points)
+
+            # 异步调用AI生成回答
+            ai_response = await ask_gemini_async(prompt, temperature=0.7)
+
+            # 保存AI回答并更新会话时间
+            await serializer.asave_message(session, 'ai', ai_response)
+            await session.asave()
+            return ai_response
+
+        # 同一会话的消息串行处理
+        user_message = serializer.validated_data['message']
+        ai_response = await async_session_gate.submit(session.id, user_message, answer_messages)
+
+        return json_response({
+            'code': 200,
+            'message': '聊天成功',
+            'data': {
+                'session_id': str(session.id),
+                'ai_response': ai_response,
+                'created_at': session.updated_at
+            }
+        })
+
+    except Exception as e:
+        return json_response({
+            'code': 500,
+            'message': f'聊天失败: {str(e)}'
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @extend_schema(
     parameters=[
         OpenApiParameter('page', int, description='页码'),
@@ -229,6 +321,33 @@ def submit_question(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@async_api_view(['POST'], permission_classes=[IsStudent])
+async def submit_question_async(request):
+    """学生提交问题（异步版本）- 仅学生可用"""
+    serializer = QAQuestionCreateSerializer(
+        data=request.data,
+        context={'student': request.user}
+    )
+
+    if serializer.is_valid():
+        question = await serializer.acreate(serializer.validated_data)
+        return json_response({
+            'code': 201,
+            'message': '问题提交成功',
+            'data': {
+                'question_id': str(question.id),
+                'ai_answer': question.ai_answer,
+                'created_at': question.created_at
+            }
+        }, status.HTTP_201_CREATED)
+
+    return json_response({
+        'code': 400,
+        'message': '问题提交失败',
+        'errors': serializer.errors
+    }, status.HTTP_400_BAD_REQUEST)
+
+
 @extend_schema(
     responses={
         200: QAQuestionDetailSerializer,
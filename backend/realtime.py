@@ -0,0 +1,240 @@
+"""
+实时事件模块 - 可插拔的发布/订阅层与SSE工具
+
+每个用户对应一个事件通道，事件带有单调递增的序号作为游标，
+SSE连接与长轮询都基于"读取游标之后的事件"实现，断线重连时不会丢失事件。
+
+提供两种实现，通过 settings.REALTIME_BROKER 选择：
+- InProcessEventBroker: 进程内实现，适用于单进程部署
+- CacheEventBroker: 基于Django缓存的实现，多个工作进程共享同一缓存（Redis/Memcached等）时使用
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+
+def user_channel(user_id) -> str:
+    """用户事件通道名"""
+    return f"user:{user_id}"
+
+
+class BaseEventBroker:
+    """事件代理基类"""
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> int:
+        """发布事件，返回事件序号"""
+        raise NotImplementedError
+
+    def latest_cursor(self, channel: str) -> int:
+        """通道当前最新的事件序号"""
+        raise NotImplementedError
+
+    def events_after(self, channel: str, cursor: int) -> List[Dict[str, Any]]:
+        """获取序号大于cursor的事件"""
+        raise NotImplementedError
+
+    def wait(self, channel: str, cursor: int, timeout: float) -> List[Dict[str, Any]]:
+        """等待直到有序号大于cursor的事件或超时"""
+        raise NotImplementedError
+
+
+class InProcessEventBroker(BaseEventBroker):
+    """进程内事件代理，每个通道保留最近的若干条事件"""
+
+    def __init__(self, max_events=200):
+        self.max_events = max_events
+        self._condition = threading.Condition()
+        self._channels: Dict[str, deque] = {}
+        self._sequences: Dict[str, int] = {}
+
+    def publish(self, channel, event_type, data):
+        with self._condition:
+            event_id = self._sequences.get(channel, 0) + 1
+            self._sequences[channel] = event_id
+            events = self._channels.setdefault(channel, deque(maxlen=self.max_events))
+            events.append({'id': event_id, 'type': event_type, 'data': data})
+            self._condition.notify_all()
+        return event_id
+
+    def latest_cursor(self, channel):
+        with self._condition:
+            return self._sequences.get(channel, 0)
+
+    def events_after(self, channel, cursor):
+        with self._condition:
+            return [event for event in self._channels.get(channel, ()) if event['id'] > cursor]
+
+    def wait(self, channel, cursor, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._sequences.get(channel, 0) <= cursor:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+            return [event for event in self._channels.get(channel, ()) if event['id'] > cursor]
+
+
+class CacheEventBroker(BaseEventBroker):
+    """基于Django缓存的事件代理，多个工作进程通过共享缓存交换事件"""
+
+    def __init__(self, cache_alias='default', max_events=200, ttl=600, poll_interval=0.5):
+        self.cache_alias = cache_alias
+        self.max_events = max_events
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _sequence_key(self, channel):
+        return f"realtime:{channel}:seq"
+
+    def _event_key(self, channel, event_id):
+        return f"realtime:{channel}:event:{event_id}"
+
+    def publish(self, channel, event_type, data):
+        sequence_key = self._sequence_key(channel)
+        self.cache.add(sequence_key, 0, timeout=None)
+        try:
+            event_id = self.cache.incr(sequence_key)
+        except ValueError:
+            # 序号键被淘汰后重新初始化
+            self.cache.add(sequence_key, 0, timeout=None)
+            event_id = self.cache.incr(sequence_key)
+
+        # 统一序列化，保证不同缓存后端中存储的数据一致
+        payload = json.dumps({'id': event_id, 'type': event_type, 'data': data}, cls=JSONEncoder)
+        self.cache.set(self._event_key(channel, event_id), payload, timeout=self.ttl)
+        return event_id
+
+    def latest_cursor(self, channel):
+        return self.cache.get(self._sequence_key(channel), 0)
+
+    def events_after(self, channel, cursor):
+        latest = self.latest_cursor(channel)
+        if latest <= cursor:
+            return []
+
+        first = max(cursor + 1, latest - self.max_events + 1)
+        keys = [self._event_key(channel, event_id) for event_id in range(first, latest + 1)]
+        stored = self.cache.get_many(keys)
+        return [json.loads(stored[key]) for key in keys if key in stored]
+
+    def wait(self, channel, cursor, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.events_after(channel, cursor)
+            if events or time.monotonic() >= deadline:
+                return events
+            time.sleep(self.poll_interval)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> BaseEventBroker:
+    """获取配置的事件代理实例（settings.REALTIME_BROKER）"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = getattr(settings, 'REALTIME_BROKER', {})
+                broker_class = import_string(config.get('BACKEND', 'realtime.InProcessEventBroker'))
+                _broker = broker_class(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def publish_to_user(user_id, event_type: str, data: Dict[str, Any]):
+    """向用户推送事件（在当前数据库事务提交后发布）"""
+    def publish():
+        try:
+            get_broker().publish(user_channel(user_id), event_type, data)
+        except Exception as e:
+            logger.error(f"实时事件发布失败: {e}")
+
+    transaction.on_commit(publish)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """将事件格式化为SSE消息"""
+    data = json.dumps(event['data'], cls=JSONEncoder, ensure_ascii=False)
+    lines = [f"id: {event['id']}", f"event: {event['type']}"]
+    lines.extend(f"data: {line}" for line in data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_user_events(user_id, cursor: Optional[int] = None, heartbeat=15, max_duration=300):
+    """
+    SSE事件流生成器
+
+    Args:
+        user_id: 用户ID
+        cursor: 起始游标（断线重连时为Last-Event-ID），为空则只推送新事件
+        heartbeat: 无事件时发送心跳的间隔（秒）
+        max_duration: 单次连接最长持续时间（秒），到期后由客户端自动重连
+    """
+    broker = get_broker()
+    channel = user_channel(user_id)
+    if cursor is None:
+        cursor = broker.latest_cursor(channel)
+
+    deadline = time.monotonic() + max_duration
+    yield "retry: 3000\n\n"
+    while time.monotonic() < deadline:
+        events = broker.wait(channel, cursor, timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+        if events:
+            for event in events:
+                cursor = event['id']
+                yield format_sse(event)
+        else:
+            yield f": keep-alive {timezone.now().isoformat()}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """text/event-stream 渲染器，使DRF内容协商接受SSE请求"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return format_sse({'id': 0, 'type': 'error', 'data': data}).encode(self.charset)
+
+
+class QueryTokenJWTAuthentication(JWTAuthentication):
+    """
+    支持通过查询参数 ?token= 传递访问令牌的JWT认证
+
+    浏览器的 EventSource 无法设置请求头，SSE接口需要这种方式认证
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            return result
+
+        raw_token = request.query_params.get('token')
+        if not raw_token:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_user(validated_token), validated_token
@@ -1,16 +1,16 @@
 from django.contrib import admin
-from .models import LearningReport
+from .models import LearningReport, ClassReport, ReportBatch, PrecomputeRun, StudentDailyStats, StudentKnowledgeMastery
 
 
 @admin.register(LearningReport)
 class LearningReportAdmin(admin.ModelAdmin):
     """学习报告管理"""
     list_display = (
-        'student', 'generated_by', 'period', 'status',
+        'student', 'generated_by', 'period', 'status', 'content_phase',
         'total_assignments', 'completed_assignments', 'average_score',
         'total_questions', 'created_at'
     )
-    list_filter = ('period', 'status', 'created_at', 'subjects')
+    list_filter = ('period', 'status', 'content_phase', 'created_at', 'subjects')
     search_fields = ('student__username', 'student__real_name', 'generated_by__username')
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-created_at',)
@@ -23,7 +23,7 @@ class LearningReportAdmin(admin.ModelAdmin):
             'fields': ('total_assignments', 'completed_assignments', 'average_score', 'total_questions')
         }),
         ('报告内容', {
-            'fields': ('report_content',),
+            'fields': ('content_phase', 'report_content'),
             'classes': ('collapse',)
         }),
         ('时间信息', {
@@ -34,3 +34,77 @@ class LearningReportAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('student', 'generated_by')
+
+
+
+@admin.register(ClassReport)
+class ClassReportAdmin(admin.ModelAdmin):
+    """班级报告管理"""
+    list_display = ('generated_by', 'period', 'status', 'created_at')
+    list_filter = ('period', 'status', 'created_at')
+    search_fields = ('generated_by__username', 'generated_by__real_name')
+    readonly_fields = ('data_fingerprint', 'created_at', 'updated_at')
+    ordering = ('-created_at',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('generated_by')
+
+
+@admin.register(ReportBatch)
+class ReportBatchAdmin(admin.ModelAdmin):
+    """批量报告任务管理"""
+    list_display = (
+        'created_by', 'period', 'status', 'total_count',
+        'completed_count', 'failed_count', 'reused_count', 'created_at'
+    )
+    list_filter = ('period', 'status', 'created_at')
+    search_fields = ('created_by__username', 'created_by__real_name')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-created_at',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('created_by')
+
+
+@admin.register(PrecomputeRun)
+class PrecomputeRunAdmin(admin.ModelAdmin):
+    """报告预生成记录管理"""
+    list_display = (
+        'run_date', 'period', 'status', 'stage', 'generated_count',
+        'reused_count', 'failed_count', 'updated_at', 'finished_at'
+    )
+    list_filter = ('period', 'status', 'stage')
+    readonly_fields = ('created_at', 'updated_at', 'finished_at')
+    ordering = ('-run_date', 'period')
+
+
+@admin.register(StudentDailyStats)
+class StudentDailyStatsAdmin(admin.ModelAdmin):
+    """学生每日学习汇总"""
+    list_display = (
+        'student', 'subject', 'date', 'submission_count', 'score_sum',
+        'possible_sum', 'qa_session_count', 'qa_question_count'
+    )
+    list_filter = ('subject', 'date')
+    search_fields = ('student__username', 'student__real_name')
+    readonly_fields = ('updated_at',)
+    ordering = ('-date',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('student')
+
+
+@admin.register(StudentKnowledgeMastery)
+class StudentKnowledgeMasteryAdmin(admin.ModelAdmin):
+    """学生知识点掌握度"""
+    list_display = (
+        'student', 'knowledge_point', 'answer_count', 'average_score',
+        'recency_score', 'last_answered_at'
+    )
+    list_filter = ('knowledge_point__subject',)
+    search_fields = ('student__username', 'student__real_name', 'knowledge_point__name')
+    readonly_fields = ('updated_at',)
+    ordering = ('student', 'recency_score')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('student', 'knowledge_point')
@@ -0,0 +1,279 @@
+"""
+成绩分析快照 - 把全部学生的已批改提交载入内存中的NumPy列，供教师看板做向量化统计
+
+每个已批改提交占一行，按列存储：
+- student / assignment / subject: 整数编码（对应的ID、科目名保存在编码表中）
+- score / max_score: 得分与作业总分
+- assigned_at: 作业创建时间（时间戳，与报告统计按作业创建时间筛选的口径一致）
+
+快照常驻进程内存，刷新时只查询上次刷新之后批改（含重新批改）的提交，
+已有的提交原位更新、新提交追加到列尾。已批改提交总数与快照行数不一致（有提交被删除）
+或距上次完整加载超过 REBUILD_AFTER 秒时重新完整加载。
+
+看板查询（分位数、标准差、排名、分数段分布）都在列上做向量化运算，不再逐个学生过滤。
+
+通过 settings.REPORT_ANALYTICS 配置：
+- REBUILD_AFTER: 完整重新加载的间隔（秒），用于同步作业总分、科目修改等增量刷新无法感知的变化
+- REFRESH_INTERVAL: 两次增量刷新的最小间隔（秒），间隔内的查询直接使用现有快照
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+
+from .statistics import SCORE_BUCKETS
+
+try:
+    from assignments.models import Submission
+except ImportError:
+    Submission = None
+
+logger = logging.getLogger(__name__)
+
+# 分数段边界（与 statistics.SCORE_BUCKETS 一致，最后一段包含100分及以上）
+HISTOGRAM_EDGES = np.array([0.0] + [float(upper) for _, upper in SCORE_BUCKETS if upper is not None] + [np.inf])
+PERCENTILES = (10, 25, 50, 75, 90)
+
+_COLUMNS = {
+    'student': np.int32,
+    'assignment': np.int32,
+    'subject': np.int16,
+    'score': np.float32,
+    'max_score': np.float32,
+    'assigned_at': np.float64,
+}
+
+
+def get_analytics_settings():
+    config = getattr(settings, 'REPORT_ANALYTICS', {})
+    return {
+        'REBUILD_AFTER': config.get('REBUILD_AFTER', 3600),
+        'REFRESH_INTERVAL': config.get('REFRESH_INTERVAL', 5),
+    }
+
+
+class _Codes:
+    """值与连续整数编码的双向映射"""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ScoreSnapshot:
+    """已批改提交的列式快照"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self.size = 0
+        self.rows = {}  # 提交ID -> 行号
+        self.students = _Codes()
+        self.assignments = _Codes()
+        self.subjects = _Codes()
+        self.watermark = None  # 已载入的最大批改时间
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+
+    def _graded_submissions(self):
+        return Submission.objects.filter(graded_at__isnull=False, student__role='student')
+
+    def _reserve(self, count):
+        """保证列容量足够追加count行（容量按倍数增长）"""
+        needed = self.size + count
+        capacity = len(self.columns['score'])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def _load(self, queryset):
+        """载入提交行：已有的提交原位更新，新提交追加；返回处理的行数"""
+        records = list(queryset.order_by().values_list(
+            'id', 'student_id', 'assignment_id', 'assignment__subject',
+            'obtained_score', 'assignment__total_score', 'assignment__created_at', 'graded_at'
+        ))
+        if not records:
+            return 0
+
+        self._reserve(len(records))
+        rows = []
+        for record in records:
+            row = self.rows.get(record[0])
+            if row is None:
+                row = self.rows[record[0]] = self.size
+                self.size += 1
+            rows.append(row)
+
+        # 编码在Python中完成，列写入按行号批量赋值
+        submission_ids, student_ids, assignment_ids, subjects, scores, max_scores, assigned_at, graded_at = zip(*records)
+        rows = np.array(rows, dtype=np.int64)
+        self.columns['student'][rows] = [self.students.encode(value) for value in student_ids]
+        self.columns['assignment'][rows] = [self.assignments.encode(value) for value in assignment_ids]
+        self.columns['subject'][rows] = [self.subjects.encode(value) for value in subjects]
+        self.columns['score'][rows] = scores
+        self.columns['max_score'][rows] = max_scores
+        self.columns['assigned_at'][rows] = [value.timestamp() for value in assigned_at]
+
+        latest = max(graded_at)
+        if self.watermark is None or latest > self.watermark:
+            self.watermark = latest
+        return len(records)
+
+    def refresh(self, force=False):
+        """增量刷新快照，需要时完整重新加载"""
+        if Submission is None:
+            return
+        config = get_analytics_settings()
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.refreshed_at and now - self.refreshed_at < config['REFRESH_INTERVAL']:
+                return
+
+            started = time.perf_counter()
+            rebuild = force or not self.loaded_at or now - self.loaded_at > config['REBUILD_AFTER']
+            if rebuild:
+                self._reset()
+                loaded = self._load(self._graded_submissions())
+                self.loaded_at = now
+            else:
+                # 与水位时间相同的提交可能在上次刷新后才提交事务，重复载入同一提交只会原位覆盖
+                loaded = self._load(self._graded_submissions().filter(graded_at__gte=self.watermark)) \
+                    if self.watermark is not None else self._load(self._graded_submissions())
+                if self._graded_submissions().aggregate(count=Count('id'))['count'] != self.size:
+                    self._reset()
+                    loaded = self._load(self._graded_submissions())
+                    self.loaded_at = now
+                    rebuild = True
+            self.refreshed_at = now
+            logger.debug(
+                f"成绩快照{'完整加载' if rebuild else '增量刷新'} {loaded} 行，共 {self.size} 行，"
+                f"耗时 {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+
+    def _mask(self, start_time=None, end_time=None, subjects=None, student_ids=None, assignment_ids=None):
+        """筛选行：作业创建时间在时间段内、科目匹配、学生与作业在名单中、总分大于0"""
+        columns = {name: column[:self.size] for name, column in self.columns.items()}
+        mask = columns['max_score'] > 0
+        if start_time is not None:
+            mask &= columns['assigned_at'] >= start_time.timestamp()
+        if end_time is not None:
+            mask &= columns['assigned_at'] <= end_time.timestamp()
+        if subjects:
+            codes = [self.subjects.index[subject] for subject in subjects if subject in self.subjects.index]
+            mask &= np.isin(columns['subject'], codes)
+        if student_ids is not None:
+            codes = [self.students.index[pk] for pk in student_ids if pk in self.students.index]
+            mask &= np.isin(columns['student'], codes)
+        if assignment_ids is not None:
+            codes = [self.assignments.index[pk] for pk in assignment_ids if pk in self.assignments.index]
+            mask &= np.isin(columns['assignment'], codes)
+        return columns, mask
+
+    def class_summary(self, start_time=None, end_time=None, subjects=None, student_ids=None, assignment_ids=None):
+        """
+        班级成绩分布统计
+
+        Args:
+            student_ids: 学生用户ID列表（教师课程的学生），为空时统计全部学生
+            assignment_ids: 作业ID列表（教师课程的作业），为空时统计全部作业
+        学生成绩为其已批改提交的平均得分率；排名按平均得分率从高到低，并列时名次相同。
+        Returns:
+            dict，students 为 [{'student_id'(用户ID), 'average_score', 'graded_count', 'rank', 'percentile'}]
+        """
+        with self._lock:
+            columns, mask = self._mask(start_time, end_time, subjects, student_ids, assignment_ids)
+            student_codes = columns['student'][mask]
+            rates = columns['score'][mask].astype(np.float64) / columns['max_score'][mask] * 100.0
+            assignment_count = int(np.unique(columns['assignment'][mask]).size)
+            student_ids = list(self.students.values)
+
+        empty = {
+            'graded_submissions': 0,
+            'assignment_count': assignment_count,
+            'student_count': 0,
+            'average_score': 0,
+            'std_score': 0,
+            'min_score': 0,
+            'max_score': 0,
+            'percentiles': {f'p{p}': 0 for p in PERCENTILES},
+            'score_distribution': {label: 0 for label, _ in SCORE_BUCKETS},
+            'students': [],
+        }
+        if not rates.size:
+            return empty
+
+        # 按学生求平均得分率（bincount 按编码分组求和）
+        counts = np.bincount(student_codes, minlength=len(student_ids))
+        sums = np.bincount(student_codes, weights=rates, minlength=len(student_ids))
+        present = np.flatnonzero(counts)
+        averages = sums[present] / counts[present]
+        # 消除浮点累加顺序带来的末位误差，保证分段与排名稳定
+        averages = np.round(averages, 9)
+
+        order = np.argsort(-averages, kind='stable')
+        sorted_averages = averages[order]
+        # 并列名次：名次 = 比自己高的人数 + 1
+        ranks = np.searchsorted(-sorted_averages, -sorted_averages, side='left') + 1
+        below = np.searchsorted(np.sort(averages), sorted_averages, side='left')
+        percentile_ranks = below / averages.size * 100.0
+
+        histogram, _ = np.histogram(averages, bins=HISTOGRAM_EDGES)
+        percentiles = np.percentile(averages, PERCENTILES)
+
+        students = [
+            {
+                'student_id': student_ids[present[index]],
+                'average_score': round(float(sorted_averages[position]), 2),
+                'graded_count': int(counts[present[index]]),
+                'rank': int(ranks[position]),
+                'percentile': round(float(percentile_ranks[position]), 2),
+            }
+            for position, index in enumerate(order)
+        ]
+
+        return {
+            'graded_submissions': int(rates.size),
+            'assignment_count': assignment_count,
+            'student_count': int(averages.size),
+            'average_score': round(float(averages.mean()), 2),
+            'std_score': round(float(averages.std()), 2),
+            'min_score': round(float(averages.min()), 2),
+            'max_score': round(float(averages.max()), 2),
+            'percentiles': {f'p{p}': round(float(value), 2) for p, value in zip(PERCENTILES, percentiles)},
+            'score_distribution': {
+                label: int(count) for (label, _), count in zip(SCORE_BUCKETS, histogram)
+            },
+            'students': students,
+        }
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_score_snapshot() -> ScoreSnapshot:
+    """进程内共享的成绩快照"""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = ScoreSnapshot()
+    return _snapshot
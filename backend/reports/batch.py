@@ -0,0 +1,341 @@
+"""
+批量学习报告模块 - 教师一次为多名学生（默认全班）生成个人学习报告
+
+- 数据收集按学生分块进行，每块用几条查询取出块内所有学生的提交、问答记录再按学生分组，
+  不再对每个学生分别调用 collect_student_data
+- AI调用在限速的并发线程池中执行，失败时按指数退避重试；仍然失败的报告标记为 failed，
+  任务状态为 partial，可通过重试接口只重新生成失败的报告
+- 每处理完一份报告向任务创建者推送 batch_progress 事件
+
+通过 settings.REPORT_BATCH 配置：
+- CONCURRENCY: 同时进行的AI调用数
+- RATE_LIMIT: 每分钟最多发起的AI调用数（0表示不限）
+- MAX_RETRIES: 单份报告AI调用失败后的重试次数
+- RETRY_BACKOFF: 首次重试前的等待秒数，之后每次翻倍
+- CHUNK_SIZE: 每次收集数据的学生数（限制内存占用）
+- MAX_WORKERS: 同时运行的批量任务数（批量任务使用独立线程池，不占用单份报告的生成线程）
+"""
+
+import time
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from realtime import publish_to_user
+from .tasks import get_task_settings
+from .rollups import students_statistics_from_rollup
+from .prompting import with_bounded_messages
+
+try:
+    from assignments.models import Assignment, Submission
+except ImportError:
+    Assignment = None
+    Submission = None
+
+try:
+    from courses.scoping import student_course_ids, student_visible_submissions
+except ImportError:
+    def student_course_ids(student_ids):
+        return {}
+
+    def student_visible_submissions(queryset):
+        return queryset.filter(assignment__course__isnull=True)
+
+try:
+    from qa.models import QASession, QAQuestion
+except ImportError:
+    QASession = None
+    QAQuestion = None
+
+logger = logging.getLogger(__name__)
+
+# 流式读取原始记录时每次取出的行数（预取按块进行）
+ITERATOR_CHUNK_SIZE = 500
+
+
+def get_batch_settings():
+    config = getattr(settings, 'REPORT_BATCH', {})
+    return {
+        'CONCURRENCY': config.get('CONCURRENCY', 4),
+        'RATE_LIMIT': config.get('RATE_LIMIT', 30),
+        'MAX_RETRIES': config.get('MAX_RETRIES', 2),
+        'RETRY_BACKOFF': config.get('RETRY_BACKOFF', 2.0),
+        'CHUNK_SIZE': config.get('CHUNK_SIZE', 50),
+        'MAX_WORKERS': config.get('MAX_WORKERS', 1),
+    }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """获取批量任务线程池（与单份报告的线程池分开，批量任务不会让交互式报告排队）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_batch_settings()['MAX_WORKERS'],
+                    thread_name_prefix='report-batch'
+                )
+    return _executor
+
+
+class RateLimiter:
+    """线程安全的限速器：相邻两次放行的间隔不小于 60 / 每分钟次数 秒"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def call_with_retry(func, limiter, max_retries, backoff):
+    """限速调用func，失败时按指数退避重试，重试用尽后抛出最后一次的异常"""
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            logger.warning(f"AI调用失败，第{attempt + 1}次重试: {e}")
+            time.sleep(backoff * (2 ** attempt))
+            attempt += 1
+
+
+def collect_students_data(student_ids, start_time, end_time, subjects):
+    """
+    一次收集多名学生的学习数据
+
+    Returns:
+        {学生ID: data}，data 结构与 collect_student_data 的返回值一致
+    """
+    assignment_filter = Q(created_at__gte=start_time, created_at__lte=end_time)
+    if subjects:
+        assignment_filter &= Q(subject__in=subjects)
+
+    assignments = {}
+    grouped = defaultdict(lambda: {'submissions': [], 'qa_sessions': [], 'old_qa_questions': []})
+
+    if Assignment is not None and Submission is not None:
+        # 每名学生只统计可见的作业（未指定课程的与所在课程的），与 collect_student_data 一致
+        assignment_queryset = Assignment.objects.filter(assignment_filter)
+        window_assignments = list(assignment_queryset)
+        course_ids = student_course_ids(student_ids)
+        assignments = {
+            student_id: [
+                assignment for assignment in window_assignments
+                if assignment.course_id is None or assignment.course_id in course_ids.get(student_id, ())
+            ]
+            for student_id in student_ids
+        }
+        submissions = student_visible_submissions(Submission.objects.filter(
+            student_id__in=student_ids,
+            assignment__in=assignment_queryset
+        )).select_related('assignment').prefetch_related('answers__question')
+        for submission in submissions.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            grouped[submission.student_id]['submissions'].append(submission)
+
+    if QASession is not None:
+        qa_sessions = QASession.objects.filter(
+            student_id__in=student_ids,
+            updated_at__gte=start_time,
+            updated_at__lte=end_time
+        )
+        if subjects:
+            qa_sessions = qa_sessions.filter(subject__in=subjects)
+        for session in with_bounded_messages(qa_sessions).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            grouped[session.student_id]['qa_sessions'].append(session)
+
+    if QAQuestion is not None:
+        old_qa_questions = QAQuestion.objects.filter(
+            student_id__in=student_ids,
+            created_at__gte=start_time,
+            created_at__lte=end_time
+        ).select_related('answer')
+        if subjects:
+            old_qa_questions = old_qa_questions.filter(subject__in=subjects)
+        for question in old_qa_questions.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            grouped[question.student_id]['old_qa_questions'].append(question)
+
+    return {
+        student_id: {
+            'assignments': assignments.get(student_id, []),
+            **grouped[student_id],
+            'time_range': (start_time, end_time)
+        }
+        for student_id in student_ids
+    }
+
+
+def publish_batch_progress(batch):
+    publish_to_user(batch.created_by_id, 'batch_progress', {
+        'batch_id': str(batch.id),
+        'status': batch.status,
+        'total_count': batch.total_count,
+        'completed_count': batch.completed_count,
+        'failed_count': batch.failed_count,
+        'progress': batch.progress,
+    })
+
+
+def finish_batch(batch):
+    """根据失败数确定任务最终状态"""
+    if not batch.failed_count:
+        batch.status = 'completed'
+    elif batch.completed_count:
+        batch.status = 'partial'
+    else:
+        batch.status = 'failed'
+    batch.save(update_fields=['status', 'updated_at'])
+    publish_batch_progress(batch)
+
+
+def enqueue_batch(batch_id):
+    """提交批量生成任务（在当前事务提交后执行）"""
+    if get_task_settings()['EAGER']:
+        transaction.on_commit(lambda: run_batch_task(batch_id))
+    else:
+        transaction.on_commit(lambda: get_batch_executor().submit(run_batch_task, batch_id))
+
+
+def generate_reports_chunk(reports, period, subjects, time_range, pool, generate):
+    """
+    为一块 generating 状态的报告收集数据并在线程池中并发生成AI内容
+
+    Args:
+        reports: 报告列表（已 select_related('student')）
+        time_range: (开始时间, 结束时间)，同一任务的各块使用相同的时间范围
+        generate: generate(提示词)，返回AI内容，失败时抛出异常
+    Yields:
+        (报告, 是否成功)，每份报告完成并保存后返回
+    """
+    from . import views
+
+    start_time, end_time = time_range
+    student_ids = [report.student_id for report in reports]
+    student_data = collect_students_data(student_ids, start_time, end_time, subjects)
+    if getattr(settings, 'REPORT_DAILY_ROLLUP', False):
+        chunk_statistics = students_statistics_from_rollup(student_ids, start_time, end_time, subjects)
+    else:
+        chunk_statistics = {
+            student_id: views.calculate_statistics(data) for student_id, data in student_data.items()
+        }
+
+    # 提示词在当前线程构建（只读取已预取的数据），线程池中只执行AI调用
+    futures = {}
+    for report in reports:
+        data = student_data[report.student_id]
+        statistics = chunk_statistics[report.student_id]
+        views.apply_report_statistics(report, statistics)
+        prompt = views.build_report_prompt(report.student, data, statistics, period, subjects)
+        futures[pool.submit(generate, prompt)] = report
+
+    for future in as_completed(futures):
+        report = futures[future]
+        try:
+            report.report_content = future.result()
+            report.status = 'completed'
+            succeeded = True
+        except Exception as e:
+            report.report_content = f'生成失败：{str(e)}'
+            report.status = 'failed'
+            succeeded = False
+        report.save(update_fields=[
+            'total_assignments', 'completed_assignments', 'average_score', 'total_questions',
+            'report_content', 'status', 'updated_at'
+        ])
+        yield report, succeeded
+
+
+def run_batch_task(batch_id):
+    """工作线程入口：逐块收集数据，并发生成任务中所有 generating 状态的报告"""
+    from .models import ReportBatch, LearningReport
+    from . import views
+
+    close_old_connections()
+    try:
+        batch = ReportBatch.objects.get(id=batch_id)
+    except ReportBatch.DoesNotExist:
+        logger.warning(f"批量任务 {batch_id} 不存在，跳过生成")
+        return
+
+    config = get_batch_settings()
+    limiter = RateLimiter(config['RATE_LIMIT'])
+    time_range = views.get_time_range(batch.period)
+
+    def generate(prompt):
+        return call_with_retry(
+            lambda: views.ask_gemini(prompt, temperature=0.7),
+            limiter, config['MAX_RETRIES'], config['RETRY_BACKOFF']
+        )
+
+    pool = ThreadPoolExecutor(max_workers=config['CONCURRENCY'], thread_name_prefix='report-batch-ai')
+    try:
+        pending = list(
+            batch.reports.filter(status='generating').select_related('student').order_by('student__student_id')
+        )
+        publish_batch_progress(batch)
+
+        for offset in range(0, len(pending), config['CHUNK_SIZE']):
+            chunk = pending[offset:offset + config['CHUNK_SIZE']]
+            for report, succeeded in generate_reports_chunk(
+                chunk, batch.period, batch.subjects, time_range, pool, generate
+            ):
+                if succeeded:
+                    batch.completed_count += 1
+                else:
+                    logger.error(f"批量任务 {batch_id} 中报告 {report.id} 生成失败: {report.report_content}")
+                    batch.failed_count += 1
+                batch.save(update_fields=['completed_count', 'failed_count', 'updated_at'])
+                publish_batch_progress(batch)
+
+        finish_batch(batch)
+
+    except Exception as e:
+        logger.error(f"批量任务 {batch_id} 执行失败: {e}")
+        failed = LearningReport.objects.filter(batch=batch, status='generating').update(
+            status='failed', report_content=f'生成失败：{str(e)}', updated_at=timezone.now()
+        )
+        batch.failed_count += failed
+        finish_batch(batch)
+    finally:
+        pool.shutdown(wait=True)
+        close_old_connections()
+
+
+def expire_stale_batch(batch):
+    """任务丢失（如进程重启）的批量任务标记为结束，未完成的报告记为失败，返回是否有更新"""
+    from .models import LearningReport
+
+    stale_after = get_task_settings()['STALE_AFTER']
+    if batch.status != 'generating' or not stale_after:
+        return False
+    if (timezone.now() - batch.updated_at).total_seconds() < stale_after:
+        return False
+
+    failed = LearningReport.objects.filter(batch=batch, status='generating').update(
+        status='failed', report_content='生成失败：任务超时，请重新生成', updated_at=timezone.now()
+    )
+    batch.failed_count += failed
+    finish_batch(batch)
+    return True
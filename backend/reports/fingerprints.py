@@ -0,0 +1,234 @@
+"""
+报告数据指纹 - 判断报告依据的数据自上次生成后是否发生变化
+
+指纹由时间段内的几项聚合值计算：作业数与最后更新时间、提交数与最后提交/批改时间、
+提交与答案的得分合计和反馈长度（不改变批改时间的重新批改）、问答会话数与最后更新时间、
+旧版提问数与最后提问时间、知识点掌握度行数与最后更新时间（累计数据，不按时间段），
+再加上时间段、科目和生成方式；班级报告另外包含学生名单的人数与最后更新时间。
+数据不变时指纹不变，可以直接复用已生成的报告而不必再次调用AI。
+"""
+
+import hashlib
+import json
+
+from django.db.models import Q, Count, Max, Sum
+from django.db.models.functions import Length
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    from accounts.models import User
+except ImportError:
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+try:
+    from assignments.models import Assignment, Submission
+except ImportError:
+    Assignment = None
+    Submission = None
+
+try:
+    from assignments.models import Answer
+except ImportError:
+    Answer = None
+
+try:
+    from courses.scoping import visible_assignments, student_course_ids, student_visible_submissions
+except ImportError:
+    def visible_assignments(user, queryset):
+        return queryset.filter(created_by=user) if user.role == 'teacher' else queryset.filter(course__isnull=True)
+
+    def student_course_ids(student_ids):
+        return {}
+
+    def student_visible_submissions(queryset):
+        return queryset.filter(assignment__course__isnull=True)
+
+try:
+    from qa.models import QASession, QAQuestion
+except ImportError:
+    QASession = None
+    QAQuestion = None
+
+from .models import StudentKnowledgeMastery
+
+
+def normalize_subjects(subjects):
+    """科目列表去重排序，使顺序不同的相同请求得到相同指纹"""
+    return sorted(set(subjects or []))
+
+
+def _hash_parts(parts):
+    payload = json.dumps(parts, cls=JSONEncoder, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _scoped_querysets(start_time, end_time, subjects, assignment_scope=None):
+    """
+    时间段与科目范围内的作业、问答会话、旧版提问查询集（未按学生过滤）
+
+    Args:
+        assignment_scope: 作业范围查询集（教师课程的作业），为空时为全部作业
+    """
+    assignments = sessions = questions = None
+    if Assignment is not None and Submission is not None:
+        assignments = (assignment_scope if assignment_scope is not None else Assignment.objects.all()).filter(
+            created_at__gte=start_time, created_at__lte=end_time
+        )
+        if subjects:
+            assignments = assignments.filter(subject__in=subjects)
+    if QASession is not None:
+        sessions = QASession.objects.filter(updated_at__gte=start_time, updated_at__lte=end_time)
+        if subjects:
+            sessions = sessions.filter(subject__in=subjects)
+    if QAQuestion is not None:
+        questions = QAQuestion.objects.filter(created_at__gte=start_time, created_at__lte=end_time)
+        if subjects:
+            questions = questions.filter(subject__in=subjects)
+    return assignments, sessions, questions
+
+
+SUBMISSION_AGGREGATES = {
+    'count': Count('id'),
+    'submitted': Max('submitted_at'),
+    'graded': Max('graded_at'),
+    'score': Sum('obtained_score'),
+    'feedback': Sum(Length('overall_feedback')),
+}
+ANSWER_AGGREGATES = {
+    'count': Count('id'),
+    'score': Sum('obtained_score'),
+    'feedback': Sum(Length('ai_feedback')),
+}
+SESSION_AGGREGATES = {'count': Count('id'), 'updated': Max('updated_at')}
+QUESTION_AGGREGATES = {'count': Count('id'), 'created': Max('created_at')}
+MASTERY_AGGREGATES = {'count': Count('id'), 'updated': Max('updated_at')}
+
+
+def _answers(submissions):
+    """提交下的答案（重新批改时提交的批改时间可能不变）"""
+    return Answer.objects.filter(submission__in=submissions) if Answer is not None else None
+
+
+def _mastery_rows(subjects):
+    rows = StudentKnowledgeMastery.objects.all()
+    if subjects:
+        rows = rows.filter(knowledge_point__subject__in=subjects)
+    return rows
+
+
+def data_fingerprint(start_time, end_time, period, subjects, student=None, students=None, mode='full',
+                     assignments=None):
+    """
+    计算报告数据指纹
+
+    Args:
+        student: 学生，为空时计算班级报告的指纹
+        students: 班级报告的学生名单查询集（教师课程的学生），为空时为全体学生
+        assignments: 班级报告的作业范围查询集（教师课程的作业），为空时为全部作业
+        mode: 报告生成方式（full/delta），不同方式的报告互不复用
+    Returns:
+        64位十六进制字符串
+    """
+    subjects = normalize_subjects(subjects)
+    if student is not None:
+        student_filter = Q(student=student)
+    elif students is not None:
+        student_filter = Q(student_id__in=students.values('id'))
+    else:
+        student_filter = Q(student__role='student')
+    parts = {'period': period, 'subjects': subjects, 'mode': mode}
+
+    if student is None:
+        # 班级报告包含学生名单，学生增减或资料变化也会改变指纹
+        roster = students if students is not None else User.objects.filter(role='student')
+        parts['students'] = roster.aggregate(count=Count('id'), updated=Max('updated_at'))
+        if students is not None:
+            # 人数相同的不同名单也要区分
+            parts['roster'] = _hash_parts(sorted(str(pk) for pk in roster.values_list('id', flat=True)))
+
+    assignments, sessions, questions = _scoped_querysets(start_time, end_time, subjects, assignments)
+    if assignments is not None:
+        if student is not None:
+            # 学生报告只依据学生可见的作业（未指定课程的与所在课程的）
+            assignments = visible_assignments(student, assignments)
+        parts['assignments'] = assignments.aggregate(count=Count('id'), updated=Max('updated_at'))
+        submissions = Submission.objects.filter(student_filter, assignment__in=assignments)
+        parts['submissions'] = submissions.aggregate(**SUBMISSION_AGGREGATES)
+        answers = _answers(submissions)
+        if answers is not None:
+            parts['answers'] = answers.aggregate(**ANSWER_AGGREGATES)
+    if sessions is not None:
+        parts['qa_sessions'] = sessions.filter(student_filter).aggregate(**SESSION_AGGREGATES)
+    if questions is not None:
+        parts['qa_questions'] = questions.filter(student_filter).aggregate(**QUESTION_AGGREGATES)
+    parts['mastery'] = _mastery_rows(subjects).filter(student_filter).aggregate(**MASTERY_AGGREGATES)
+
+    return _hash_parts(parts)
+
+
+def _combine_assignment_rows(rows):
+    """合并多个课程的作业聚合值，结果与对合并后的查询集直接聚合相同"""
+    rows = list(rows)
+    updated = [row['updated'] for row in rows if row['updated'] is not None]
+    return {'count': sum(row['count'] for row in rows), 'updated': max(updated) if updated else None}
+
+
+def student_fingerprints(start_time, end_time, period, subjects, student_ids, mode='full'):
+    """
+    批量计算多名学生的数据指纹（分组聚合，查询数与学生数无关）
+
+    结果与逐个调用 data_fingerprint(student=...) 相同。
+    Returns:
+        {学生ID: 指纹}
+    """
+    subjects = normalize_subjects(subjects)
+    student_ids = list(student_ids)
+    assignments, sessions, questions = _scoped_querysets(start_time, end_time, subjects)
+
+    def grouped(queryset, aggregates):
+        rows = queryset.filter(student_id__in=student_ids).order_by().values('student_id').annotate(**aggregates)
+        return {row.pop('student_id'): row for row in rows}
+
+    def empty(aggregates):
+        return {key: 0 if key == 'count' else None for key in aggregates}
+
+    shared = {'period': period, 'subjects': subjects, 'mode': mode}
+    per_student = {}
+    if assignments is not None:
+        # 作业按课程分组聚合，再按学生所在课程合并出各自可见作业的聚合值
+        course_rows = assignments.order_by().values('course_id').annotate(count=Count('id'), updated=Max('updated_at'))
+        course_rows = {row.pop('course_id'): row for row in course_rows}
+        course_ids = student_course_ids(student_ids)
+        per_student['assignments'] = (
+            {
+                student_id: _combine_assignment_rows(
+                    row for course_id, row in course_rows.items()
+                    if course_id is None or course_id in course_ids.get(student_id, ())
+                )
+                for student_id in student_ids
+            },
+            {'count': None, 'updated': None}
+        )
+        submissions = student_visible_submissions(Submission.objects.filter(assignment__in=assignments))
+        per_student['submissions'] = (grouped(submissions, SUBMISSION_AGGREGATES), SUBMISSION_AGGREGATES)
+        answers = _answers(submissions.filter(student_id__in=student_ids))
+        if answers is not None:
+            rows = answers.order_by().values('submission__student_id').annotate(**ANSWER_AGGREGATES)
+            per_student['answers'] = (
+                {row.pop('submission__student_id'): row for row in rows},
+                ANSWER_AGGREGATES
+            )
+    if sessions is not None:
+        per_student['qa_sessions'] = (grouped(sessions, SESSION_AGGREGATES), SESSION_AGGREGATES)
+    if questions is not None:
+        per_student['qa_questions'] = (grouped(questions, QUESTION_AGGREGATES), QUESTION_AGGREGATES)
+    per_student['mastery'] = (grouped(_mastery_rows(subjects), MASTERY_AGGREGATES), MASTERY_AGGREGATES)
+
+    fingerprints = {}
+    for student_id in student_ids:
+        parts = dict(shared)
+        for key, (rows, aggregates) in per_student.items():
+            parts[key] = rows.get(student_id) or empty(aggregates)
+        fingerprints[student_id] = _hash_parts(parts)
+    return fingerprints
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports.models import LearningReport
+from reports.precompute import current_window, next_window, run_precompute, start_delay
+
+
+class Command(BaseCommand):
+    help = "在闲时窗口内预生成周/月学习报告与班级报告（配置见 settings.REPORT_PRECOMPUTE）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            action='append',
+            dest='periods',
+            choices=[value for value, _ in LearningReport.PERIOD_CHOICES],
+            help='只预生成指定时间段（可重复指定，默认使用 PERIODS 配置）'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='常驻运行：每个闲时窗口开始后执行一次'
+        )
+        parser.add_argument(
+            '--now',
+            action='store_true',
+            help='忽略闲时窗口与随机等待立即执行（按今天的日期记录进度）'
+        )
+        parser.add_argument(
+            '--no-jitter',
+            action='store_true',
+            help='不在启动前随机等待'
+        )
+        parser.add_argument(
+            '--skip-class-reports',
+            action='store_true',
+            help='只预生成学习报告'
+        )
+
+    def handle(self, *args, **options):
+        class_reports = False if options['skip_class_reports'] else None
+
+        if options['now']:
+            self.run_window(timezone.localdate(), None, options['periods'], class_reports)
+            return
+
+        while True:
+            window = current_window()
+            if window is None:
+                if not options['loop']:
+                    start, end = next_window()
+                    self.stdout.write(
+                        f"当前不在闲时窗口内，下一个窗口：{start:%Y-%m-%d %H:%M} - {end:%H:%M}"
+                    )
+                    return
+                self.sleep_until(next_window()[0])
+                continue
+
+            start, end = window
+            if not options['no_jitter']:
+                delay = start_delay(end)
+                self.stdout.write(f"错峰等待 {delay:.0f} 秒后开始")
+                time.sleep(delay)
+            self.run_window(start.date(), end, options['periods'], class_reports)
+
+            if not options['loop']:
+                return
+            self.sleep_until(next_window()[0])
+
+    def sleep_until(self, moment):
+        self.stdout.write(f"等待下一个闲时窗口：{timezone.localtime(moment):%Y-%m-%d %H:%M}")
+        time.sleep(max((moment - timezone.now()).total_seconds(), 0))
+
+    def run_window(self, run_date, deadline, periods, class_reports):
+        runs = run_precompute(run_date, deadline=deadline, periods=periods, class_reports=class_reports)
+        if not runs:
+            self.stdout.write("没有需要预生成的报告（已完成或正在其他进程中运行）")
+        for run in runs:
+            message = (
+                f"{run.run_date} {run.get_period_display()}：{run.get_status_display()}，"
+                f"生成 {run.generated_count}，复用 {run.reused_count}，失败 {run.failed_count}"
+            )
+            style = self.style.SUCCESS if run.status == 'completed' else self.style.WARNING
+            self.stdout.write(style(message))
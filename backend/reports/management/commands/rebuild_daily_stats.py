@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "从提交和问答记录重建学生每日学习汇总表（StudentDailyStats）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student',
+            action='append',
+            dest='students',
+            help='只重建指定学生（用户ID，可重复指定）'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_daily_stats(student_ids=options['students'])
+        self.stdout.write(self.style.SUCCESS(f"已重建 {count} 条学习日汇总"))
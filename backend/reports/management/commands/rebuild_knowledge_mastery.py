@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reports.mastery import rebuild_mastery
+
+
+class Command(BaseCommand):
+    help = "从已批改答案重建学生知识点掌握度表（StudentKnowledgeMastery）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student',
+            action='append',
+            dest='students',
+            help='只重建指定学生（用户ID，可重复指定）'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_mastery(student_ids=options['students'])
+        self.stdout.write(self.style.SUCCESS(f"已重建 {count} 条知识点掌握度"))
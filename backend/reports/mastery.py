@@ -0,0 +1,269 @@
+"""
+知识点掌握度模块 - 维护 StudentKnowledgeMastery 并提供按学生、按班级的掌握度查询
+
+题目可以标注知识点（assignments.KnowledgePoint）。每道已批改的答案按题目的知识点
+增量更新 (学生, 知识点) 掌握度行，报告、看板与答疑直接读取，不再从全部答案重新计算：
+- average_score: 全部作答的平均得分率（得分率合计 / 作答数）
+- recency_score: 按作答时间指数衰减加权的平均得分率（半衰期 HALF_LIFE_DAYS 天），反映近期掌握情况
+
+衰减以行内最近作答时间为基准：新作答晚于基准时先把累计值按时间间隔衰减再累加，
+早于基准（并发批改时先后颠倒）时只衰减新作答本身，因此增量更新与按任意顺序重建的结果一致。
+答案重新批改或删除、题目的知识点或分值变化时，重算受影响的行（见 reports/signals.py）。
+作答时间取提交时间。
+
+通过 settings.REPORT_MASTERY 配置：
+- HALF_LIFE_DAYS: 近期得分率的半衰期（天）
+- WEAK_THRESHOLD: 近期得分率低于该值（%）的知识点视为薄弱
+- PROMPT_LIMIT: 写入报告和答疑提示词的知识点数
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Avg, Count, Sum
+
+from .models import StudentKnowledgeMastery
+
+try:
+    from assignments.models import Answer, Question
+except ImportError:
+    Answer = None
+    Question = None
+
+SECONDS_PER_DAY = 86400
+
+
+def get_mastery_settings():
+    config = getattr(settings, 'REPORT_MASTERY', {})
+    return {
+        'HALF_LIFE_DAYS': config.get('HALF_LIFE_DAYS', 30),
+        'WEAK_THRESHOLD': config.get('WEAK_THRESHOLD', 60),
+        'PROMPT_LIMIT': config.get('PROMPT_LIMIT', 8),
+    }
+
+
+def _decay(seconds, half_life_days):
+    return 0.5 ** (seconds / (half_life_days * SECONDS_PER_DAY))
+
+
+def apply_answer(row, rate, answered_at, half_life_days):
+    """把一次作答（得分率%）累加到掌握度行（未保存）"""
+    if answered_at >= row.last_answered_at:
+        factor = _decay((answered_at - row.last_answered_at).total_seconds(), half_life_days)
+        row.decayed_score_sum = row.decayed_score_sum * factor + rate
+        row.decayed_weight = row.decayed_weight * factor + 1.0
+        row.last_answered_at = answered_at
+    else:
+        factor = _decay((row.last_answered_at - answered_at).total_seconds(), half_life_days)
+        row.decayed_score_sum += rate * factor
+        row.decayed_weight += factor
+
+    row.answer_count += 1
+    row.score_rate_sum += rate
+    row.average_score = round(row.score_rate_sum / row.answer_count, 2)
+    row.recency_score = round(row.decayed_score_sum / row.decayed_weight, 2) if row.decayed_weight else 0.0
+    return row
+
+
+def graded_answer_rows(answers):
+    """
+    已批改答案的作答记录（按题目的每个知识点各一条）
+
+    Yields:
+        (学生ID, 知识点ID, 得分率%, 作答时间)
+    """
+    rows = answers.filter(
+        obtained_score__isnull=False,
+        question__score__gt=0,
+        question__knowledge_points__isnull=False
+    ).order_by().values_list(
+        'submission__student_id', 'question__knowledge_points',
+        'obtained_score', 'question__score', 'submission__submitted_at'
+    )
+    for student_id, point_id, obtained, possible, answered_at in rows.iterator(chunk_size=2000):
+        yield student_id, point_id, obtained / possible * 100.0, answered_at
+
+
+def record_answer(answer_id):
+    """把一道新批改的答案累加到对应的掌握度行（行加锁，避免并发批改互相覆盖）"""
+    if Answer is None:
+        return 0
+    half_life = get_mastery_settings()['HALF_LIFE_DAYS']
+    records = list(graded_answer_rows(Answer.objects.filter(id=answer_id)))
+
+    with transaction.atomic():
+        for student_id, point_id, rate, answered_at in records:
+            StudentKnowledgeMastery.objects.get_or_create(
+                student_id=student_id, knowledge_point_id=point_id,
+                defaults={'last_answered_at': answered_at}
+            )
+            row = StudentKnowledgeMastery.objects.select_for_update().get(
+                student_id=student_id, knowledge_point_id=point_id
+            )
+            apply_answer(row, rate, answered_at, half_life)
+            row.save()
+    return len(records)
+
+
+def _accumulate(records, half_life):
+    """按作答记录计算掌握度行 {(学生ID, 知识点ID): 未保存的行}"""
+    rows = {}
+    for student_id, point_id, rate, answered_at in records:
+        key = (student_id, point_id)
+        if key not in rows:
+            rows[key] = StudentKnowledgeMastery(
+                student_id=student_id, knowledge_point_id=point_id, last_answered_at=answered_at
+            )
+        apply_answer(rows[key], rate, answered_at, half_life)
+    return rows
+
+
+def refresh_mastery(knowledge_point_ids, student_id=None):
+    """
+    从已批改答案重算指定知识点的掌握度行（答案重新批改或删除、题目知识点或分值变化时使用）
+
+    Args:
+        student_id: 只重算该学生，为空时重算所有作答过这些知识点的学生
+    Returns:
+        写入的掌握度行数（没有作答的行被删除）
+    """
+    if Answer is None:
+        return 0
+    point_ids = {str(pk) for pk in knowledge_point_ids}
+    if not point_ids:
+        return 0
+    half_life = get_mastery_settings()['HALF_LIFE_DAYS']
+    # 按题目ID子查询筛选，避免与取知识点的连接重复而产生重复行
+    answers = Answer.objects.filter(
+        question_id__in=Question.objects.filter(knowledge_points__in=point_ids).values('id')
+    )
+    existing = StudentKnowledgeMastery.objects.filter(knowledge_point_id__in=point_ids)
+    if student_id is not None:
+        answers = answers.filter(submission__student_id=student_id)
+        existing = existing.filter(student_id=student_id)
+
+    records = [record for record in graded_answer_rows(answers) if str(record[1]) in point_ids]
+    rows = _accumulate(records, half_life)
+    with transaction.atomic():
+        existing.delete()
+        StudentKnowledgeMastery.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def rebuild_mastery(student_ids=None, batch_size=1000):
+    """
+    从全部已批改答案重建掌握度表
+
+    Args:
+        student_ids: 只重建这些学生，为空时重建全部
+    Returns:
+        写入的掌握度行数
+    """
+    if Answer is None:
+        return 0
+    half_life = get_mastery_settings()['HALF_LIFE_DAYS']
+    answers = Answer.objects.all()
+    existing = StudentKnowledgeMastery.objects.all()
+    if student_ids is not None:
+        answers = answers.filter(submission__student_id__in=student_ids)
+        existing = existing.filter(student_id__in=student_ids)
+
+    rows = _accumulate(graded_answer_rows(answers), half_life)
+    with transaction.atomic():
+        existing.delete()
+        StudentKnowledgeMastery.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
+
+
+def _mastery_rows(subjects=None):
+    rows = StudentKnowledgeMastery.objects.all()
+    if subjects:
+        rows = rows.filter(knowledge_point__subject__in=subjects)
+    return rows
+
+
+def _student_item(row):
+    return {
+        'knowledge_point_id': str(row.knowledge_point_id),
+        'knowledge_point': row.knowledge_point.name,
+        'subject': row.knowledge_point.subject,
+        'answer_count': row.answer_count,
+        'average_score': row.average_score,
+        'recency_score': row.recency_score,
+        'last_answered_at': row.last_answered_at,
+    }
+
+
+def student_mastery(student, subjects=None):
+    """学生的知识点掌握度，按近期得分率升序（最薄弱的在前）"""
+    rows = _mastery_rows(subjects).filter(student=student).select_related('knowledge_point')
+    return [_student_item(row) for row in rows.order_by('recency_score', '-answer_count')]
+
+
+def class_mastery(subjects=None, students=None, limit=None):
+    """
+    班级各知识点的掌握度，按学生近期得分率的平均值升序（最薄弱的在前）
+
+    Args:
+        students: 学生名单查询集（教师课程的学生），为空时为全部学生
+        limit: 只返回最薄弱的若干个知识点
+    Returns:
+        [{'knowledge_point_id', 'knowledge_point', 'subject', 'student_count', 'answer_count',
+          'average_score', 'recency_score', 'weak_student_count'}]
+    """
+    rows = _mastery_rows(subjects).filter(student__role='student')
+    if students is not None:
+        rows = rows.filter(student_id__in=students.values('id'))
+    threshold = get_mastery_settings()['WEAK_THRESHOLD']
+    groups = rows.order_by().values(
+        'knowledge_point_id', 'knowledge_point__name', 'knowledge_point__subject'
+    ).annotate(
+        students=Count('id'),
+        answers=Sum('answer_count'),
+        average=Avg('average_score'),
+        recency=Avg('recency_score'),
+        weak_students=Count('id', filter=Q(recency_score__lt=threshold)),
+    ).order_by('recency', 'knowledge_point__subject', 'knowledge_point__name')
+    if limit:
+        groups = groups[:limit]
+
+    return [
+        {
+            'knowledge_point_id': str(group['knowledge_point_id']),
+            'knowledge_point': group['knowledge_point__name'],
+            'subject': group['knowledge_point__subject'],
+            'student_count': group['students'],
+            'answer_count': group['answers'],
+            'average_score': round(group['average'], 2),
+            'recency_score': round(group['recency'], 2),
+            'weak_student_count': group['weak_students'],
+        }
+        for group in groups
+    ]
+
+
+def _prompt_item(row):
+    return {
+        'subject': row.knowledge_point.subject,
+        'point': row.knowledge_point.name,
+        'answers': row.answer_count,
+        'avg': round(row.average_score, 1),
+        'recent': round(row.recency_score, 1),
+    }
+
+
+def student_mastery_summary(student, subjects=None, limit=None):
+    """
+    写入提示词的掌握度摘要
+
+    Returns:
+        {'weak': 近期得分率低于阈值的知识点（最薄弱的在前）, 'strong': 其余知识点（最好的在前）}，各最多 limit 个
+    """
+    config = get_mastery_settings()
+    limit = limit or config['PROMPT_LIMIT']
+    rows = _mastery_rows(subjects).filter(student=student).select_related('knowledge_point')
+    weak = rows.filter(recency_score__lt=config['WEAK_THRESHOLD']).order_by('recency_score', '-answer_count')
+    strong = rows.filter(recency_score__gte=config['WEAK_THRESHOLD']).order_by('-recency_score', '-answer_count')
+    return {
+        'weak': [_prompt_item(row) for row in weak[:limit]],
+        'strong': [_prompt_item(row) for row in strong[:limit]],
+    }
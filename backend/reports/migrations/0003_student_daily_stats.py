@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_daily_stats(apps, schema_editor):
+    from reports.rollups import rebuild_daily_stats
+    rebuild_daily_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_answer_answer_image_alter_answer_answer_text'),
+        ('qa', '0002_alter_qaanswer_options_alter_qaquestion_options_and_more'),
+        ('reports', '0002_alter_learningreport_average_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100, verbose_name='科目')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('submission_count', models.IntegerField(default=0, verbose_name='提交数')),
+                ('scored_count', models.IntegerField(default=0, verbose_name='计分提交数')),
+                ('score_sum', models.IntegerField(default=0, verbose_name='得分合计')),
+                ('possible_sum', models.IntegerField(default=0, verbose_name='总分合计')),
+                ('score_rate_sum', models.FloatField(default=0.0, verbose_name='得分率合计')),
+                ('qa_session_count', models.IntegerField(default=0, verbose_name='问答会话数')),
+                ('qa_question_count', models.IntegerField(default=0, verbose_name='旧版提问数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='学生')),
+            ],
+            options={
+                'verbose_name': '学生每日学习汇总',
+                'verbose_name_plural': '学生每日学习汇总',
+                'db_table': 'student_daily_stats',
+                'indexes': [models.Index(fields=['student', 'date'], name='daily_stats_student_date_idx'), models.Index(fields=['date', 'subject'], name='daily_stats_date_subject_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'subject', 'date'), name='student_daily_stats_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
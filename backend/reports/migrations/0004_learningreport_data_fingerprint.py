@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_student_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningreport',
+            name='data_fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='数据指纹'),
+        ),
+    ]
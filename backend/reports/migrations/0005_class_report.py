@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:59
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_learningreport_data_fingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassReport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(choices=[('week', '一周'), ('month', '一个月'), ('semester', '一学期'), ('all', '全部时间')], max_length=20, verbose_name='时间段')),
+                ('subjects', models.JSONField(default=list, verbose_name='科目列表')),
+                ('status', models.CharField(choices=[('generating', '生成中'), ('completed', '已完成'), ('failed', '生成失败')], default='generating', max_length=20, verbose_name='状态')),
+                ('statistics', models.JSONField(default=dict, verbose_name='统计数据')),
+                ('report_content', models.TextField(blank=True, verbose_name='报告内容')),
+                ('data_fingerprint', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='数据指纹')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('generated_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generated_class_reports', to=settings.AUTH_USER_MODEL, verbose_name='生成者')),
+            ],
+            options={
+                'verbose_name': '班级报告',
+                'verbose_name_plural': '班级报告',
+                'db_table': 'class_reports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_class_report'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(choices=[('week', '一周'), ('month', '一个月'), ('semester', '一学期'), ('all', '全部时间')], max_length=20, verbose_name='时间段')),
+                ('subjects', models.JSONField(default=list, verbose_name='科目列表')),
+                ('status', models.CharField(choices=[('generating', '生成中'), ('completed', '已完成'), ('partial', '部分失败'), ('failed', '生成失败')], default='generating', max_length=20, verbose_name='状态')),
+                ('total_count', models.IntegerField(default=0, verbose_name='报告总数')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='已完成数')),
+                ('failed_count', models.IntegerField(default=0, verbose_name='失败数')),
+                ('reused_count', models.IntegerField(default=0, verbose_name='复用数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_batches', to=settings.AUTH_USER_MODEL, verbose_name='创建者')),
+            ],
+            options={
+                'verbose_name': '批量报告任务',
+                'verbose_name_plural': '批量报告任务',
+                'db_table': 'report_batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='learningreport',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='reports.reportbatch', verbose_name='批量任务'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_report_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningreport',
+            name='base_report',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='delta_reports', to='reports.learningreport', verbose_name='基准报告'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_learningreport_base_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningreport',
+            name='content_phase',
+            field=models.CharField(choices=[('local', '本地统计'), ('ai', 'AI分析')], default='ai', max_length=10, verbose_name='内容阶段'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:29
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0008_learningreport_content_phase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecomputeRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('run_date', models.DateField(verbose_name='窗口日期')),
+                ('period', models.CharField(choices=[('week', '一周'), ('month', '一个月'), ('semester', '一学期'), ('all', '全部时间')], max_length=20, verbose_name='时间段')),
+                ('status', models.CharField(choices=[('running', '运行中'), ('paused', '已暂停'), ('completed', '已完成')], default='running', max_length=20, verbose_name='状态')),
+                ('stage', models.CharField(choices=[('students', '学习报告'), ('classes', '班级报告'), ('done', '已结束')], default='students', max_length=20, verbose_name='阶段')),
+                ('cursor', models.CharField(blank=True, help_text='当前阶段最后处理的用户ID', max_length=64, verbose_name='进度游标')),
+                ('generated_count', models.IntegerField(default=0, verbose_name='生成数')),
+                ('reused_count', models.IntegerField(default=0, verbose_name='复用数')),
+                ('failed_count', models.IntegerField(default=0, verbose_name='失败数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': '报告预生成记录',
+                'verbose_name_plural': '报告预生成记录',
+                'db_table': 'report_precompute_runs',
+                'ordering': ['-run_date', 'period'],
+                'constraints': [models.UniqueConstraint(fields=('run_date', 'period'), name='unique_precompute_run')],
+            },
+        ),
+    ]
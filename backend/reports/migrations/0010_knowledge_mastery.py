@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0005_knowledge_points'),
+        ('reports', '0009_precompute_run'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentKnowledgeMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_count', models.IntegerField(default=0, verbose_name='作答数')),
+                ('score_rate_sum', models.FloatField(default=0.0, verbose_name='得分率合计')),
+                ('average_score', models.FloatField(default=0.0, verbose_name='平均得分率')),
+                ('decayed_score_sum', models.FloatField(default=0.0, verbose_name='衰减得分率合计')),
+                ('decayed_weight', models.FloatField(default=0.0, verbose_name='衰减权重合计')),
+                ('recency_score', models.FloatField(default=0.0, verbose_name='近期得分率')),
+                ('last_answered_at', models.DateTimeField(verbose_name='最近作答时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('knowledge_point', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to='assignments.knowledgepoint', verbose_name='知识点')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='knowledge_mastery', to=settings.AUTH_USER_MODEL, verbose_name='学生')),
+            ],
+            options={
+                'verbose_name': '学生知识点掌握度',
+                'verbose_name_plural': '学生知识点掌握度',
+                'db_table': 'student_knowledge_mastery',
+                'indexes': [models.Index(fields=['knowledge_point', 'recency_score'], name='mastery_point_recency_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'knowledge_point'), name='student_knowledge_mastery_unique')],
+            },
+        ),
+    ]
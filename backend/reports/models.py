@@ -18,6 +18,11 @@ class LearningReport(models.Model):
         ('failed', '生成失败'),
     ]
 
+    CONTENT_PHASE_CHOICES = [
+        ('local', '本地统计'),
+        ('ai', 'AI分析'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -44,6 +49,33 @@ class LearningReport(models.Model):
 
     # 报告内容
     report_content = models.TextField(blank=True, verbose_name='报告内容')
+    # 报告内容所处阶段：先写入本地统计报告，AI分析完成后替换
+    content_phase = models.CharField(
+        max_length=10, choices=CONTENT_PHASE_CHOICES, default='ai', verbose_name='内容阶段'
+    )
+
+    # 生成时的数据指纹，数据未变化时复用报告
+    data_fingerprint = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='数据指纹')
+
+    # 增量报告：在该报告内容的基础上，结合之后新增的学习数据更新而成
+    base_report = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='delta_reports',
+        verbose_name='基准报告'
+    )
+
+    # 批量生成任务（教师为全班生成时）
+    batch = models.ForeignKey(
+        'ReportBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reports',
+        verbose_name='批量任务'
+    )
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
@@ -56,3 +88,213 @@ class LearningReport(models.Model):
 
     def __str__(self):
         return f"{self.student.real_name} - {self.get_period_display()} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class ClassReport(models.Model):
+    """班级报告模型"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    generated_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='generated_class_reports',
+        verbose_name='生成者'
+    )
+    period = models.CharField(max_length=20, choices=LearningReport.PERIOD_CHOICES, verbose_name='时间段')
+    subjects = models.JSONField(default=list, verbose_name='科目列表')
+    status = models.CharField(
+        max_length=20,
+        choices=LearningReport.STATUS_CHOICES,
+        default='generating',
+        verbose_name='状态'
+    )
+
+    # 班级统计数据（结构同班级报告接口返回的 statistics）
+    statistics = models.JSONField(default=dict, verbose_name='统计数据')
+    report_content = models.TextField(blank=True, verbose_name='报告内容')
+    data_fingerprint = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='数据指纹')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'class_reports'
+        verbose_name = '班级报告'
+        verbose_name_plural = '班级报告'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"班级报告 - {self.get_period_display()} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class ReportBatch(models.Model):
+    """批量学习报告任务（为多名学生一次性生成个人报告）"""
+    STATUS_CHOICES = [
+        ('generating', '生成中'),
+        ('completed', '已完成'),
+        ('partial', '部分失败'),
+        ('failed', '生成失败'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='report_batches',
+        verbose_name='创建者'
+    )
+    period = models.CharField(max_length=20, choices=LearningReport.PERIOD_CHOICES, verbose_name='时间段')
+    subjects = models.JSONField(default=list, verbose_name='科目列表')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='generating', verbose_name='状态')
+
+    total_count = models.IntegerField(default=0, verbose_name='报告总数')
+    completed_count = models.IntegerField(default=0, verbose_name='已完成数')
+    failed_count = models.IntegerField(default=0, verbose_name='失败数')
+    reused_count = models.IntegerField(default=0, verbose_name='复用数')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'report_batches'
+        verbose_name = '批量报告任务'
+        verbose_name_plural = '批量报告任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"批量报告 - {self.get_period_display()} - {self.created_at.strftime('%Y-%m-%d')}"
+
+    @property
+    def progress(self):
+        """完成百分比（成功与失败都计入已处理）"""
+        if not self.total_count:
+            return 100
+        return round((self.completed_count + self.failed_count) * 100 / self.total_count)
+
+
+class PrecomputeRun(models.Model):
+    """闲时预生成报告的运行记录（每个时间窗口、每个时间段一条，保存进度以便中断后继续）"""
+    STATUS_CHOICES = [
+        ('running', '运行中'),
+        ('paused', '已暂停'),
+        ('completed', '已完成'),
+    ]
+
+    STAGE_CHOICES = [
+        ('students', '学习报告'),
+        ('classes', '班级报告'),
+        ('done', '已结束'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    run_date = models.DateField(verbose_name='窗口日期')
+    period = models.CharField(max_length=20, choices=LearningReport.PERIOD_CHOICES, verbose_name='时间段')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name='状态')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='students', verbose_name='阶段')
+    cursor = models.CharField(max_length=64, blank=True, verbose_name='进度游标', help_text='当前阶段最后处理的用户ID')
+
+    generated_count = models.IntegerField(default=0, verbose_name='生成数')
+    reused_count = models.IntegerField(default=0, verbose_name='复用数')
+    failed_count = models.IntegerField(default=0, verbose_name='失败数')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        db_table = 'report_precompute_runs'
+        verbose_name = '报告预生成记录'
+        verbose_name_plural = '报告预生成记录'
+        ordering = ['-run_date', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['run_date', 'period'], name='unique_precompute_run'),
+        ]
+
+    def __str__(self):
+        return f"报告预生成 - {self.run_date} - {self.get_period_display()}"
+
+
+class StudentDailyStats(models.Model):
+    """
+    学生每日学习汇总（按学生、科目、日期）
+
+    作业数据按作业创建日期归档，与报告统计按作业创建时间筛选的口径一致；
+    问答会话按最后更新日期归档，旧版问答按提问日期归档。
+    """
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name='学生'
+    )
+    subject = models.CharField(max_length=100, verbose_name='科目')
+    date = models.DateField(verbose_name='日期')
+
+    submission_count = models.IntegerField(default=0, verbose_name='提交数')
+    scored_count = models.IntegerField(default=0, verbose_name='计分提交数')
+    score_sum = models.IntegerField(default=0, verbose_name='得分合计')
+    possible_sum = models.IntegerField(default=0, verbose_name='总分合计')
+    score_rate_sum = models.FloatField(default=0.0, verbose_name='得分率合计')
+    qa_session_count = models.IntegerField(default=0, verbose_name='问答会话数')
+    qa_question_count = models.IntegerField(default=0, verbose_name='旧版提问数')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'student_daily_stats'
+        verbose_name = '学生每日学习汇总'
+        verbose_name_plural = '学生每日学习汇总'
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'subject', 'date'], name='student_daily_stats_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'date'], name='daily_stats_student_date_idx'),
+            models.Index(fields=['date', 'subject'], name='daily_stats_date_subject_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject} - {self.date}"
+
+
+class StudentKnowledgeMastery(models.Model):
+    """
+    学生知识点掌握度（按学生、知识点）
+
+    由已批改答案增量更新：average_score 为全部作答的平均得分率，
+    recency_score 为按时间衰减加权的平均得分率（越近的作答权重越大），见 reports/mastery.py。
+    """
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='knowledge_mastery',
+        verbose_name='学生'
+    )
+    knowledge_point = models.ForeignKey(
+        'assignments.KnowledgePoint',
+        on_delete=models.CASCADE,
+        related_name='mastery',
+        verbose_name='知识点'
+    )
+
+    answer_count = models.IntegerField(default=0, verbose_name='作答数')
+    score_rate_sum = models.FloatField(default=0.0, verbose_name='得分率合计')
+    average_score = models.FloatField(default=0.0, verbose_name='平均得分率')
+    decayed_score_sum = models.FloatField(default=0.0, verbose_name='衰减得分率合计')
+    decayed_weight = models.FloatField(default=0.0, verbose_name='衰减权重合计')
+    recency_score = models.FloatField(default=0.0, verbose_name='近期得分率')
+    last_answered_at = models.DateTimeField(verbose_name='最近作答时间')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'student_knowledge_mastery'
+        verbose_name = '学生知识点掌握度'
+        verbose_name_plural = '学生知识点掌握度'
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'knowledge_point'], name='student_knowledge_mastery_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['knowledge_point', 'recency_score'], name='mastery_point_recency_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.knowledge_point_id}"
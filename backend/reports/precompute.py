@@ -0,0 +1,328 @@
+"""
+闲时报告预生成 - 在夜间等闲时窗口内提前生成常用的周/月学习报告与班级报告
+
+高峰时段（如周一上午）大量用户同时生成报告，Gemini 配额最紧张。预生成在闲时窗口内
+为每名学生生成全科目学习报告、为每位教师生成班级报告。报告带有与接口相同的数据指纹，
+高峰时生成接口发现数据未变化，直接返回预生成的报告而不再调用AI。
+报告时间范围的起点按本地日期对齐（见 views.get_time_range），预生成与当天的请求使用相同的起点。
+
+- 错峰启动：每次开始前随机等待 0~JITTER 秒，多个实例不会在窗口开始时同时发起调用
+- 全局限速：每次AI调用在缓存中占用一个时间片，配置共享缓存（如Redis）时所有进程共用同一速率，
+  默认的进程内缓存只在单个进程内限速
+- 断点续跑：阶段与最后处理的用户ID保存在 PrecomputeRun 中，进程中断或窗口结束后，
+  同一窗口再次运行时从游标处继续；数据未变化、已有报告的学生与班级直接跳过
+
+通过 settings.REPORT_PRECOMPUTE 配置：
+- WINDOW: 闲时窗口 ('HH:MM', 'HH:MM')，本地时间，结束早于开始表示跨越午夜
+- WEEKDAYS: 窗口开始日的星期（0为周一）列表，None 表示每天
+- PERIODS: 预生成的时间段
+- JITTER: 启动前随机等待的最大秒数
+- RATE_LIMIT: 全局每分钟最多AI调用数（0表示不限）
+- CONCURRENCY: 同时进行的AI调用数
+- CLASS_REPORTS: 是否预生成班级报告
+"""
+
+import math
+import random
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, time as clock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import views
+from .batch import call_with_retry, generate_reports_chunk, get_batch_settings
+from .fingerprints import data_fingerprint, student_fingerprints
+from .models import LearningReport, PrecomputeRun
+from .tasks import get_task_settings
+
+try:
+    from accounts.models import User
+except ImportError:
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = 'report_precompute:slot'
+
+
+def get_precompute_settings():
+    config = getattr(settings, 'REPORT_PRECOMPUTE', {})
+    return {
+        'WINDOW': config.get('WINDOW', ('01:00', '06:00')),
+        'WEEKDAYS': config.get('WEEKDAYS', None),
+        'PERIODS': config.get('PERIODS', ['week', 'month']),
+        'JITTER': config.get('JITTER', 900),
+        'RATE_LIMIT': config.get('RATE_LIMIT', 20),
+        'CONCURRENCY': config.get('CONCURRENCY', 2),
+        'CLASS_REPORTS': config.get('CLASS_REPORTS', True),
+    }
+
+
+class SharedRateLimiter:
+    """通过缓存占用时间片的限速器：每个时间片（60 / 每分钟次数 秒）只放行一次调用"""
+
+    def __init__(self, per_minute, key=RATE_LIMIT_KEY):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self.key = key
+
+    def acquire(self):
+        if not self.interval:
+            return
+        while True:
+            now = time.time()
+            slot = int(now / self.interval)
+            if cache.add(f'{self.key}:{slot}', 1, timeout=math.ceil(self.interval) + 1):
+                return
+            time.sleep(max((slot + 1) * self.interval - now, 0.01))
+
+
+def _parse_clock(value):
+    hour, minute = value.split(':')
+    return clock(int(hour), int(minute))
+
+
+def window_bounds(day, config=None):
+    """day 开始的闲时窗口 (开始, 结束)"""
+    config = config or get_precompute_settings()
+    start_clock, end_clock = (_parse_clock(value) for value in config['WINDOW'])
+    tz = timezone.get_current_timezone()
+    start = datetime.combine(day, start_clock, tzinfo=tz)
+    end = datetime.combine(day, end_clock, tzinfo=tz)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _window_days(config, first_day, count):
+    weekdays = config['WEEKDAYS']
+    for offset in range(count):
+        day = first_day + timedelta(days=offset)
+        if weekdays is None or day.weekday() in weekdays:
+            yield day
+
+
+def current_window(now=None):
+    """当前所在的闲时窗口 (开始, 结束)，不在窗口内时返回None"""
+    config = get_precompute_settings()
+    now = timezone.localtime(now)
+    # 跨越午夜的窗口可能从前一天开始
+    for day in _window_days(config, now.date() - timedelta(days=1), 2):
+        start, end = window_bounds(day, config)
+        if start <= now < end:
+            return start, end
+    return None
+
+
+def next_window(now=None):
+    """下一个尚未开始的闲时窗口 (开始, 结束)"""
+    config = get_precompute_settings()
+    now = timezone.localtime(now)
+    for day in _window_days(config, now.date(), 8):
+        start, end = window_bounds(day, config)
+        if start > now:
+            return start, end
+    raise ValueError('REPORT_PRECOMPUTE.WEEKDAYS 没有可用的星期')
+
+
+def start_delay(deadline=None):
+    """错峰启动的随机等待秒数（不超过窗口剩余时间的一半）"""
+    jitter = get_precompute_settings()['JITTER']
+    if deadline is not None:
+        jitter = min(jitter, max((deadline - timezone.now()).total_seconds() / 2, 0))
+    return random.uniform(0, jitter) if jitter > 0 else 0
+
+
+def _before(deadline):
+    return deadline is None or timezone.now() < deadline
+
+
+def claim_run(run_date, period):
+    """
+    领取运行记录：新建或继续已暂停的记录
+
+    其他进程正在运行（最近 STALE_AFTER 秒内有进度）或已完成时返回None。
+    """
+    run, _ = PrecomputeRun.objects.get_or_create(
+        run_date=run_date, period=period, defaults={'status': 'paused'}
+    )
+    stale_before = timezone.now() - timedelta(seconds=get_task_settings()['STALE_AFTER'])
+    claimed = PrecomputeRun.objects.filter(id=run.id).filter(
+        Q(status='paused') | Q(status='running', updated_at__lt=stale_before)
+    ).update(status='running', updated_at=timezone.now())
+    if not claimed:
+        return None
+    run.refresh_from_db()
+    return run
+
+
+def completed_student_ids(fingerprints):
+    """已有相同指纹近期已完成报告的学生（正在生成的报告可能是中断遗留，需要重新生成）"""
+    reports = views.reusable_reports().filter(
+        status='completed',
+        student_id__in=list(fingerprints),
+        data_fingerprint__in=set(fingerprints.values())
+    ).values_list('student_id', 'data_fingerprint')
+    return {student_id for student_id, fingerprint in reports if fingerprints.get(student_id) == fingerprint}
+
+
+def _save_progress(run, cursor):
+    run.cursor = cursor
+    run.save(update_fields=['stage', 'cursor', 'generated_count', 'reused_count', 'failed_count', 'updated_at'])
+
+
+def precompute_learning_reports(run, time_range, deadline, pool, generate):
+    """按用户ID顺序分块为学生生成全科目学习报告，每块完成后保存游标；全部完成时返回True"""
+    chunk_size = get_batch_settings()['CHUNK_SIZE']
+    students = User.objects.filter(role='student', is_active=True).order_by('id')
+
+    while _before(deadline):
+        remaining = students.filter(id__gt=run.cursor) if run.cursor else students
+        student_ids = list(remaining.values_list('id', flat=True)[:chunk_size])
+        if not student_ids:
+            return True
+
+        fingerprints = student_fingerprints(*time_range, run.period, [], student_ids)
+        reused = completed_student_ids(fingerprints)
+        created = LearningReport.objects.bulk_create([
+            LearningReport(
+                student_id=student_id,
+                generated_by_id=student_id,
+                period=run.period,
+                subjects=[],
+                status='generating',
+                data_fingerprint=fingerprints[student_id],
+            )
+            for student_id in student_ids if student_id not in reused
+        ])
+        if created:
+            reports = list(
+                LearningReport.objects.filter(id__in=[report.id for report in created]).select_related('student')
+            )
+            for report, succeeded in generate_reports_chunk(reports, run.period, [], time_range, pool, generate):
+                if succeeded:
+                    run.generated_count += 1
+                else:
+                    logger.error(f"预生成学习报告 {report.id} 失败: {report.report_content}")
+                    run.failed_count += 1
+
+        run.reused_count += len(reused)
+        _save_progress(run, str(student_ids[-1]))
+    return False
+
+
+def precompute_class_reports(run, time_range, deadline, generate):
+    """
+    按用户ID顺序为每位教师生成班级报告（所教课程的学生）；全部完成时返回True
+
+    未加入课程的教师看到的是全体学生的同一份班级报告，第一份生成后其余教师直接复用。
+    """
+    teachers = User.objects.filter(role='teacher', is_active=True).order_by('id')
+
+    while _before(deadline):
+        remaining = teachers.filter(id__gt=run.cursor) if run.cursor else teachers
+        teacher = remaining.first()
+        if teacher is None:
+            return True
+
+        roster = views.roster_students(teacher)
+        assignments = views.class_assignments(teacher)
+        fingerprint = data_fingerprint(*time_range, run.period, [], students=roster, assignments=assignments)
+        if views.find_reusable_class_report(fingerprint, teacher) is not None:
+            run.reused_count += 1
+        else:
+            data = views.collect_class_data(
+                run.period, [], students=roster, assignments=assignments, time_range=time_range
+            )
+            statistics = views.calculate_class_statistics(data)
+            try:
+                report_content = generate(views.build_class_report_prompt(data, statistics, run.period, []))
+                succeeded = True
+                run.generated_count += 1
+            except Exception as e:
+                logger.error(f"预生成教师 {teacher.id} 的班级报告失败: {e}")
+                report_content = f"班级报告生成失败，错误信息：{str(e)}"
+                succeeded = False
+                run.failed_count += 1
+            views.save_class_report(teacher, run.period, [], fingerprint, statistics, report_content, succeeded)
+
+        _save_progress(run, str(teacher.id))
+    return False
+
+
+def precompute_period(run, deadline, pool, generate, class_reports=True):
+    """继续一个运行记录直到完成或到达截止时间（当前块完成后暂停）"""
+    # 时间范围起点按报告的使用日（窗口结束的日期）对齐，与高峰时段接口计算的范围一致，
+    # 窗口跨越午夜时午夜前生成的报告也能在第二天复用
+    usage_day = timezone.localdate(deadline) if deadline is not None else None
+    time_range = views.get_time_range(run.period, day=usage_day)
+    try:
+        if run.stage == 'students':
+            if not precompute_learning_reports(run, time_range, deadline, pool, generate):
+                run.status = 'paused'
+                run.save(update_fields=['status', 'updated_at'])
+                return run
+            run.stage = 'classes' if class_reports else 'done'
+            _save_progress(run, '')
+
+        if run.stage == 'classes':
+            if not precompute_class_reports(run, time_range, deadline, generate):
+                run.status = 'paused'
+                run.save(update_fields=['status', 'updated_at'])
+                return run
+            run.stage = 'done'
+            _save_progress(run, '')
+    except BaseException:
+        # 中断（包括 Ctrl+C）时立即释放，下次运行不必等待超时
+        run.status = 'paused'
+        run.save(update_fields=['status', 'updated_at'])
+        raise
+
+    run.status = 'completed'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return run
+
+
+def run_precompute(run_date, deadline=None, periods=None, class_reports=None):
+    """
+    依次预生成各时间段的报告
+
+    Args:
+        run_date: 窗口日期，同一日期的运行记录共享进度
+        deadline: 截止时间（窗口结束），None 表示不限
+    Returns:
+        本次处理的运行记录列表（已完成或由其他进程运行的时间段不包含在内）
+    """
+    config = get_precompute_settings()
+    batch_config = get_batch_settings()
+    periods = periods or config['PERIODS']
+    if class_reports is None:
+        class_reports = config['CLASS_REPORTS']
+    limiter = SharedRateLimiter(config['RATE_LIMIT'])
+
+    def generate(prompt):
+        return call_with_retry(
+            lambda: views.ask_gemini(prompt, temperature=0.7),
+            limiter, batch_config['MAX_RETRIES'], batch_config['RETRY_BACKOFF']
+        )
+
+    runs = []
+    pool = ThreadPoolExecutor(max_workers=config['CONCURRENCY'], thread_name_prefix='report-precompute-ai')
+    try:
+        for period in periods:
+            if not _before(deadline):
+                break
+            run = claim_run(run_date, period)
+            if run is None:
+                logger.info(f"{run_date} {period} 报告预生成已完成或正在其他进程中运行，跳过")
+                continue
+            runs.append(precompute_period(run, deadline, pool, generate, class_reports=class_reports))
+    finally:
+        pool.shutdown(wait=True)
+    return runs
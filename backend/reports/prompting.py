@@ -0,0 +1,444 @@
+"""
+学习报告提示词构建 - 在令牌预算内挑选最有价值的学习数据
+
+原实现把每次提交、每道题的题目/答案/反馈摘录和每个问答会话都用 indent=2 的JSON写入提示词，
+一学期的数据会让提示词过长，既慢又贵，有时还会超出模型上下文。这里改为：
+- 各科目汇总（作业数、平均得分率、提问次数）与知识点掌握度摘要始终保留
+- 其余内容按信号强弱排序：作业按时间倒序、题目按得分率升序（最薄弱的优先）、问答按时间倒序
+- 各部分按比例分配预算，未用完的预算留给后续部分；放不下的条目按科目汇总成一行摘要
+- JSON使用紧凑格式（无缩进、无多余空格）
+
+令牌数按字符粗略估算：中文等宽字符约1个令牌，其余字符约4个字符1个令牌。
+预算通过 settings.REPORT_PROMPT_TOKEN_BUDGET 配置。
+"""
+
+import json
+import logging
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, Prefetch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 6000
+
+# 各部分占可变预算的比例（按顺序填充，未用完的部分在第二轮中按同样顺序继续使用）
+SECTION_SHARES = [
+    ('assignments', 0.2),
+    ('weak_questions', 0.45),
+    ('qa', 0.35),
+]
+
+# 每个问答会话写入提示词的消息数，收集数据时也只预取这么多条
+QA_MESSAGES_PER_SESSION = 6
+
+_WIDE_CHAR = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """粗略估算文本的令牌数"""
+    wide = len(_WIDE_CHAR.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def excerpt(text, limit):
+    text = (text or '').strip()
+    return text[:limit] + ('...' if len(text) > limit else '')
+
+
+def _percentage(score, total):
+    return round(score / total * 100, 1) if total else 0
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else '未知时间'
+
+
+def with_bounded_messages(sessions, limit=QA_MESSAGES_PER_SESSION):
+    """
+    问答会话查询集：每个会话只预取前 limit 条消息（存入 prompt_messages），并标注消息总数
+
+    Django 对切片查询集的 Prefetch 使用 ROW_NUMBER() OVER (PARTITION BY session_id) 窗口函数实现，
+    内存占用为 会话数 × limit，与消息总量无关。
+    """
+    QAMessage = apps.get_model('qa', 'QAMessage')
+    return sessions.annotate(message_count=Count('messages')).prefetch_related(
+        Prefetch(
+            'messages',
+            queryset=QAMessage.objects.order_by('created_at', 'id')[:limit],
+            to_attr='prompt_messages'
+        )
+    )
+
+
+def _session_messages(session):
+    """会话的前若干条消息与消息总数（未使用 with_bounded_messages 时单独查询）"""
+    messages = getattr(session, 'prompt_messages', None)
+    if messages is None:
+        messages = list(session.messages.all()[:QA_MESSAGES_PER_SESSION])
+    return messages[:QA_MESSAGES_PER_SESSION], getattr(session, 'message_count', None) or len(messages)
+
+
+def collect_prompt_items(data):
+    """
+    从学习数据中提取提示词条目
+
+    Returns:
+        {'subjects': 科目汇总列表, 'assignments': [...], 'weak_questions': [...], 'qa': [...]}
+        作业、题目、问答均已按优先级排序，并带有 'subject' 字段用于汇总未列出的条目
+    """
+    subjects = defaultdict(lambda: {'assignments': 0, 'score': 0, 'possible': 0, 'questions': 0})
+    assignments = []
+    questions = []
+    qa = []
+
+    for submission in data.get('submissions') or []:
+        assignment = submission.assignment
+        score = submission.obtained_score or 0
+        summary = subjects[assignment.subject]
+        summary['assignments'] += 1
+        summary['score'] += score
+        summary['possible'] += assignment.total_score or 0
+
+        assignments.append({
+            'title': assignment.title,
+            'subject': assignment.subject,
+            'score': score,
+            'max_score': assignment.total_score,
+            'rate': _percentage(score, assignment.total_score),
+            'submitted_at': _format_time(submission.submitted_at),
+            '_sort': submission.submitted_at,
+        })
+
+        for answer in submission.answers.all():
+            max_score = answer.question.score or 0
+            obtained = answer.obtained_score or 0
+            questions.append({
+                'subject': assignment.subject,
+                'assignment': assignment.title,
+                'question': excerpt(answer.question.question_text, 80),
+                'answer': excerpt(answer.answer_text, 120),
+                'score': obtained,
+                'max_score': max_score,
+                'feedback': excerpt(answer.ai_feedback, 120),
+                'rate': _percentage(obtained, max_score),
+            })
+
+    for session in data.get('qa_sessions') or []:
+        messages, message_count = _session_messages(session)
+        subjects[session.subject]['questions'] += 1
+        if not messages:
+            continue
+        qa.append({
+            'subject': session.subject,
+            'time': _format_time(session.updated_at),
+            'message_count': message_count,
+            'conversation': [
+                {'role': message.role, 'content': excerpt(message.content, 100)}
+                for message in messages
+            ],
+            '_sort': session.updated_at,
+        })
+
+    for question in data.get('old_qa_questions') or []:
+        subjects[question.subject or '未分类']['questions'] += 1
+        answer = getattr(question, 'answer', None)
+        qa.append({
+            'subject': question.subject or '未分类',
+            'time': _format_time(question.created_at),
+            'question': excerpt(question.question_text, 150),
+            'ai_answer': excerpt(answer.ai_answer if answer else '', 150),
+            '_sort': question.created_at,
+        })
+
+    assignments.sort(key=lambda item: item['_sort'], reverse=True)
+    qa.sort(key=lambda item: item['_sort'], reverse=True)
+    # 得分率相同时满分较高的题目优先（失分更多）
+    questions.sort(key=lambda item: (item['rate'], -item['max_score']))
+    for item in assignments + qa:
+        del item['_sort']
+
+    subject_rows = [
+        {
+            'subject': subject,
+            'assignments': summary['assignments'],
+            'rate': _percentage(summary['score'], summary['possible']),
+            'questions': summary['questions'],
+        }
+        for subject, summary in sorted(subjects.items())
+    ]
+    return {'subjects': subject_rows, 'assignments': assignments, 'weak_questions': questions, 'qa': qa}
+
+
+def fit_to_budget(sections, budget):
+    """
+    按 SECTION_SHARES 在预算内挑选条目
+
+    Returns:
+        (选中的条目 {部分: [...]}, 未选中的条目 {部分: [...]})
+    """
+    selected = {name: [] for name, _ in SECTION_SHARES}
+    positions = {name: 0 for name, _ in SECTION_SHARES}
+    remaining = budget
+
+    def fill(name, allowance):
+        nonlocal remaining
+        used = 0
+        items = sections[name]
+        while positions[name] < len(items):
+            cost = estimate_tokens(compact_json(items[positions[name]])) + 1
+            if used + cost > allowance or cost > remaining:
+                break
+            selected[name].append(items[positions[name]])
+            positions[name] += 1
+            used += cost
+            remaining -= cost
+
+    for name, share in SECTION_SHARES:
+        fill(name, budget * share)
+    for name, _ in SECTION_SHARES:
+        fill(name, remaining)
+
+    dropped = {name: sections[name][positions[name]:] for name, _ in SECTION_SHARES}
+    return selected, dropped
+
+
+def summarize_dropped(dropped):
+    """未列出的条目按科目汇总"""
+    summary = []
+    labels = {'assignments': '作业', 'weak_questions': '题目', 'qa': '问答'}
+    for name, items in dropped.items():
+        if not items:
+            continue
+        by_subject = defaultdict(list)
+        for item in items:
+            by_subject[item['subject']].append(item)
+        for subject, subject_items in sorted(by_subject.items()):
+            row = {'type': labels[name], 'subject': subject, 'count': len(subject_items)}
+            if name != 'qa':
+                row['avg_rate'] = round(sum(item['rate'] for item in subject_items) / len(subject_items), 1)
+            summary.append(row)
+    return summary
+
+
+# 报告提纲：单次生成时合并为一段要求，分段生成时每个部分单独成为一次AI调用
+LEARNING_REPORT_OUTLINE = {
+    'name': '学习报告',
+    'tone': '专业、客观、建设性',
+    'length': '1000-1500字',
+    'section_length': '200-300字',
+    'sections': [
+        ('学习概况总结', ['整体学习表现评价', '主要学习成果']),
+        ('作业完成情况分析', ['作业完成率分析', '得分情况分析', '各科目表现对比']),
+        ('知识掌握情况', ['强项知识点', '薄弱环节识别', '具体问题分析']),
+        ('学习行为分析', ['提问频率和质量', '学习主动性评价', '问题解决能力']),
+        ('改进建议', ['针对性学习建议', '具体改进措施', '推荐学习资源']),
+    ],
+}
+
+CLASS_REPORT_OUTLINE = {
+    'name': '班级分析报告',
+    'tone': '专业、客观',
+    'length': '800-1200字',
+    'section_length': '160-240字',
+    'sections': [
+        ('班级整体表现', ['整体学习状况评价', '完成率和成绩分析']),
+        ('优秀表现', ['表现突出的学生', '值得推广的学习方法']),
+        ('需要关注的问题', ['学习困难的学生', '普遍存在的问题']),
+        ('常见问题汇总', ['高频提问的知识点', '学生普遍困惑的内容']),
+        ('教学改进建议', ['针对班级情况的教学调整', '具体的改进措施']),
+    ],
+}
+
+
+def outline_instructions(outline):
+    """整份报告的撰写要求"""
+    text = f"\n请生成一份结构化的{outline['name']}，包含以下部分：\n\n"
+    for number, (title, points) in enumerate(outline['sections'], start=1):
+        text += f"{number}. **{title}**\n"
+        text += ''.join(f"   - {point}\n" for point in points)
+        text += "\n"
+    text += f"请用{outline['tone']}的语言撰写报告，字数控制在{outline['length']}。\n"
+    return text
+
+
+def section_prompts(context, outline):
+    """每个部分的提示词（共享同一份数据上下文）"""
+    titles = '、'.join(title for title, _ in outline['sections'])
+    prompts = []
+    for number, (title, points) in enumerate(outline['sections'], start=1):
+        requirements = ''.join(f"- {point}\n" for point in points)
+        prompts.append(context + f"""
+这份{outline['name']}由以下部分组成：{titles}。各部分分别撰写后按顺序拼接。
+现在只撰写第{number}部分「{title}」，内容包括：
+{requirements}
+要求：直接输出该部分正文（可以使用小标题和列表），不要输出部分标题，不要撰写其他部分的内容；
+用{outline['tone']}的语言撰写，字数控制在{outline['section_length']}。
+""")
+    return prompts
+
+
+def mastery_context(mastery):
+    """知识点掌握度摘要（累计数据，不随时间段变化），没有标注知识点的作答时为空"""
+    if not mastery or not (mastery['weak'] or mastery['strong']):
+        return ''
+    text = "\n知识点掌握度（answers 为作答数，avg 为平均得分率%，recent 为按作答时间衰减加权的近期得分率%）：\n"
+    if mastery['weak']:
+        text += f"薄弱知识点：{compact_json(mastery['weak'])}\n"
+    if mastery['strong']:
+        text += f"掌握较好的知识点：{compact_json(mastery['strong'])}\n"
+    return text
+
+
+def build_learning_report_context(student, data, statistics, period, subjects, token_budget=None):
+    """构建学习报告的数据上下文（令牌数控制在预算附近，不含撰写要求）"""
+    if token_budget is None:
+        token_budget = getattr(settings, 'REPORT_PROMPT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)
+    start_time, end_time = data['time_range']
+    sections = collect_prompt_items(data)
+    instructions = outline_instructions(LEARNING_REPORT_OUTLINE)
+
+    header = f"""
+你是一位专业的教育分析师，请根据以下学生的学习数据生成一份详细的学习报告。
+
+学生信息：
+- 姓名：{student.real_name}
+- 学号：{student.student_id}
+- 分析时间段：{start_time.strftime('%Y-%m-%d')} 至 {end_time.strftime('%Y-%m-%d')} ({period})
+- 涉及科目：{', '.join(subjects) if subjects else '所有科目'}
+
+学习统计：
+- 总作业数：{statistics['total_assignments']}
+- 已完成作业数：{statistics['completed_assignments']}
+- 平均得分：{statistics['average_score']}%
+- 提问次数：{statistics['total_questions']}
+
+各科目概况（rate 为得分率%）：
+{compact_json(sections['subjects'])}
+"""
+    header += mastery_context(data.get('knowledge_mastery'))
+
+    # 预留撰写要求与未列出内容摘要的空间
+    reserved = estimate_tokens(header + instructions) + 200
+    selected, dropped = fit_to_budget(sections, max(token_budget - reserved, 0))
+    omitted = summarize_dropped(dropped)
+
+    body = f"""
+作业得分（按时间倒序）：
+{compact_json(selected['assignments'])}
+
+得分率最低的题目：
+{compact_json(selected['weak_questions'])}
+
+近期问答记录：
+{compact_json(selected['qa'])}
+"""
+    if omitted:
+        body += f"""
+因篇幅未列出的内容（按科目汇总，avg_rate 为平均得分率%）：
+{compact_json(omitted)}
+"""
+
+    context = header + body
+
+    original = {name: sections[name] for name, _ in SECTION_SHARES}
+    original_tokens = estimate_tokens(header + instructions + json.dumps(original, ensure_ascii=False, indent=2))
+    logger.info(
+        f"学习报告提示词 {student.username}: 原始约 {original_tokens} tokens，"
+        f"压缩后约 {estimate_tokens(context + instructions)} tokens（{len(context + instructions)} 字符，预算 {token_budget}）；"
+        f"作业 {len(selected['assignments'])}/{len(sections['assignments'])}，"
+        f"题目 {len(selected['weak_questions'])}/{len(sections['weak_questions'])}，"
+        f"问答 {len(selected['qa'])}/{len(sections['qa'])}"
+    )
+    return context
+
+
+def build_learning_report_prompt(student, data, statistics, period, subjects, token_budget=None):
+    """构建学习报告提示词（单次生成整份报告）"""
+    context = build_learning_report_context(student, data, statistics, period, subjects, token_budget)
+    return context + outline_instructions(LEARNING_REPORT_OUTLINE)
+
+
+# 增量报告中上一份报告正文的最大字符数
+DELTA_BASE_REPORT_CHARS = 4000
+
+
+def build_delta_report_prompt(student, base_report, data, statistics, period, subjects, token_budget=None):
+    """
+    构建增量学习报告提示词：上一份报告正文 + 统计变化 + 此后新增的学习数据
+
+    提示词大小取决于新增数据量，而不是整个时间段的历史数据。
+    """
+    if token_budget is None:
+        token_budget = getattr(settings, 'REPORT_PROMPT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)
+    since, _ = data['time_range']
+    sections = collect_prompt_items(data)
+    outline = LEARNING_REPORT_OUTLINE
+    titles = '、'.join(title for title, _ in outline['sections'])
+
+    header = f"""
+你是一位专业的教育分析师。下面是 {since.strftime('%Y-%m-%d %H:%M')} 为该学生生成的学习报告，以及此后新增的学习数据，请在原报告的基础上更新。
+
+学生信息：
+- 姓名：{student.real_name}
+- 学号：{student.student_id}
+- 分析时间段：{period}
+- 涉及科目：{', '.join(subjects) if subjects else '所有科目'}
+
+学习统计（上次报告 → 当前）：
+- 总作业数：{base_report.total_assignments} → {statistics['total_assignments']}
+- 已完成作业数：{base_report.completed_assignments} → {statistics['completed_assignments']}
+- 平均得分：{base_report.average_score}% → {statistics['average_score']}%
+- 提问次数：{base_report.total_questions} → {statistics['total_questions']}
+
+上次报告：
+<<<
+{excerpt(base_report.report_content, DELTA_BASE_REPORT_CHARS)}
+>>>
+
+新增数据中各科目概况（rate 为得分率%）：
+{compact_json(sections['subjects'])}
+"""
+
+    instructions = f"""
+请输出更新后的完整学习报告：
+- 保持原报告的结构（{titles}）
+- 结合新增数据修改受影响的评价、分析与建议，未受影响的内容可以保留
+- 明确指出自上次报告以来的变化（进步、退步或新出现的问题）
+
+请用{outline['tone']}的语言撰写报告，字数控制在{outline['length']}。
+"""
+
+    reserved = estimate_tokens(header + instructions) + 200
+    selected, dropped = fit_to_budget(sections, max(token_budget - reserved, 0))
+    omitted = summarize_dropped(dropped)
+
+    body = f"""
+新增作业得分：
+{compact_json(selected['assignments'])}
+
+新增作业中得分率最低的题目：
+{compact_json(selected['weak_questions'])}
+
+新增问答记录：
+{compact_json(selected['qa'])}
+"""
+    if omitted:
+        body += f"""
+因篇幅未列出的新增内容（按科目汇总，avg_rate 为平均得分率%）：
+{compact_json(omitted)}
+"""
+
+    prompt = header + body + instructions
+    logger.info(
+        f"增量学习报告提示词 {student.username}: 约 {estimate_tokens(prompt)} tokens（{len(prompt)} 字符）；"
+        f"新增作业 {len(sections['assignments'])}，题目 {len(sections['weak_questions'])}，问答 {len(sections['qa'])}"
+    )
+    return prompt
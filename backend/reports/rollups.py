@@ -0,0 +1,233 @@
+"""
+学习数据日汇总模块 - 维护 StudentDailyStats 并基于汇总行计算报告统计
+
+汇总行按 (学生, 科目, 日期) 存储提交数、得分、总分、得分率与提问数。
+数据变化时只重算受影响的那一行（见 reports/signals.py），
+报告统计只需对时间段内的汇总行求和，不再扫描原始提交和问答记录。
+
+时间段按天取整：起始日和结束日当天的数据会完整计入，作业总数也按同样的整天范围统计。
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.apps import apps as django_apps
+from django.db.models import Q, F, Sum, Count, FloatField, Value
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone
+
+try:
+    from courses.scoping import student_course_ids
+except ImportError:
+    def student_course_ids(student_ids):
+        return {}
+
+STAT_FIELDS = [
+    'submission_count',
+    'scored_count',
+    'score_sum',
+    'possible_sum',
+    'score_rate_sum',
+    'qa_session_count',
+    'qa_question_count',
+]
+
+
+def local_date(value):
+    """时间对应的本地日期"""
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _score_rate():
+    """单次提交的得分率（百分比）"""
+    return Cast('obtained_score', FloatField()) / F('assignment__total_score') * Value(100.0)
+
+
+def _submission_aggregates():
+    scored = Q(assignment__total_score__gt=0)
+    return {
+        'submission_count': Count('id'),
+        'scored_count': Count('id', filter=scored),
+        'score_sum': Sum('obtained_score'),
+        'possible_sum': Sum('assignment__total_score'),
+        'score_rate_sum': Sum(_score_rate(), filter=scored),
+    }
+
+
+def refresh_daily_stats(student_id, subject, day, apps=django_apps):
+    """重算单个 (学生, 科目, 日期) 的汇总行，没有数据时删除该行"""
+    StudentDailyStats = apps.get_model('reports', 'StudentDailyStats')
+    Submission = apps.get_model('assignments', 'Submission')
+    QASession = apps.get_model('qa', 'QASession')
+    QAQuestion = apps.get_model('qa', 'QAQuestion')
+
+    start, end = _day_bounds(day)
+    values = Submission.objects.filter(
+        student_id=student_id,
+        assignment__subject=subject,
+        assignment__created_at__gte=start,
+        assignment__created_at__lt=end
+    ).aggregate(**_submission_aggregates())
+    values['qa_session_count'] = QASession.objects.filter(
+        student_id=student_id, subject=subject, updated_at__gte=start, updated_at__lt=end
+    ).count()
+    values['qa_question_count'] = QAQuestion.objects.filter(
+        student_id=student_id, subject=subject, created_at__gte=start, created_at__lt=end
+    ).count()
+    values = {field: values[field] or 0 for field in STAT_FIELDS}
+
+    if not any(values.values()):
+        StudentDailyStats.objects.filter(student_id=student_id, subject=subject, date=day).delete()
+        return None
+
+    row, _ = StudentDailyStats.objects.update_or_create(
+        student_id=student_id, subject=subject, date=day, defaults=values
+    )
+    return row
+
+
+def rebuild_daily_stats(student_ids=None, apps=django_apps, batch_size=1000):
+    """
+    从原始数据重建汇总表（分组聚合，不逐行处理）
+
+    Args:
+        student_ids: 只重建这些学生，为空时重建全部
+    Returns:
+        写入的汇总行数
+    """
+    StudentDailyStats = apps.get_model('reports', 'StudentDailyStats')
+    Submission = apps.get_model('assignments', 'Submission')
+    QASession = apps.get_model('qa', 'QASession')
+    QAQuestion = apps.get_model('qa', 'QAQuestion')
+
+    tzinfo = timezone.get_current_timezone()
+    submissions = Submission.objects.all()
+    qa_sessions = QASession.objects.all()
+    qa_questions = QAQuestion.objects.all()
+    existing = StudentDailyStats.objects.all()
+    if student_ids is not None:
+        submissions = submissions.filter(student_id__in=student_ids)
+        qa_sessions = qa_sessions.filter(student_id__in=student_ids)
+        qa_questions = qa_questions.filter(student_id__in=student_ids)
+        existing = existing.filter(student_id__in=student_ids)
+
+    rows = {}
+
+    def row_for(student_id, subject, day):
+        key = (student_id, subject, day)
+        if key not in rows:
+            rows[key] = {field: 0 for field in STAT_FIELDS}
+        return rows[key]
+
+    for item in submissions.order_by().values(
+        'student_id', subject=F('assignment__subject'), day=TruncDate('assignment__created_at', tzinfo=tzinfo)
+    ).annotate(**_submission_aggregates()):
+        row = row_for(item['student_id'], item['subject'], item['day'])
+        for field in ('submission_count', 'scored_count', 'score_sum', 'possible_sum', 'score_rate_sum'):
+            row[field] = item[field] or 0
+
+    for item in qa_sessions.order_by().values(
+        'student_id', 'subject', day=TruncDate('updated_at', tzinfo=tzinfo)
+    ).annotate(count=Count('id')):
+        row_for(item['student_id'], item['subject'], item['day'])['qa_session_count'] = item['count']
+
+    for item in qa_questions.order_by().values(
+        'student_id', 'subject', day=TruncDate('created_at', tzinfo=tzinfo)
+    ).annotate(count=Count('id')):
+        row_for(item['student_id'], item['subject'], item['day'])['qa_question_count'] = item['count']
+
+    existing.delete()
+    StudentDailyStats.objects.bulk_create([
+        StudentDailyStats(student_id=student_id, subject=subject, date=day, **values)
+        for (student_id, subject, day), values in rows.items()
+    ], batch_size=batch_size)
+    return len(rows)
+
+
+def daily_stats_rows(start_time, end_time, subjects=None):
+    """时间段（按天取整）内的汇总行查询集"""
+    StudentDailyStats = django_apps.get_model('reports', 'StudentDailyStats')
+    rows = StudentDailyStats.objects.all()
+    if start_time is not None:
+        rows = rows.filter(date__gte=local_date(start_time))
+    if end_time is not None:
+        rows = rows.filter(date__lte=local_date(end_time))
+    if subjects:
+        rows = rows.filter(subject__in=subjects)
+    return rows
+
+
+def _statistics_from_totals(totals, total_assignments):
+    totals = {field: totals.get(field) or 0 for field in STAT_FIELDS}
+    possible = totals['possible_sum']
+    average_score = (totals['score_sum'] / possible * 100) if possible > 0 else 0
+
+    return {
+        'total_assignments': total_assignments,
+        'completed_assignments': totals['submission_count'],
+        'average_score': round(average_score, 2),
+        'total_questions': totals['qa_session_count'] + totals['qa_question_count']
+    }
+
+
+def _assignments_in_days(start_time, end_time, subjects):
+    Assignment = django_apps.get_model('assignments', 'Assignment')
+    assignments = Assignment.objects.all()
+    if start_time is not None:
+        assignments = assignments.filter(created_at__gte=_day_bounds(local_date(start_time))[0])
+    if end_time is not None:
+        assignments = assignments.filter(created_at__lt=_day_bounds(local_date(end_time))[1])
+    if subjects:
+        assignments = assignments.filter(subject__in=subjects)
+    return assignments
+
+
+def assignment_count_in_days(start_time, end_time, subjects=None):
+    """时间段（按天取整，与汇总行一致）内布置的作业数"""
+    return _assignments_in_days(start_time, end_time, subjects).count()
+
+
+def student_assignment_counts_in_days(student_ids, start_time, end_time, subjects=None):
+    """
+    时间段（按天取整）内各学生可见的作业数 {学生ID: 作业数}
+
+    学生可见未指定课程的作业与所在课程的作业（与 courses.scoping.visible_assignments 一致），
+    按课程分组计数后按成员关系相加，查询数与学生数无关。
+    """
+    rows = _assignments_in_days(start_time, end_time, subjects).order_by().values('course_id').annotate(
+        count=Count('id')
+    )
+    per_course = {row['course_id']: row['count'] for row in rows}
+    course_ids = student_course_ids(student_ids)
+    return {
+        student_id: per_course.get(None, 0) + sum(
+            per_course.get(course_id, 0) for course_id in course_ids.get(student_id, ())
+        )
+        for student_id in student_ids
+    }
+
+
+def student_statistics_from_rollup(student, start_time, end_time, subjects):
+    """基于汇总行计算学生报告统计，返回结构与 calculate_statistics 一致"""
+    totals = daily_stats_rows(start_time, end_time, subjects).filter(student=student).aggregate(
+        **{field: Sum(field) for field in STAT_FIELDS}
+    )
+    total_assignments = student_assignment_counts_in_days([student.id], start_time, end_time, subjects)[student.id]
+    return _statistics_from_totals(totals, total_assignments)
+
+
+def students_statistics_from_rollup(student_ids, start_time, end_time, subjects):
+    """基于汇总行批量计算多名学生的报告统计 {学生ID: 统计}"""
+    rows = daily_stats_rows(start_time, end_time, subjects).filter(student_id__in=student_ids).order_by().values(
+        'student_id'
+    ).annotate(**{field: Sum(field) for field in STAT_FIELDS})
+    totals = {row['student_id']: row for row in rows}
+    total_assignments = student_assignment_counts_in_days(student_ids, start_time, end_time, subjects)
+    return {
+        student_id: _statistics_from_totals(totals.get(student_id, {}), total_assignments[student_id])
+        for student_id in student_ids
+    }
@@ -0,0 +1,86 @@
+"""
+分段并行生成 - 长报告按部分拆成多次较短的AI调用并发执行，再按提纲顺序拼接
+
+单次调用生成一千多字的五段式报告时，耗时取决于整份报告的顺序生成；
+分段生成时各部分共享同一份数据上下文并同时生成，总耗时约等于最长的单个部分。
+代价是数据上下文会随每个部分重复发送，输入令牌数约为提纲部分数倍。
+
+通过 settings.REPORT_SECTIONS 配置：
+- ENABLED: 是否分段生成（关闭时单次调用生成整份报告）
+- MAX_WORKERS: 同步生成时同时进行的AI调用数
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .prompting import section_prompts
+
+logger = logging.getLogger(__name__)
+
+
+def get_section_settings():
+    config = getattr(settings, 'REPORT_SECTIONS', {})
+    return {
+        'ENABLED': config.get('ENABLED', False),
+        'MAX_WORKERS': config.get('MAX_WORKERS', 5),
+    }
+
+
+def sectioned_generation_enabled():
+    return get_section_settings()['ENABLED']
+
+
+def stitch_sections(outline, texts):
+    """按提纲顺序拼接各部分，部分标题由这里统一生成"""
+    return '\n\n'.join(
+        f"## {number}. {title}\n\n{text.strip()}"
+        for number, ((title, _), text) in enumerate(zip(outline['sections'], texts), start=1)
+    )
+
+
+def _timed(generate):
+    def run(prompt):
+        start = time.perf_counter()
+        return generate(prompt), time.perf_counter() - start
+    return run
+
+
+def _log_timing(outline, started, durations):
+    logger.info(
+        f"{outline['name']}分段生成 {len(durations)} 个部分，总用时 {time.perf_counter() - started:.1f}s，"
+        f"最长单个部分 {max(durations):.1f}s"
+    )
+
+
+def generate_sections(context, outline, generate):
+    """
+    并发生成各部分并拼接
+
+    Args:
+        context: 共享的数据上下文
+        outline: 报告提纲（见 reports/prompting.py）
+        generate: 同步生成函数 prompt -> text，任一部分失败时抛出异常
+    """
+    prompts = section_prompts(context, outline)
+    started = time.perf_counter()
+    workers = max(1, min(get_section_settings()['MAX_WORKERS'], len(prompts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-section') as pool:
+        results = list(pool.map(_timed(generate), prompts))
+    _log_timing(outline, started, [duration for _, duration in results])
+    return stitch_sections(outline, [text for text, _ in results])
+
+
+async def generate_sections_async(context, outline, generate):
+    """并发生成各部分并拼接（异步），generate 为协程函数 prompt -> text"""
+    async def run(prompt):
+        start = time.perf_counter()
+        return await generate(prompt), time.perf_counter() - start
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(prompt) for prompt in section_prompts(context, outline)))
+    _log_timing(outline, started, [duration for _, duration in results])
+    return stitch_sections(outline, [text for text, _ in results])
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import LearningReport
+from .models import LearningReport, ClassReport, ReportBatch
 try:
     from accounts.models import User
 except ImportError:
@@ -25,6 +25,20 @@ class LearningReportCreateSerializer(serializers.Serializer):
         allow_empty=True,
         help_text="科目列表（可选）"
     )
+    force = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="强制重新生成（默认数据未变化时返回已有报告）"
+    )
+    mode = serializers.ChoiceField(
+        choices=[
+            ('full', '完整生成'),
+            ('delta', '增量更新')
+        ],
+        required=False,
+        default='full',
+        help_text="生成方式：delta 在同范围最近一份报告的基础上，只结合之后新增的数据更新（没有可用的基准报告时完整生成）"
+    )
 
     def validate(self, attrs):
         request = self.context.get('request')
@@ -63,6 +77,105 @@ class ClassReportCreateSerializer(serializers.Serializer):
         allow_empty=True,
         help_text="科目列表（可选）"
     )
+    force = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="强制重新生成（默认数据未变化时返回已有报告）"
+    )
+
+
+class ReportBatchCreateSerializer(serializers.Serializer):
+    """批量学习报告创建序列化器"""
+    student_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=True,
+        help_text="学生ID列表（可选，默认全部学生）"
+    )
+    period = serializers.ChoiceField(
+        choices=[
+            ('week', '最近一周'),
+            ('month', '最近一个月'),
+            ('semester', '最近一学期'),
+            ('all', '全部时间')
+        ],
+        help_text="时间段"
+    )
+    subjects = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        allow_empty=True,
+        help_text="科目列表（可选）"
+    )
+    force = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="强制重新生成（默认跳过数据未变化、已有报告的学生）"
+    )
+
+
+class LearningTrendQuerySerializer(serializers.Serializer):
+    """学习趋势查询参数序列化器"""
+    granularity = serializers.ChoiceField(
+        choices=[
+            ('day', '按天'),
+            ('week', '按周'),
+            ('month', '按月')
+        ],
+        required=False,
+        default='week',
+        help_text="分桶粒度"
+    )
+    period = serializers.ChoiceField(
+        choices=[
+            ('week', '最近一周'),
+            ('month', '最近一个月'),
+            ('semester', '最近一学期'),
+            ('all', '全部时间')
+        ],
+        required=False,
+        default='month',
+        help_text="时间段"
+    )
+    subjects = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        allow_empty=True,
+        help_text="科目列表（可选）"
+    )
+    student_id = serializers.UUIDField(required=False, help_text="学生ID（教师可选，不传时为全班趋势）")
+
+
+class ClassAnalyticsQuerySerializer(serializers.Serializer):
+    """班级成绩分析查询参数序列化器"""
+    period = serializers.ChoiceField(
+        choices=[
+            ('week', '最近一周'),
+            ('month', '最近一个月'),
+            ('semester', '最近一学期'),
+            ('all', '全部时间')
+        ],
+        required=False,
+        default='all',
+        help_text="时间段（按作业创建时间筛选）"
+    )
+    subjects = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        allow_empty=True,
+        help_text="科目列表（可选）"
+    )
+
+
+class KnowledgeMasteryQuerySerializer(serializers.Serializer):
+    """知识点掌握度查询参数序列化器"""
+    subjects = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        allow_empty=True,
+        help_text="科目列表（可选）"
+    )
+    student_id = serializers.UUIDField(required=False, help_text="学生ID（教师可选，不传时为全班各知识点的掌握度）")
 
 
 class LearningReportListSerializer(serializers.ModelSerializer):
@@ -78,7 +191,7 @@ class LearningReportListSerializer(serializers.ModelSerializer):
             'id', 'student_name', 'generated_by_name', 'period', 'period_display',
             'subjects', 'status', 'status_display', 'total_assignments',
             'completed_assignments', 'average_score', 'total_questions',
-            'created_at', 'updated_at'
+            'content_phase', 'created_at', 'updated_at'
         ]
 
 
@@ -96,5 +209,63 @@ class LearningReportDetailSerializer(serializers.ModelSerializer):
             'id', 'student_name', 'student_id_number', 'generated_by_name',
             'period', 'period_display', 'subjects', 'status', 'status_display',
             'total_assignments', 'completed_assignments', 'average_score',
-            'total_questions', 'report_content', 'created_at', 'updated_at'
+            'total_questions', 'report_content', 'content_phase', 'base_report', 'created_at', 'updated_at'
+        ]
+
+
+class ClassReportListSerializer(serializers.ModelSerializer):
+    """班级报告列表序列化器"""
+    generated_by_name = serializers.CharField(source='generated_by.real_name', read_only=True)
+    period_display = serializers.CharField(source='get_period_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    total_students = serializers.SerializerMethodField()
+    average_score = serializers.SerializerMethodField()
+    completion_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ClassReport
+        fields = [
+            'id', 'generated_by_name', 'period', 'period_display', 'subjects',
+            'status', 'status_display', 'total_students', 'average_score',
+            'completion_rate', 'created_at', 'updated_at'
+        ]
+
+    def get_total_students(self, obj):
+        return obj.statistics.get('total_students', 0)
+
+    def get_average_score(self, obj):
+        return obj.statistics.get('average_score', 0)
+
+    def get_completion_rate(self, obj):
+        return obj.statistics.get('completion_rate', 0)
+
+
+class ClassReportDetailSerializer(serializers.ModelSerializer):
+    """班级报告详情序列化器"""
+    generated_by_name = serializers.CharField(source='generated_by.real_name', read_only=True)
+    period_display = serializers.CharField(source='get_period_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = ClassReport
+        fields = [
+            'id', 'generated_by_name', 'period', 'period_display', 'subjects',
+            'status', 'status_display', 'statistics', 'report_content',
+            'created_at', 'updated_at'
+        ]
+
+
+class ReportBatchSerializer(serializers.ModelSerializer):
+    """批量学习报告任务序列化器"""
+    created_by_name = serializers.CharField(source='created_by.real_name', read_only=True)
+    period_display = serializers.CharField(source='get_period_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ReportBatch
+        fields = [
+            'id', 'created_by_name', 'period', 'period_display', 'subjects',
+            'status', 'status_display', 'total_count', 'completed_count',
+            'failed_count', 'reused_count', 'progress', 'created_at', 'updated_at'
         ]
@@ -0,0 +1,199 @@
+"""
+汇总表维护 - 提交、批改、问答数据变化时更新受影响的 StudentDailyStats 与 StudentKnowledgeMastery 行
+
+更新在事务提交后执行，失败只记录日志，不影响批改和问答流程。
+问答会话在每轮对话保存消息后都会更新（updated_at），因此监听会话的保存即可覆盖新消息。
+新批改的答案增量累加到掌握度行；答案重新批改或删除、题目的知识点或分值变化时重算对应知识点。
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .rollups import refresh_daily_stats, local_date
+from .mastery import record_answer, refresh_mastery
+
+logger = logging.getLogger(__name__)
+
+try:
+    from assignments.models import Assignment, Submission, Question, Answer
+except ImportError:
+    Assignment = None
+    Submission = None
+    Question = None
+    Answer = None
+
+try:
+    from qa.models import QASession, QAQuestion
+except ImportError:
+    QASession = None
+    QAQuestion = None
+
+
+def schedule_refresh(buckets):
+    """事务提交后重算一组 (学生ID, 科目, 日期) 汇总行"""
+    buckets = {bucket for bucket in buckets if bucket is not None}
+    if not buckets:
+        return
+
+    def refresh():
+        for student_id, subject, day in buckets:
+            try:
+                refresh_daily_stats(student_id, subject, day)
+            except Exception as e:
+                logger.error(f"学习日汇总更新失败 ({student_id}, {subject}, {day}): {e}")
+
+    transaction.on_commit(refresh)
+
+
+def submission_bucket(submission):
+    assignment = submission.assignment
+    return submission.student_id, assignment.subject, local_date(assignment.created_at)
+
+
+if Submission is not None:
+    @receiver(post_save, sender=Submission, dispatch_uid='daily_stats_submission_saved')
+    @receiver(post_delete, sender=Submission, dispatch_uid='daily_stats_submission_deleted')
+    def submission_changed(sender, instance, **kwargs):
+        schedule_refresh([submission_bucket(instance)])
+
+    @receiver(pre_save, sender=Assignment, dispatch_uid='daily_stats_assignment_pre_save')
+    def remember_assignment_fields(sender, instance, **kwargs):
+        if instance.pk and not instance._state.adding:
+            instance._daily_stats_old_fields = (
+                Assignment.objects.filter(pk=instance.pk).values_list('subject', 'total_score').first()
+            )
+
+    @receiver(post_save, sender=Assignment, dispatch_uid='daily_stats_assignment_saved')
+    def assignment_changed(sender, instance, created, **kwargs):
+        # 科目变化时，该作业的提交需要移到新科目的汇总行；总分变化时，总分合计与得分率需要重算
+        old_fields = getattr(instance, '_daily_stats_old_fields', None)
+        if created or old_fields is None:
+            return
+        old_subject, old_total_score = old_fields
+        if old_subject == instance.subject and old_total_score == instance.total_score:
+            return
+
+        day = local_date(instance.created_at)
+        student_ids = Submission.objects.filter(assignment=instance).values_list('student_id', flat=True)
+        buckets = []
+        for student_id in student_ids:
+            buckets.append((student_id, old_subject, day))
+            buckets.append((student_id, instance.subject, day))
+        schedule_refresh(buckets)
+
+
+if QASession is not None:
+    @receiver(pre_save, sender=QASession, dispatch_uid='daily_stats_qa_session_pre_save')
+    def remember_session_bucket(sender, instance, **kwargs):
+        # 保存前 updated_at 仍是上次保存的时间，会话可能从旧日期移到今天
+        if instance.updated_at is not None:
+            instance._daily_stats_old_bucket = (instance.student_id, instance.subject, local_date(instance.updated_at))
+
+    @receiver(post_save, sender=QASession, dispatch_uid='daily_stats_qa_session_saved')
+    @receiver(post_delete, sender=QASession, dispatch_uid='daily_stats_qa_session_deleted')
+    def qa_session_changed(sender, instance, **kwargs):
+        schedule_refresh([
+            getattr(instance, '_daily_stats_old_bucket', None),
+            (instance.student_id, instance.subject, local_date(instance.updated_at)),
+        ])
+
+    @receiver(post_save, sender=QAQuestion, dispatch_uid='daily_stats_qa_question_saved')
+    @receiver(post_delete, sender=QAQuestion, dispatch_uid='daily_stats_qa_question_deleted')
+    def qa_question_changed(sender, instance, **kwargs):
+        schedule_refresh([(instance.student_id, instance.subject, local_date(instance.created_at))])
+
+
+def schedule_mastery_refresh(knowledge_point_ids, student_id=None):
+    """事务提交后重算一组知识点的掌握度行（可限定学生）"""
+    knowledge_point_ids = set(knowledge_point_ids)
+    if not knowledge_point_ids:
+        return
+
+    def refresh():
+        try:
+            refresh_mastery(knowledge_point_ids, student_id=student_id)
+        except Exception as e:
+            logger.error(f"知识点掌握度重算失败 ({student_id}, {len(knowledge_point_ids)} 个知识点): {e}")
+
+    transaction.on_commit(refresh)
+
+
+def question_point_ids(question_id):
+    return list(Question.knowledge_points.through.objects.filter(
+        question_id=question_id
+    ).values_list('knowledgepoint_id', flat=True))
+
+
+if Answer is not None:
+    @receiver(post_save, sender=Answer, dispatch_uid='mastery_answer_saved')
+    def answer_saved(sender, instance, created, **kwargs):
+        if created:
+            if instance.obtained_score is None:
+                return
+
+            def record():
+                try:
+                    record_answer(instance.id)
+                except Exception as e:
+                    logger.error(f"知识点掌握度更新失败 (答案 {instance.id}): {e}")
+
+            transaction.on_commit(record)
+            return
+
+        # 重新批改：累加值无法撤销旧分数，重算该学生的相关知识点
+        student_id = Submission.objects.filter(id=instance.submission_id).values_list('student_id', flat=True).first()
+        schedule_mastery_refresh(question_point_ids(instance.question_id), student_id=student_id)
+
+    @receiver(pre_delete, sender=Answer, dispatch_uid='mastery_answer_pre_delete')
+    def remember_answer_points(sender, instance, **kwargs):
+        # 级联删除时题目的知识点关联可能先于答案删除，删除前记下学生与知识点
+        instance._mastery_student_id = (
+            Submission.objects.filter(id=instance.submission_id).values_list('student_id', flat=True).first()
+        )
+        instance._mastery_point_ids = question_point_ids(instance.question_id)
+
+    @receiver(post_delete, sender=Answer, dispatch_uid='mastery_answer_deleted')
+    def answer_deleted(sender, instance, **kwargs):
+        student_id = getattr(instance, '_mastery_student_id', None)
+        if student_id is not None:
+            schedule_mastery_refresh(getattr(instance, '_mastery_point_ids', []), student_id=student_id)
+
+    @receiver(pre_save, sender=Question, dispatch_uid='mastery_question_pre_save')
+    def remember_question_score(sender, instance, **kwargs):
+        if instance.pk and not instance._state.adding:
+            instance._mastery_old_score = (
+                Question.objects.filter(pk=instance.pk).values_list('score', flat=True).first()
+            )
+
+    @receiver(post_save, sender=Question, dispatch_uid='mastery_question_saved')
+    def question_saved(sender, instance, created, **kwargs):
+        # 分值变化时所有作答的得分率都会变化
+        old_score = getattr(instance, '_mastery_old_score', None)
+        if not created and old_score is not None and old_score != instance.score:
+            schedule_mastery_refresh(question_point_ids(instance.pk))
+
+    @receiver(m2m_changed, sender=Question.knowledge_points.through, dispatch_uid='mastery_question_points_changed')
+    def question_points_changed(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'pre_clear':
+            # clear 之后无法得知原有关联，先记下受影响的知识点
+            instance._mastery_cleared_point_ids = (
+                [instance.pk] if reverse else question_point_ids(instance.pk)
+            )
+            return
+        if action == 'post_clear':
+            point_ids = getattr(instance, '_mastery_cleared_point_ids', [])
+            question_ids = None if reverse else [instance.pk]
+        elif action in ('post_add', 'post_remove'):
+            # 正向（题目.knowledge_points）时 pk_set 为知识点，反向（知识点.questions）时为题目
+            point_ids = [instance.pk] if reverse else pk_set
+            question_ids = pk_set if reverse else [instance.pk]
+        else:
+            return
+
+        # 新建作业时给还没有答案的题目打标签，不需要重算
+        if question_ids is not None and not Answer.objects.filter(question_id__in=question_ids).exists():
+            return
+        schedule_mastery_refresh(point_ids)
@@ -0,0 +1,271 @@
+"""
+班级统计模块 - 在数据库中按学生分组聚合计算班级统计
+
+原实现会把时间段内的所有提交（连同答案、题目）加载到内存，再对每个学生扫描整个提交列表，
+复杂度为 O(学生数 × 提交数)。这里改为几条分组聚合查询：
+- 每个学生的提交数与平均得分率
+- 每个学生的问答次数（新版会话与旧版问答分别统计）
+- 高频提问科目
+成绩分布由每个学生的平均得分率分桶得到，只需遍历一次学生列表。
+
+启用日汇总表（settings.REPORT_DAILY_ROLLUP）时，compute_class_statistics_from_rollup
+直接对时间段内的 StudentDailyStats 行分组求和。汇总行不区分作业，
+按教师课程限定作业范围（course_scoped）时仍使用分组聚合查询。
+"""
+
+from django.db.models import Q, F, Sum, Count, Avg, FloatField, Value
+from django.db.models.functions import Cast
+
+from .rollups import daily_stats_rows, assignment_count_in_days
+
+try:
+    from accounts.models import User
+except ImportError:
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+try:
+    from assignments.models import Assignment, Submission
+except ImportError:
+    Assignment = None
+    Submission = None
+
+try:
+    from qa.models import QASession, QAQuestion
+except ImportError:
+    QASession = None
+    QAQuestion = None
+
+
+SCORE_BUCKETS = [
+    ('0-60', 60),
+    ('60-70', 70),
+    ('70-80', 80),
+    ('80-90', 90),
+    ('90-100', None),
+]
+
+
+# 流式读取学生列表时每次取出的行数
+STUDENT_CHUNK_SIZE = 2000
+
+
+def score_bucket(percentage):
+    """得分率所在的分数段"""
+    for label, upper in SCORE_BUCKETS:
+        if upper is None or percentage < upper:
+            return label
+
+
+def class_student_filter(students=None):
+    """班级学生的过滤条件：指定名单时按名单子查询，否则为全部学生"""
+    if students is None:
+        return Q(student__role='student')
+    return Q(student_id__in=students.values('id'))
+
+
+def build_class_scope(start_time, end_time, subjects, students=None, assignments=None):
+    """
+    构建班级统计所需的查询集（惰性，不加载数据）
+
+    Args:
+        students: 班级学生名单查询集（教师课程的学生），为空时为全部学生
+        assignments: 班级作业范围查询集（教师课程的作业），为空时为全部作业
+    Returns:
+        包含 students、assignments、submissions、qa_sessions、old_qa_questions 查询集的字典
+    """
+    student_filter = class_student_filter(students)
+    assignment_filter = Q(created_at__gte=start_time, created_at__lte=end_time)
+    qa_session_filter = student_filter & Q(updated_at__gte=start_time, updated_at__lte=end_time)
+    qa_question_filter = student_filter & Q(created_at__gte=start_time, created_at__lte=end_time)
+    if subjects:
+        assignment_filter &= Q(subject__in=subjects)
+        qa_session_filter &= Q(subject__in=subjects)
+        qa_question_filter &= Q(subject__in=subjects)
+
+    scope = {
+        'students': students if students is not None else User.objects.filter(role='student'),
+        'assignments': None,
+        'submissions': None,
+        'qa_sessions': None,
+        'old_qa_questions': None,
+        'time_range': (start_time, end_time),
+        'subjects': subjects,
+        'course_scoped': assignments is not None,
+    }
+
+    if Assignment is not None and Submission is not None:
+        scope['assignments'] = (assignments if assignments is not None else Assignment.objects.all()).filter(
+            assignment_filter
+        )
+        scope['submissions'] = Submission.objects.filter(
+            student_filter,
+            assignment__in=scope['assignments']
+        )
+    if QASession is not None:
+        scope['qa_sessions'] = QASession.objects.filter(qa_session_filter)
+    if QAQuestion is not None:
+        scope['old_qa_questions'] = QAQuestion.objects.filter(qa_question_filter)
+
+    return scope
+
+
+def _per_student_scores(submissions):
+    """按学生分组统计提交数与平均得分率（只有总分大于0的作业计入得分率）"""
+    if submissions is None:
+        return {}
+
+    scored = Q(assignment__total_score__gt=0)
+    percentage = Cast('obtained_score', FloatField()) / F('assignment__total_score') * Value(100.0)
+    rows = submissions.order_by().values('student_id').annotate(
+        submission_count=Count('id'),
+        scored_count=Count('id', filter=scored),
+        average=Avg(percentage, filter=scored),
+    )
+    return {row['student_id']: row for row in rows}
+
+
+def _per_student_counts(queryset):
+    """按学生分组计数"""
+    if queryset is None:
+        return {}
+    rows = queryset.order_by().values('student_id').annotate(count=Count('id'))
+    return {row['student_id']: row['count'] for row in rows}
+
+
+def qa_subject_counts(scope, limit=5):
+    """提问次数最多的科目 [(科目, 次数)]"""
+    counts = {}
+    for key in ('qa_sessions', 'old_qa_questions'):
+        queryset = scope.get(key)
+        if queryset is None:
+            continue
+        for row in queryset.order_by().values('subject').annotate(count=Count('id')):
+            counts[row['subject']] = counts.get(row['subject'], 0) + row['count']
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def _iter_students(scope):
+    """流式读取学生（不一次性载入整个学生列表）"""
+    return scope['students'].values('id', 'real_name', 'student_id').iterator(chunk_size=STUDENT_CHUNK_SIZE)
+
+
+def _summarize_class(students, total_assignments, per_student, qa_counts):
+    """
+    汇总班级统计
+
+    Args:
+        students: 学生字典的可迭代对象（id、real_name、student_id），只遍历一次，可以是流式查询
+        per_student: {学生ID: {'submission_count', 'average'}}，average为None表示没有计分提交
+        qa_counts: {学生ID: 提问次数}
+    """
+    total_submissions = sum(row['submission_count'] for row in per_student.values())
+    total_questions = sum(qa_counts.values())
+
+    total_students = 0
+    score_distribution = {label: 0 for label, _ in SCORE_BUCKETS}
+    student_averages = []
+    student_performance = []
+    for student in students:
+        total_students += 1
+        row = per_student.get(student['id'])
+        average = row['average'] if row else None
+        if average is not None:
+            # 浮点累加顺序不同会产生末位误差，先消除误差再分段和四舍五入，保证结果稳定
+            average = round(average, 9)
+            student_averages.append(average)
+            score_distribution[score_bucket(average)] += 1
+
+        student_performance.append({
+            'student_name': student['real_name'],
+            'student_id': student['student_id'],
+            'completed_assignments': row['submission_count'] if row else 0,
+            'average_score': round(average, 2) if average is not None else 0,
+            'qa_count': qa_counts.get(student['id'], 0)
+        })
+
+    average_score = sum(student_averages) / len(student_averages) if student_averages else 0
+    expected = total_students * total_assignments
+    completion_rate = (total_submissions / expected * 100) if expected > 0 else 0
+
+    return {
+        'total_students': total_students,
+        'total_assignments': total_assignments,
+        'total_submissions': total_submissions,
+        'completion_rate': round(completion_rate, 2),
+        'average_score': round(average_score, 2),
+        'score_distribution': score_distribution,
+        'student_performance': sorted(student_performance, key=lambda x: x['average_score'], reverse=True),
+        'total_questions': total_questions
+    }
+
+
+def compute_class_statistics(scope):
+    """
+    计算班级统计数据，返回结构与原 calculate_class_statistics 一致
+
+    Args:
+        scope: build_class_scope 返回的查询集字典
+    """
+    students = _iter_students(scope)
+    scores = _per_student_scores(scope['submissions'])
+    qa_sessions = _per_student_counts(scope['qa_sessions'])
+    old_qa_questions = _per_student_counts(scope['old_qa_questions'])
+
+    per_student = {
+        student_id: {
+            'submission_count': row['submission_count'],
+            'average': row['average'] if row['scored_count'] else None
+        }
+        for student_id, row in scores.items()
+    }
+    qa_counts = {
+        student_id: qa_sessions.get(student_id, 0) + old_qa_questions.get(student_id, 0)
+        for student_id in set(qa_sessions) | set(old_qa_questions)
+    }
+    total_assignments = scope['assignments'].count() if scope['assignments'] is not None else 0
+    return _summarize_class(students, total_assignments, per_student, qa_counts)
+
+
+def rollup_class_rows(scope):
+    """班级统计范围内（仅学生）的日汇总行"""
+    start_time, end_time = scope['time_range']
+    return daily_stats_rows(start_time, end_time, scope.get('subjects')).filter(
+        student_id__in=scope['students'].values('id')
+    )
+
+
+def compute_class_statistics_from_rollup(scope):
+    """基于日汇总表计算班级统计，返回结构与 compute_class_statistics 一致"""
+    students = _iter_students(scope)
+    rows = rollup_class_rows(scope).order_by().values('student_id').annotate(
+        submissions=Sum('submission_count'),
+        scored=Sum('scored_count'),
+        rate_sum=Sum('score_rate_sum'),
+        qa_sessions=Sum('qa_session_count'),
+        qa_questions=Sum('qa_question_count'),
+    )
+
+    per_student = {}
+    qa_counts = {}
+    for row in rows:
+        per_student[row['student_id']] = {
+            'submission_count': row['submissions'] or 0,
+            'average': row['rate_sum'] / row['scored'] if row['scored'] else None
+        }
+        qa_counts[row['student_id']] = (row['qa_sessions'] or 0) + (row['qa_questions'] or 0)
+
+    # 完成数来自按天取整的汇总行，作业总数也按整天范围统计
+    start_time, end_time = scope['time_range']
+    total_assignments = 0
+    if scope['assignments'] is not None:
+        total_assignments = assignment_count_in_days(start_time, end_time, scope.get('subjects'))
+    return _summarize_class(students, total_assignments, per_student, qa_counts)
+
+
+def rollup_qa_subject_counts(scope, limit=5):
+    """基于日汇总表统计提问次数最多的科目 [(科目, 次数)]"""
+    rows = rollup_class_rows(scope).order_by().values('subject').annotate(
+        count=Sum('qa_session_count') + Sum('qa_question_count')
+    ).filter(count__gt=0).order_by('-count')[:limit]
+    return [(row['subject'], row['count']) for row in rows]
@@ -0,0 +1,103 @@
+"""
+流式报告模块 - 通过SSE逐段推送AI生成的报告内容
+
+普通接口要等Gemini返回完整报告后才响应；流式接口在统计数据算好后立即开始推送，
+AI每生成一段Markdown就推送一段，用户一秒左右即可开始阅读。生成结束后完整内容写入报告记录。
+
+推送的事件：
+- report: 报告元数据与统计数据（学习报告同时附带本地统计报告，AI内容到达前可先展示）
+- chunk: AI生成的Markdown片段 {"content": "..."}
+- error: AI调用失败 {"message": "..."}
+- done: 生成结束且报告已保存，数据为最终的报告状态
+
+流式生成使用单次AI调用，不受 settings.REPORT_SECTIONS 分段生成配置影响。
+"""
+
+import itertools
+import logging
+
+from django.http import StreamingHttpResponse
+
+from realtime import format_sse
+
+try:
+    from ai_services import ask_gemini
+except ImportError:
+    ask_gemini = None
+
+logger = logging.getLogger(__name__)
+
+# generate_text_stream 出错时不抛出异常，而是以该前缀的文本作为最后一段返回
+STREAM_ERROR_PREFIX = '错误: AI服务调用失败'
+
+
+def iter_ai_chunks(prompt):
+    """逐段返回AI生成的内容，调用失败或没有返回内容时抛出异常"""
+    if ask_gemini is None:
+        raise RuntimeError('AI服务不可用')
+
+    received = False
+    for chunk in ask_gemini(prompt, stream=True, temperature=0.7):
+        if chunk.startswith(STREAM_ERROR_PREFIX):
+            raise RuntimeError(chunk)
+        received = True
+        yield chunk
+    if not received:
+        raise RuntimeError('AI服务未返回内容')
+
+
+def _event_writer():
+    event_ids = itertools.count(1)
+    return lambda event_type, data: format_sse({'id': next(event_ids), 'type': event_type, 'data': data})
+
+
+def stream_report(intro, prompt, on_complete, on_error):
+    """
+    流式生成报告的SSE事件生成器
+
+    Args:
+        intro: report 事件的数据
+        prompt: AI提示词
+        on_complete: on_complete(完整内容)，保存报告并返回 done 事件数据
+        on_error: on_error(异常)，记录失败并返回 done 事件数据
+
+    客户端中途断开时继续接收剩余内容并保存，报告不会停留在生成中。
+    """
+    event = _event_writer()
+    yield event('report', intro)
+
+    chunks = []
+    ai_chunks = iter_ai_chunks(prompt)
+    try:
+        for chunk in ai_chunks:
+            chunks.append(chunk)
+            yield event('chunk', {'content': chunk})
+    except GeneratorExit:
+        try:
+            chunks.extend(ai_chunks)
+            on_complete(''.join(chunks))
+        except Exception as e:
+            on_error(e)
+        raise
+    except Exception as e:
+        logger.warning(f"流式报告生成失败: {e}")
+        yield event('error', {'message': str(e)})
+        yield event('done', on_error(e))
+        return
+
+    yield event('done', on_complete(''.join(chunks)))
+
+
+def stream_existing_report(intro, content, done):
+    """复用已有报告时按同样的事件格式一次推送全部内容"""
+    event = _event_writer()
+    yield event('report', intro)
+    yield event('chunk', {'content': content})
+    yield event('done', done)
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
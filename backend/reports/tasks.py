@@ -0,0 +1,163 @@
+"""
+报告后台任务模块 - 学习报告在后台线程池中生成
+
+报告分两个阶段生成：接口在请求内计算统计数据，写入本地统计报告（content_phase=local）后立即返回；
+AI分析在工作线程中生成，成功后替换报告内容（content_phase=ai），失败时保留本地统计报告。
+客户端轮询报告详情或订阅 report_progress 实时事件，直到状态变为 completed / failed。
+
+通过 settings.REPORT_TASKS 配置：
+- MAX_WORKERS: 工作线程数（同时生成的报告数）
+- EAGER: 为 True 时在当前线程同步执行（调试用）
+- STALE_AFTER: 报告处于 generating 状态超过该秒数视为任务丢失（如进程重启）
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from realtime import publish_to_user
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_task_settings():
+    config = getattr(settings, 'REPORT_TASKS', {})
+    return {
+        'MAX_WORKERS': config.get('MAX_WORKERS', 2),
+        'EAGER': config.get('EAGER', False),
+        'STALE_AFTER': config.get('STALE_AFTER', 600),
+    }
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """获取报告生成线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_task_settings()['MAX_WORKERS'],
+                    thread_name_prefix='report-worker'
+                )
+    return _executor
+
+
+def publish_progress(report, stage, progress, **extra):
+    """向报告生成者（及报告所属学生）推送进度事件"""
+    data = {
+        'report_id': str(report.id),
+        'status': report.status,
+        'content_phase': report.content_phase,
+        'stage': stage,
+        'progress': progress,
+        **extra
+    }
+    for user_id in {report.generated_by_id, report.student_id}:
+        publish_to_user(user_id, 'report_progress', data)
+
+
+def enqueue_report(report_id):
+    """提交报告生成任务（在当前事务提交后执行，保证工作线程能读到报告记录）"""
+    if get_task_settings()['EAGER']:
+        transaction.on_commit(lambda: run_report_task(report_id))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_report_task, report_id))
+
+
+def run_report_task(report_id):
+    """工作线程入口：重新收集数据、计算统计，生成AI分析替换本地统计报告"""
+    from .models import LearningReport
+    from .views import (
+        prepare_report_context,
+        apply_report_statistics,
+        generate_report_content,
+        generate_delta_report_content,
+        generate_simple_report,
+    )
+
+    close_old_connections()
+    report = None
+    try:
+        report = LearningReport.objects.select_related('student', 'base_report').get(id=report_id)
+        if report.status != 'generating':
+            return
+
+        publish_progress(report, 'collecting', 10)
+        data, statistics = prepare_report_context(report.student, report.period, report.subjects)
+        apply_report_statistics(report, statistics)
+        report.save(update_fields=[
+            'total_assignments', 'completed_assignments', 'average_score', 'total_questions', 'updated_at'
+        ])
+
+        publish_progress(report, 'generating', 40)
+        report_content = None
+        content_phase = 'ai'
+        if report.base_report is not None:
+            try:
+                report_content = generate_delta_report_content(
+                    report.student, report.base_report, statistics, report.period, report.subjects
+                )
+            except Exception as e:
+                logger.warning(f"报告 {report_id} 增量生成失败，改为完整生成: {e}")
+                report.base_report = None
+
+        if report_content is None:
+            try:
+                report_content = generate_report_content(report.student, data, statistics, report.period, report.subjects)
+            except Exception as e:
+                # AI分析失败时保留本地统计报告（按最新统计数据重新生成）
+                logger.warning(f"报告 {report_id} AI分析失败，保留本地统计报告: {e}")
+                report_content = generate_simple_report(report.student, report.period, report.subjects, statistics, data)
+                content_phase = 'local'
+
+        report.content_phase = content_phase
+        report.report_content = report_content
+        report.status = 'completed'
+        report.save(update_fields=['report_content', 'content_phase', 'status', 'base_report', 'updated_at'])
+        publish_progress(report, 'completed', 100)
+
+    except LearningReport.DoesNotExist:
+        logger.warning(f"报告 {report_id} 不存在，跳过生成")
+    except Exception as e:
+        logger.error(f"报告 {report_id} 生成失败: {e}")
+        if report is not None and report.content_phase == 'local' and report.report_content:
+            # 第一阶段的本地统计报告仍然可用
+            report.status = 'completed'
+            report.save(update_fields=['status', 'updated_at'])
+            publish_progress(report, 'completed', 100, error=str(e))
+        elif report is not None:
+            report.status = 'failed'
+            report.report_content = f'生成失败：{str(e)}'
+            report.save(update_fields=['report_content', 'status', 'updated_at'])
+            publish_progress(report, 'failed', 100, error=str(e))
+    finally:
+        close_old_connections()
+
+
+def expire_stale_report(report):
+    """生成任务丢失（如进程重启）的报告标记为失败（已有本地统计报告时标记为完成），返回是否有更新"""
+    stale_after = get_task_settings()['STALE_AFTER']
+    if report.status != 'generating' or not stale_after:
+        return False
+    # 批量任务中的报告按顺序生成，以任务的最后进度时间为准
+    last_activity = report.batch.updated_at if report.batch_id else report.updated_at
+    if (timezone.now() - last_activity).total_seconds() < stale_after:
+        return False
+
+    if report.content_phase == 'local' and report.report_content:
+        # 已有本地统计报告，AI分析丢失时保留统计报告
+        report.status = 'completed'
+        report.save(update_fields=['status', 'updated_at'])
+        return True
+
+    report.status = 'failed'
+    report.report_content = '生成失败：任务超时，请重新生成'
+    report.save(update_fields=['report_content', 'status', 'updated_at'])
+    return True
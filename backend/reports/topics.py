@@ -0,0 +1,498 @@
+"""
+提问主题聚类 - 把学生的首轮提问聚成主题，供班级报告分析高频问题
+
+首轮提问包括新版会话中学生发送的第一条消息与旧版提问。文本向量化与聚类都在NumPy中完成：
+- 特征：字符2-gram与3-gram（适合中文，不需要分词），哈希到固定维度，避免维护词表；
+  标点与空白视为分隔，跨越分隔的n-gram不计入
+- 权重：次线性词频 × IDF，按行L2归一化，以稀疏行（CSR数组）存储
+- 聚类：球面 mini-batch k-means（余弦相似度），k-means++ 初始化
+
+模型常驻进程内存，首次使用时在全部学生的首轮提问（最多 MAX_FIT_QUESTIONS 条）上训练，
+并缓存每个提问的主题与相似度。之后班级报告只需查询时间段内提问的ID，缓存中没有的新提问
+按训练时的IDF向量化后分配到最近的主题，并用这些提问对主题中心做一次 mini-batch 更新；
+自训练以来新增的提问超过训练规模的 REFIT_RATIO 时重新训练。
+
+通过 settings.REPORT_TOPICS 配置：
+- ENABLED: 是否启用（关闭时班级报告使用按科目统计的提问次数）
+- CLUSTERS: 主题数上限（提问较少时按 sqrt(n/2) 减少）
+- TOP_TOPICS: 写入班级报告的主题数
+- EXAMPLES: 每个主题的代表性提问数
+- REFIT_RATIO: 新增提问占训练规模的比例超过该值时重新训练
+- MAX_FIT_QUESTIONS: 训练使用的最近提问数上限
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+try:
+    from qa.models import QAMessage, QAQuestion
+except ImportError:
+    QAMessage = None
+    QAQuestion = None
+
+logger = logging.getLogger(__name__)
+
+HASH_DIM = 1 << 16
+NGRAM_SIZES = (2, 3)
+MAX_CHARS = 200
+BATCH_SIZE = 2048
+EPOCHS = 2
+MAX_STEPS = 50
+EXAMPLE_LENGTH = 80
+KEYWORDS_PER_TOPIC = 4
+MIN_KEYWORD_OVERLAP = 2  # 关键词拼接所需的最少重叠字符数
+ID_CHUNK_SIZE = 5000
+
+_HASH_MULTIPLIER = np.uint64(1000003)
+_SEPARATORS = np.array(sorted({
+    ord(char) for char in
+    ' \t\r\n　，。！？、；：“”‘’（）《》【】…—·,.!?;:\'"()[]{}<>/\\|-_=+*&^%$#@~`'
+}), dtype=np.uint64)
+
+
+def get_topic_settings():
+    config = getattr(settings, 'REPORT_TOPICS', {})
+    return {
+        'ENABLED': config.get('ENABLED', True),
+        'CLUSTERS': config.get('CLUSTERS', 16),
+        'TOP_TOPICS': config.get('TOP_TOPICS', 5),
+        'EXAMPLES': config.get('EXAMPLES', 3),
+        'REFIT_RATIO': config.get('REFIT_RATIO', 0.3),
+        'MAX_FIT_QUESTIONS': config.get('MAX_FIT_QUESTIONS', 100000),
+    }
+
+
+def first_turn_messages():
+    """新版会话中学生发送的第一条消息"""
+    first = QAMessage.objects.filter(
+        session=OuterRef('session'), role='user'
+    ).order_by('created_at', 'id').values('id')[:1]
+    return QAMessage.objects.filter(role='user', session__student__role='student', id=Subquery(first))
+
+
+# ---------------------------------------------------------------------------
+# 向量化
+# ---------------------------------------------------------------------------
+
+class _Ngrams:
+    """一批文本的全部n-gram：所属文本、哈希特征、完整64位哈希与起始位置"""
+
+    def __init__(self, texts):
+        texts = [text[:MAX_CHARS].lower() for text in texts]
+        self.joined = ''.join(texts)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        codes = np.frombuffer(self.joined.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        owner = np.repeat(np.arange(len(texts)), lengths)
+        valid = ~np.isin(codes, _SEPARATORS)
+
+        rows, hashes, starts, sizes = [], [], [], []
+        for size in NGRAM_SIZES:
+            count = codes.size - size + 1
+            if count <= 0:
+                continue
+            keep = owner[:count] == owner[size - 1:]
+            value = np.full(count, size, dtype=np.uint64)
+            for offset in range(size):
+                keep &= valid[offset:offset + count]
+                value = (value * _HASH_MULTIPLIER) ^ codes[offset:offset + count]
+            index = np.flatnonzero(keep)
+            rows.append(owner[index])
+            hashes.append(value[index])
+            starts.append(index)
+            sizes.append(np.full(index.size, size, dtype=np.int64))
+
+        empty = np.empty(0, dtype=np.int64)
+        self.size = len(texts)
+        self.rows = np.concatenate(rows) if rows else empty
+        self.hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+        self.features = (self.hashes % np.uint64(HASH_DIM)).astype(np.int64)
+        self.starts = np.concatenate(starts) if starts else empty
+        self.sizes = np.concatenate(sizes) if sizes else empty
+
+    def term_counts(self):
+        """按 (文本, 特征) 合并计数，结果按文本排序"""
+        keys, counts = np.unique(self.rows * HASH_DIM + self.features, return_counts=True)
+        return keys // HASH_DIM, keys % HASH_DIM, counts
+
+    def text(self, position):
+        start = self.starts[position]
+        return self.joined[start:start + self.sizes[position]]
+
+
+def _tfidf(rows, features, counts, size, idf):
+    """次线性TF-IDF并按行L2归一化，返回CSR (indptr, indices, data)；没有特征的行为空行"""
+    data = ((1.0 + np.log(counts)) * idf[features]).astype(np.float32)
+    norms = np.sqrt(np.bincount(rows, weights=data.astype(np.float64) ** 2, minlength=size))
+    data /= norms[rows].astype(np.float32)
+    indptr = np.searchsorted(rows, np.arange(size + 1))
+    return indptr, features, data
+
+
+def _take_rows(matrix, order):
+    """按行号取出子矩阵"""
+    indptr, indices, data = matrix
+    lengths = indptr[order + 1] - indptr[order]
+    new_indptr = np.concatenate([[0], np.cumsum(lengths)])
+    positions = np.arange(new_indptr[-1]) - np.repeat(new_indptr[:-1] - indptr[order], lengths)
+    return new_indptr, indices[positions], data[positions]
+
+
+def _similarities(matrix, centroids_t):
+    """稀疏行与各主题中心的余弦相似度，centroids_t 为 (HASH_DIM, k)"""
+    indptr, indices, data = matrix
+    size = len(indptr) - 1
+    result = np.empty((size, centroids_t.shape[1]), dtype=np.float32)
+    for start in range(0, size, BATCH_SIZE):
+        stop = min(size, start + BATCH_SIZE)
+        low, high = indptr[start], indptr[stop]
+        if low == high:
+            result[start:stop] = 0
+            continue
+        contributions = centroids_t[indices[low:high]] * data[low:high, None]
+        # 按行分段求和；空行的起点可能越界或落在下一行，结果置零
+        bounds = indptr[start:stop] - low
+        lengths = indptr[start + 1:stop + 1] - indptr[start:stop]
+        result[start:stop] = np.add.reduceat(contributions, np.minimum(bounds, high - low - 1), axis=0)
+        result[start:stop][lengths == 0] = 0
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 聚类
+# ---------------------------------------------------------------------------
+
+def _normalize(centroids):
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    centroids /= norms
+
+
+def _dense_row(matrix, row):
+    indptr, indices, data = matrix
+    vector = np.zeros(HASH_DIM, dtype=np.float32)
+    vector[indices[indptr[row]:indptr[row + 1]]] = data[indptr[row]:indptr[row + 1]]
+    return vector
+
+
+def _kmeans_plus_plus(matrix, k, rng):
+    """在样本上用 k-means++ 选初始中心（按 1 - 最大相似度 的概率选下一个中心）"""
+    size = len(matrix[0]) - 1
+    centroids = np.zeros((k, HASH_DIM), dtype=np.float32)
+    centroids[0] = _dense_row(matrix, rng.integers(size))
+    best = _similarities(matrix, centroids[:1].T.copy())[:, 0]
+    for index in range(1, k):
+        distance = np.clip(1.0 - best, 0, None).astype(np.float64)
+        total = distance.sum()
+        row = rng.choice(size, p=distance / total) if total > 0 else rng.integers(size)
+        centroids[index] = _dense_row(matrix, row)
+        best = np.maximum(best, _similarities(matrix, centroids[index:index + 1].T.copy())[:, 0])
+    return centroids
+
+
+def _minibatch_update(centroids, counts, matrix, labels):
+    """mini-batch k-means 更新：每个中心按 本批数量 / 累计数量 的步长移向本批均值"""
+    indptr, indices, data = matrix
+    k = centroids.shape[0]
+    batch_counts = np.bincount(labels, minlength=k)
+    counts += batch_counts
+    rate = np.divide(batch_counts, counts, out=np.zeros(k), where=counts > 0)
+    # (1 - 步长) × 中心 + 步长 × 本批均值，均值部分按稀疏元素累加
+    owners = np.repeat(labels, np.diff(indptr))
+    weights = data * (rate / np.maximum(batch_counts, 1))[owners]
+    centroids *= (1.0 - rate)[:, None].astype(np.float32)
+    centroids += np.bincount(
+        owners * HASH_DIM + indices, weights=weights, minlength=k * HASH_DIM
+    ).reshape(k, HASH_DIM).astype(np.float32)
+    _normalize(centroids)
+
+
+def _merge_keyword(keywords, text):
+    """
+    加入关键词：与已有关键词首尾重叠至少 MIN_KEYWORD_OVERLAP 个字符的n-gram拼接成更长的词
+    （如“列表推”“表推导”合并为“列表推导”）；只重叠一个字符的不合并，避免“except”“try”拼成“exceptry”
+    """
+    for index, word in enumerate(keywords):
+        if text in word:
+            return
+        if word in text:
+            keywords[index] = text
+            return
+        for overlap in range(min(len(word), len(text)) - 1, MIN_KEYWORD_OVERLAP - 1, -1):
+            if word.endswith(text[:overlap]):
+                keywords[index] = word + text[overlap:]
+                return
+            if text.endswith(word[:overlap]):
+                keywords[index] = text + word[overlap:]
+                return
+    keywords.append(text)
+
+
+class TopicModel:
+    """首轮提问的主题模型与每个提问的主题缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.centroids = None
+        self.idf = None
+        self.counts = None
+        self.keywords = []
+        self.rows = {}  # 提问ID -> 缓存行号
+        self.labels = np.empty(0, dtype=np.int32)
+        self.similarities = np.empty(0, dtype=np.float32)
+        self.fitted_size = 0
+        self.assigned_since_fit = 0
+
+    # 训练 -------------------------------------------------------------------
+
+    def fit(self, keys, texts):
+        """在给定提问上重新训练，并缓存它们的主题"""
+        config = get_topic_settings()
+        started = time.perf_counter()
+        ngrams = _Ngrams(texts)
+        rows, features, counts = ngrams.term_counts()
+        document_frequency = np.bincount(features, minlength=HASH_DIM)
+        idf = (np.log((1.0 + ngrams.size) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        matrix = _tfidf(rows, features, counts, ngrams.size, idf)
+
+        nonempty = np.flatnonzero(np.diff(matrix[0]))
+        k = int(min(config['CLUSTERS'], max(1, round((nonempty.size / 2) ** 0.5))))
+        rng = np.random.default_rng(0)
+        labels = np.full(ngrams.size, -1, dtype=np.int32)
+        similarities = np.zeros(ngrams.size, dtype=np.float32)
+
+        if nonempty.size:
+            shuffled = _take_rows(matrix, rng.permutation(nonempty))
+            sample = _take_rows(shuffled, np.arange(min(nonempty.size, 2000)))
+            centroids = _kmeans_plus_plus(sample, k, rng)
+            cluster_counts = np.zeros(k, dtype=np.float64)
+            batch_starts = list(range(0, nonempty.size, BATCH_SIZE)) * EPOCHS
+            for start in batch_starts[:MAX_STEPS]:
+                batch = _take_rows(shuffled, np.arange(start, min(nonempty.size, start + BATCH_SIZE)))
+                batch_labels = _similarities(batch, centroids.T.copy()).argmax(axis=1)
+                _minibatch_update(centroids, cluster_counts, batch, batch_labels)
+
+            scores = _similarities(matrix, centroids.T.copy())
+            labels[nonempty] = scores[nonempty].argmax(axis=1)
+            similarities[nonempty] = scores[nonempty, labels[nonempty]]
+            self.keywords = self._extract_keywords(ngrams, centroids, labels)
+        else:
+            centroids = np.zeros((k, HASH_DIM), dtype=np.float32)
+            cluster_counts = np.zeros(k, dtype=np.float64)
+            self.keywords = [[] for _ in range(k)]
+
+        self.centroids = centroids
+        self.counts = cluster_counts
+        self.idf = idf
+        self.rows = {key: index for index, key in enumerate(keys)}
+        self.labels = labels
+        self.similarities = similarities
+        self.fitted_size = len(keys)
+        self.assigned_since_fit = 0
+        logger.debug(
+            f"提问主题模型训练完成：{len(keys)} 条提问，{k} 个主题，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    @staticmethod
+    def _extract_keywords(ngrams, centroids, labels):
+        """主题关键词：中心权重最高的特征，取该主题内最常见的对应n-gram文本"""
+        top_features = np.argsort(-centroids, axis=1)[:, :KEYWORDS_PER_TOPIC * 3]
+        candidates = np.isin(ngrams.features, top_features.ravel())
+        positions = np.flatnonzero(candidates)
+        owner_labels = labels[ngrams.rows[positions]]
+
+        keywords = []
+        for topic, features in enumerate(top_features):
+            chosen = []
+            in_topic = positions[owner_labels == topic]
+            for feature in features:
+                matches = in_topic[ngrams.features[in_topic] == feature]
+                if not matches.size or centroids[topic, feature] <= 0:
+                    continue
+                values, first, counts = np.unique(ngrams.hashes[matches], return_index=True, return_counts=True)
+                _merge_keyword(chosen, ngrams.text(matches[first[counts.argmax()]]))
+            # 合并后的词之间可能仍有重叠，再合并到不再变化为止
+            while True:
+                merged = []
+                for word in chosen:
+                    _merge_keyword(merged, word)
+                if merged == chosen:
+                    break
+                chosen = merged
+            keywords.append(chosen[:KEYWORDS_PER_TOPIC])
+        return keywords
+
+    # 增量分配 -----------------------------------------------------------------
+
+    def assign(self, keys, texts):
+        """为缓存中没有的提问分配主题，并用它们做一次 mini-batch 更新"""
+        ngrams = _Ngrams(texts)
+        rows, features, counts = ngrams.term_counts()
+        matrix = _tfidf(rows, features, counts, ngrams.size, self.idf)
+        nonempty = np.flatnonzero(np.diff(matrix[0]))
+
+        labels = np.full(ngrams.size, -1, dtype=np.int32)
+        similarities = np.zeros(ngrams.size, dtype=np.float32)
+        if nonempty.size:
+            scores = _similarities(matrix, self.centroids.T.copy())
+            labels[nonempty] = scores[nonempty].argmax(axis=1)
+            similarities[nonempty] = scores[nonempty, labels[nonempty]]
+            _minibatch_update(self.centroids, self.counts, _take_rows(matrix, nonempty), labels[nonempty])
+
+        offset = self.labels.size
+        self.rows.update((key, offset + index) for index, key in enumerate(keys))
+        self.labels = np.concatenate([self.labels, labels])
+        self.similarities = np.concatenate([self.similarities, similarities])
+        self.assigned_since_fit += len(keys)
+
+    def needs_refit(self, incoming):
+        if self.centroids is None:
+            return True
+        ratio = get_topic_settings()['REFIT_RATIO']
+        return self.assigned_since_fit + incoming > max(self.fitted_size, 1) * ratio
+
+    # 查询 --------------------------------------------------------------------
+
+    def lookup(self, keys):
+        """返回 (主题, 相似度) 数组，未知提问的主题为 -1"""
+        index = np.fromiter((self.rows.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        known = index >= 0
+        labels = np.full(len(keys), -1, dtype=np.int32)
+        similarities = np.zeros(len(keys), dtype=np.float32)
+        labels[known] = self.labels[index[known]]
+        similarities[known] = self.similarities[index[known]]
+        return labels, similarities
+
+
+def _load_texts(session_ids=None, question_ids=None, limit=None):
+    """
+    读取首轮提问文本 [(ID, 文本)]，会话以会话ID为键（会话的第一条学生消息不会改变）
+
+    不指定ID时读取最近的首轮提问；指定ID时没有学生消息的会话文本为空字符串。
+    """
+    items = []
+    if QAMessage is not None:
+        messages = first_turn_messages().order_by('-created_at').values_list('session_id', 'content')
+        if session_ids is None:
+            items += list(messages[:limit])
+        else:
+            loaded = {}
+            for chunk in _chunks(session_ids):
+                loaded.update(messages.filter(session_id__in=chunk))
+            items += [(key, loaded.get(key, '')) for key in session_ids]
+    if QAQuestion is not None:
+        questions = QAQuestion.objects.order_by('-created_at').values_list('id', 'question_text')
+        if question_ids is None:
+            items += list(questions.filter(student__role='student')[:limit])
+        else:
+            for chunk in _chunks(question_ids):
+                items += list(questions.filter(id__in=chunk))
+    return items
+
+
+def _chunks(ids):
+    """按块拆分ID列表，避免 IN 查询的参数过多"""
+    ids = list(ids)
+    return (ids[start:start + ID_CHUNK_SIZE] for start in range(0, len(ids), ID_CHUNK_SIZE))
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_topic_model() -> TopicModel:
+    """进程内共享的主题模型"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = TopicModel()
+    return _model
+
+
+def question_topics(scope):
+    """
+    班级报告时间段内首轮提问的高频主题
+
+    Args:
+        scope: build_class_scope 返回的查询集字典（使用 qa_sessions 与 old_qa_questions）
+    Returns:
+        [{'topic', 'keywords', 'question_count', 'share', 'subjects', 'examples'}]，按提问数降序；
+        未启用或没有提问时返回空列表
+    """
+    config = get_topic_settings()
+    if not config['ENABLED'] or QAMessage is None:
+        return []
+
+    # 时间段内的提问只取ID与科目，文本只在需要向量化或作为代表性提问时读取
+    window = []
+    if scope.get('qa_sessions') is not None:
+        window += [(key, subject, 'session') for key, subject in scope['qa_sessions'].values_list('id', 'subject')]
+    if scope.get('old_qa_questions') is not None and QAQuestion is not None:
+        window += [(key, subject, 'question') for key, subject in scope['old_qa_questions'].values_list('id', 'subject')]
+    if not window:
+        return []
+
+    model = get_topic_model()
+    keys = [key for key, _, _ in window]
+    with model._lock:
+        missing = [item for item in window if item[0] not in model.rows]
+        if missing and model.needs_refit(len(missing)):
+            corpus = _load_texts(limit=config['MAX_FIT_QUESTIONS'])
+            known = {key for key, _ in corpus}
+            corpus += _load_texts(
+                session_ids=[key for key, _, source in missing if source == 'session' and key not in known],
+                question_ids=[key for key, _, source in missing if source == 'question' and key not in known]
+            )
+            model.fit([key for key, _ in corpus], [text for _, text in corpus])
+        elif missing:
+            items = _load_texts(
+                session_ids=[key for key, _, source in missing if source == 'session'],
+                question_ids=[key for key, _, source in missing if source == 'question']
+            )
+            model.assign([key for key, _ in items], [text for _, text in items])
+        labels, similarities = model.lookup(keys)
+        keywords = list(model.keywords)
+
+    counts = np.bincount(labels[labels >= 0], minlength=len(keywords))
+    total = int(counts.sum())
+    topics = []
+    example_ids = {}
+    for topic in np.argsort(-counts, kind='stable')[:config['TOP_TOPICS']]:
+        if not counts[topic]:
+            break
+        members = np.flatnonzero(labels == topic)
+        representatives = members[np.argsort(-similarities[members], kind='stable')]
+        example_ids[int(topic)] = [window[index] for index in representatives[:config['EXAMPLES'] * 3]]
+        subjects = Counter(window[index][1] for index in members)
+        topics.append({
+            'topic': '、'.join(keywords[topic][:3]) or f'主题{int(topic) + 1}',
+            'keywords': keywords[topic],
+            'question_count': int(counts[topic]),
+            'share': round(float(counts[topic]) * 100 / total, 2),
+            'subjects': [subject for subject, _ in subjects.most_common(2)],
+            '_topic': int(topic),
+        })
+
+    # 代表性提问：与主题中心最相似的几条，相同文本只保留一条
+    candidates = [item for items in example_ids.values() for item in items]
+    texts = dict(_load_texts(
+        session_ids=[key for key, _, source in candidates if source == 'session'],
+        question_ids=[key for key, _, source in candidates if source == 'question']
+    ))
+    for topic in topics:
+        examples = []
+        for key, _, _ in example_ids[topic.pop('_topic')]:
+            text = ' '.join(texts.get(key, '').split())[:EXAMPLE_LENGTH]
+            if text and text not in examples:
+                examples.append(text)
+            if len(examples) == config['EXAMPLES']:
+                break
+        topic['examples'] = examples
+    return topics
@@ -0,0 +1,198 @@
+"""
+学习趋势模块 - 按天/周/月分桶统计得分率与问答活跃度，用于绘制趋势图
+
+分桶在数据库中完成（TruncDay / TruncWeek / TruncMonth + 分组聚合），每个序列一条查询：
+- 提交：按提交时间分桶，统计提交数、已批改数与平均得分率（未批改的提交不计入得分率）
+- 问答：新版会话中学生发送的消息按发送时间分桶，旧版提问按提问时间分桶，合并为提问数
+
+结果按查询参数与数据版本缓存。数据版本由最后批改时间、最后提交时间、最后提问时间及对应记录数组成，
+有新的批改、提交或提问时版本变化，旧缓存自然失效。
+
+通过 settings.REPORT_TRENDS 配置：
+- CACHE_TIMEOUT: 缓存秒数（0表示不缓存）
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, F, Avg, Count, Max, FloatField, Value
+from django.db.models.functions import Cast, TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    from assignments.models import Submission
+except ImportError:
+    Submission = None
+
+try:
+    from qa.models import QAMessage, QAQuestion
+except ImportError:
+    QAMessage = None
+    QAQuestion = None
+
+
+GRANULARITY_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+CACHE_KEY_PREFIX = 'report_trends'
+
+
+def get_trend_settings():
+    config = getattr(settings, 'REPORT_TRENDS', {})
+    return {
+        'CACHE_TIMEOUT': config.get('CACHE_TIMEOUT', 600),
+    }
+
+
+def _student_filter(student, students, prefix='student'):
+    """按学生、学生名单或全体学生过滤的条件"""
+    if student is not None:
+        return Q(**{prefix: student})
+    if students is not None:
+        return Q(**{f'{prefix}_id__in': students.values('id')})
+    return Q(**{f'{prefix}__role': 'student'})
+
+
+def build_trend_scope(start_time, end_time, subjects, student=None, students=None):
+    """
+    构建趋势统计的查询集（惰性）
+
+    Args:
+        student: 学生，为空时统计班级趋势
+        students: 班级趋势的学生名单查询集（教师课程的学生），为空时为全体学生
+    Returns:
+        包含 submissions、qa_messages、qa_questions 查询集的字典，对应应用不可用时为None
+    """
+    scope = {'submissions': None, 'qa_messages': None, 'qa_questions': None}
+
+    if Submission is not None:
+        submissions = Submission.objects.filter(
+            _student_filter(student, students), submitted_at__gte=start_time, submitted_at__lte=end_time
+        )
+        if subjects:
+            submissions = submissions.filter(assignment__subject__in=subjects)
+        scope['submissions'] = submissions
+
+    if QAMessage is not None:
+        messages = QAMessage.objects.filter(
+            _student_filter(student, students, prefix='session__student'),
+            role='user', created_at__gte=start_time, created_at__lte=end_time
+        )
+        if subjects:
+            messages = messages.filter(session__subject__in=subjects)
+        scope['qa_messages'] = messages
+
+    if QAQuestion is not None:
+        questions = QAQuestion.objects.filter(
+            _student_filter(student, students), created_at__gte=start_time, created_at__lte=end_time
+        )
+        if subjects:
+            questions = questions.filter(subject__in=subjects)
+        scope['qa_questions'] = questions
+
+    return scope
+
+
+def trend_data_version(scope):
+    """数据版本：各序列的最后变化时间与记录数"""
+    version = {}
+    if scope['submissions'] is not None:
+        version['submissions'] = scope['submissions'].aggregate(
+            graded=Max('graded_at'), submitted=Max('submitted_at'), count=Count('id')
+        )
+    for key in ('qa_messages', 'qa_questions'):
+        if scope[key] is not None:
+            version[key] = scope[key].aggregate(created=Max('created_at'), count=Count('id'))
+    return version
+
+
+def _bucketed(queryset, field, granularity, **aggregates):
+    """按时间字段分桶聚合，返回 {桶起始日期: 聚合结果}"""
+    trunc = GRANULARITY_FUNCTIONS[granularity](field, tzinfo=timezone.get_current_timezone())
+    rows = queryset.order_by().annotate(bucket=trunc).values('bucket').annotate(**aggregates)
+    return {timezone.localtime(row.pop('bucket')).date(): row for row in rows}
+
+
+def _next_bucket(day, granularity):
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def compute_trend_series(scope, granularity):
+    """
+    计算趋势序列，首尾之间没有数据的桶补零，保证横轴连续
+
+    Returns:
+        [{'bucket', 'submission_count', 'graded_count', 'average_score', 'qa_count'}]，按时间升序
+    """
+    submissions = {}
+    if scope['submissions'] is not None:
+        graded = Q(graded_at__isnull=False, assignment__total_score__gt=0)
+        percentage = Cast('obtained_score', FloatField()) / F('assignment__total_score') * Value(100.0)
+        submissions = _bucketed(
+            scope['submissions'], 'submitted_at', granularity,
+            submission_count=Count('id'),
+            graded_count=Count('id', filter=Q(graded_at__isnull=False)),
+            average_score=Avg(percentage, filter=graded),
+        )
+
+    qa_counts = {}
+    for key in ('qa_messages', 'qa_questions'):
+        if scope[key] is None:
+            continue
+        for day, row in _bucketed(scope[key], 'created_at', granularity, count=Count('id')).items():
+            qa_counts[day] = qa_counts.get(day, 0) + row['count']
+
+    days = set(submissions) | set(qa_counts)
+    if not days:
+        return []
+
+    series = []
+    day, last = min(days), max(days)
+    while day <= last:
+        row = submissions.get(day, {})
+        average = row.get('average_score')
+        series.append({
+            'bucket': day,
+            'submission_count': row.get('submission_count', 0),
+            'graded_count': row.get('graded_count', 0),
+            'average_score': round(average, 2) if average is not None else None,
+            'qa_count': qa_counts.get(day, 0),
+        })
+        day = _next_bucket(day, granularity)
+    return series
+
+
+def get_trend_series(start_time, end_time, granularity, period, subjects, student=None, students=None):
+    """获取趋势序列（数据未变化时直接返回缓存结果）"""
+    scope = build_trend_scope(start_time, end_time, subjects, student=student, students=students)
+    timeout = get_trend_settings()['CACHE_TIMEOUT']
+    if not timeout:
+        return compute_trend_series(scope, granularity)
+
+    parts = {
+        'granularity': granularity,
+        'period': period,
+        'subjects': subjects,
+        'student': student.id if student is not None else None,
+        'roster': sorted(str(pk) for pk in students.values_list('id', flat=True)) if students is not None else None,
+        'version': trend_data_version(scope),
+    }
+    payload = json.dumps(parts, cls=JSONEncoder, sort_keys=True, ensure_ascii=False)
+    key = f"{CACHE_KEY_PREFIX}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    series = cache.get(key)
+    if series is None:
+        series = compute_trend_series(scope, granularity)
+        cache.set(key, series, timeout=timeout)
+    return series
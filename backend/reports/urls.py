@@ -6,10 +6,28 @@ app_name = 'reports'
 urlpatterns = [
     # 学习报告
     path('generate/', views.generate_report, name='generate_report'),
+    path('generate/async/', views.generate_report_async, name='generate_report_async'),
+    path('generate/stream/', views.generate_report_stream, name='generate_report_stream'),
     path('list/', views.list_reports, name='list_reports'),
     path('<uuid:report_id>/', views.get_report_detail, name='report_detail'),
+
+    # 学习趋势
+    path('trends/', views.get_learning_trends, name='learning_trends'),
+
+    # 知识点掌握度
+    path('mastery/', views.get_knowledge_mastery, name='knowledge_mastery'),
     
     # 班级报告 - 确保这个路由存在且正确
     path('class/generate/', views.generate_class_report, name='generate_class_report'),
+    path('class/generate/async/', views.generate_class_report_async, name='generate_class_report_async'),
+    path('class/generate/stream/', views.generate_class_report_stream, name='generate_class_report_stream'),
+    path('class/list/', views.list_class_reports, name='list_class_reports'),
+    path('class/<uuid:report_id>/', views.get_class_report_detail, name='class_report_detail'),
+    path('class/analytics/', views.get_class_analytics, name='class_analytics'),
+
+    # 批量学习报告
+    path('batch/generate/', views.generate_report_batch, name='generate_report_batch'),
+    path('batch/<uuid:batch_id>/', views.get_report_batch_detail, name='report_batch_detail'),
+    path('batch/<uuid:batch_id>/retry/', views.retry_report_batch, name='retry_report_batch'),
 ]
 
@@ -1,8 +1,11 @@
 from rest_framework import status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Avg, Count
+from django.db.models import Q
+from django.db import transaction
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, timedelta
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
@@ -10,12 +13,51 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from .models import LearningReport
+from .models import LearningReport, ClassReport, ReportBatch
+from .statistics import (
+    build_class_scope,
+    compute_class_statistics,
+    compute_class_statistics_from_rollup,
+    qa_subject_counts,
+    rollup_qa_subject_counts,
+)
+from .rollups import student_statistics_from_rollup
+from .prompting import (
+    CLASS_REPORT_OUTLINE,
+    LEARNING_REPORT_OUTLINE,
+    build_learning_report_context,
+    build_learning_report_prompt,
+    build_delta_report_prompt,
+    outline_instructions,
+    with_bounded_messages,
+)
+from .sections import generate_sections, generate_sections_async, sectioned_generation_enabled
+from .fingerprints import data_fingerprint, student_fingerprints, normalize_subjects
+from .tasks import enqueue_report, expire_stale_report, publish_progress
+from .streaming import stream_report, stream_existing_report, event_stream_response
+from .trends import get_trend_series
+from .mastery import get_mastery_settings, student_mastery, class_mastery, student_mastery_summary
+try:
+    from .analytics import get_score_snapshot
+except ImportError:  # 未安装numpy
+    get_score_snapshot = None
+try:
+    from .topics import question_topics
+except ImportError:  # 未安装numpy时班级报告按科目统计高频问题
+    question_topics = None
+from .batch import enqueue_batch, expire_stale_batch
 from .serializers import (
     LearningReportCreateSerializer,
     LearningReportListSerializer,
     LearningReportDetailSerializer,
-    ClassReportCreateSerializer
+    ClassReportCreateSerializer,
+    ClassReportListSerializer,
+    ClassReportDetailSerializer,
+    ReportBatchCreateSerializer,
+    ReportBatchSerializer,
+    LearningTrendQuerySerializer,
+    ClassAnalyticsQuerySerializer,
+    KnowledgeMasteryQuerySerializer
 )
 try:
     from accounts.models import User
@@ -23,6 +65,21 @@ except ImportError:
     from django.contrib.auth import get_user_model
     User = get_user_model()
 
+try:
+    from courses.scoping import roster_students, roster_assignments, visible_students, visible_assignments
+except ImportError:
+    def roster_students(teacher):
+        return None
+
+    def roster_assignments(teacher, queryset):
+        return None
+
+    def visible_students(teacher):
+        return User.objects.filter(role='student')
+
+    def visible_assignments(user, queryset):
+        return queryset.filter(created_by=user) if user.role == 'teacher' else queryset.filter(course__isnull=True)
+
 try:
     from assignments.models import Assignment, Submission, Answer
 except ImportError as e:
@@ -38,10 +95,16 @@ except ImportError as e:
     QAQuestion = None
 
 try:
-    from ai_services import ask_gemini
+    from ai_services import ask_gemini, ask_gemini_async
 except ImportError:
     def ask_gemini(prompt, temperature=0.7):
         return "AI服务暂时不可用，这是一个模拟的学习报告内容。"
+
+    async def ask_gemini_async(prompt, temperature=0.7):
+        return ask_gemini(prompt, temperature=temperature)
+from asgiref.sync import sync_to_async
+from async_api import async_api_view, json_response
+from realtime import EventStreamRenderer
 import json
 
 
@@ -57,20 +120,29 @@ class IsTeacher(permissions.BasePermission):
         return request.user.is_authenticated and request.user.role == 'teacher'
 
 
-def get_time_range(period):
-    """根据时间段获取时间范围"""
+def get_time_range(period, day=None):
+    """
+    根据时间段获取时间范围
+
+    起点按本地日期对齐到零点（如 week 为7天前的零点），同一天内的请求起点相同，
+    数据未变化时数据指纹一致，可以复用同一天闲时预生成的报告。
+
+    Args:
+        day: 计算起点所用的本地日期，默认为今天（预生成时为报告的使用日）
+    """
     now = timezone.now()
+    day = day or timezone.localdate(now)
 
     if period == 'week':
-        start_time = now - timedelta(days=7)
+        start_day = day - timedelta(days=7)
     elif period == 'month':
-        start_time = now - timedelta(days=30)
+        start_day = day - timedelta(days=30)
     elif period == 'semester':
-        start_time = now - timedelta(days=120)  # 约4个月
+        start_day = day - timedelta(days=120)  # 约4个月
     else:  # 'all'
-        start_time = datetime(2020, 1, 1, tzinfo=timezone.get_current_timezone())
+        return datetime(2020, 1, 1, tzinfo=timezone.get_current_timezone()), now
 
-    return start_time, now
+    return timezone.make_aware(datetime.combine(start_day, datetime.min.time())), now
 
 
 def collect_student_data(student, period, subjects):
@@ -90,7 +162,8 @@ def collect_student_data(student, period, subjects):
     submissions = []
     if Assignment is not None and Submission is not None:
         try:
-            assignments = Assignment.objects.filter(assignment_filter)
+            # 只统计学生可见的作业（未指定课程的与所在课程的）
+            assignments = visible_assignments(student, Assignment.objects.filter(assignment_filter))
             submissions = Submission.objects.filter(
                 student=student,
                 assignment__in=assignments
@@ -102,11 +175,11 @@ def collect_student_data(student, period, subjects):
     qa_sessions = []
     if QASession is not None:
         try:
-            qa_sessions = QASession.objects.filter(
+            qa_sessions = with_bounded_messages(QASession.objects.filter(
                 student=student,
                 updated_at__gte=start_time,
                 updated_at__lte=end_time
-            ).prefetch_related('messages')
+            ))
             if subjects:
                 qa_sessions = qa_sessions.filter(subject__in=subjects)
         except Exception as e:
@@ -131,10 +204,56 @@ def collect_student_data(student, period, subjects):
         'submissions': submissions,
         'qa_sessions': qa_sessions,
         'old_qa_questions': old_qa_questions,
+        # 知识点掌握度为累计值（近期得分率已按作答时间衰减），不受时间段限制
+        'knowledge_mastery': student_mastery_summary(student, subjects),
         'time_range': (start_time, end_time)
     }
 
 
+def collect_student_activity_since(student, period, subjects, since):
+    """收集某时间点之后新增的学习数据（增量报告用），返回结构与 collect_student_data 一致"""
+    start_time, end_time = get_time_range(period)
+
+    assignments = []
+    submissions = []
+    if Assignment is not None and Submission is not None:
+        window_assignments = Assignment.objects.filter(created_at__gte=start_time, created_at__lte=end_time)
+        if subjects:
+            window_assignments = window_assignments.filter(subject__in=subjects)
+        window_assignments = visible_assignments(student, window_assignments)
+        assignments = window_assignments.filter(created_at__gte=since)
+        submissions = Submission.objects.filter(
+            Q(submitted_at__gt=since) | Q(graded_at__gt=since),
+            student=student,
+            assignment__in=window_assignments
+        ).select_related('assignment').prefetch_related('answers__question')
+
+    qa_sessions = []
+    if QASession is not None:
+        qa_sessions = QASession.objects.filter(student=student, updated_at__gt=since, updated_at__lte=end_time)
+        if subjects:
+            qa_sessions = qa_sessions.filter(subject__in=subjects)
+        qa_sessions = with_bounded_messages(qa_sessions)
+
+    old_qa_questions = []
+    if QAQuestion is not None:
+        old_qa_questions = QAQuestion.objects.filter(
+            student=student,
+            created_at__gt=since,
+            created_at__lte=end_time
+        ).select_related('answer')
+        if subjects:
+            old_qa_questions = old_qa_questions.filter(subject__in=subjects)
+
+    return {
+        'assignments': assignments,
+        'submissions': submissions,
+        'qa_sessions': qa_sessions,
+        'old_qa_questions': old_qa_questions,
+        'time_range': (since, end_time)
+    }
+
+
 def calculate_statistics(data):
     """计算统计数据"""
     assignments = data['assignments']
@@ -174,160 +293,89 @@ def calculate_statistics(data):
     }
 
 
-def generate_report_content(student, data, statistics, period, subjects):
-    """使用AI生成报告内容"""
-    start_time, end_time = data['time_range']
+def build_report_prompt(student, data, statistics, period, subjects):
+    """构建学习报告的AI提示词（按令牌预算挑选内容，见 reports/prompting.py）"""
+    return build_learning_report_prompt(student, data, statistics, period, subjects)
 
-    # 构建详细的数据上下文
-    context_data = {
-        'student_info': {
-            'name': student.real_name,
-            'student_id': student.student_id,
-            'username': student.username
-        },
-        'time_period': {
-            'period': period,
-            'start_date': start_time.strftime('%Y-%m-%d'),
-            'end_date': end_time.strftime('%Y-%m-%d')
-        },
-        'subjects': subjects if subjects else ['所有科目'],
-        'statistics': statistics,
-        'assignments_detail': [],
-        'qa_detail': []
-    }
 
-    # 收集作业详情
-    if data['submissions']:
-        try:
-            for submission in data['submissions']:
-                if hasattr(submission, 'assignment') and hasattr(submission, 'obtained_score'):
-                    assignment_detail = {
-                        'title': getattr(submission.assignment, 'title', '未知作业'),
-                        'subject': getattr(submission.assignment, 'subject', '未知科目'),
-                        'score': submission.obtained_score or 0,
-                        'max_score': getattr(submission.assignment, 'total_score', 0),
-                        'score_percentage': round((submission.obtained_score / submission.assignment.total_score * 100), 2) if getattr(submission.assignment, 'total_score', 0) > 0 else 0,
-                        'submitted_at': submission.submitted_at.strftime('%Y-%m-%d %H:%M') if hasattr(submission, 'submitted_at') else '未知时间',
-                        'questions_performance': []
-                    }
-
-                    # 收集每道题的表现
-                    try:
-                        if hasattr(submission, 'answers'):
-                            for answer in submission.answers.all():
-                                question_perf = {
-                                    'question': getattr(answer.question, 'question_text', '未知问题')[:100] + ('...' if len(getattr(answer.question, 'question_text', '')) > 100 else ''),
-                                    'student_answer': getattr(answer, 'answer_text', '无答案')[:200] + ('...' if len(getattr(answer, 'answer_text', '')) > 200 else ''),
-                                    'score': getattr(answer, 'obtained_score', 0),
-                                    'max_score': getattr(answer.question, 'score', 0),
-                                    'feedback': getattr(answer, 'ai_feedback', '无反馈')[:200] + ('...' if len(getattr(answer, 'ai_feedback', '')) > 200 else '')
-                                }
-                                assignment_detail['questions_performance'].append(question_perf)
-                    except Exception as e:
-                        pass
-
-                    context_data['assignments_detail'].append(assignment_detail)
-        except Exception as e:
-            pass
+def generate_report_content(student, data, statistics, period, subjects):
+    """使用AI生成报告内容（失败时抛出异常，由调用方保留本地统计报告）"""
+    if sectioned_generation_enabled():
+        context = build_learning_report_context(student, data, statistics, period, subjects)
+        return generate_sections(
+            context, LEARNING_REPORT_OUTLINE, lambda prompt: ask_gemini(prompt, temperature=0.7)
+        )
 
-    # 收集问答详情
-    if data['qa_sessions']:
-        try:
-            for session in data['qa_sessions']:
-                if hasattr(session, 'messages'):
-                    try:
-                        messages = session.messages.all()
-                        if messages:
-                            qa_detail = {
-                                'subject': getattr(session, 'subject', '未知科目'),
-                                'created_at': session.created_at.strftime('%Y-%m-%d %H:%M') if hasattr(session, 'created_at') else '未知时间',
-                                'message_count': len(messages),
-                                'conversation_summary': []
-                            }
-
-                            for message in messages[:10]:  # 只取前10条消息
-                                qa_detail['conversation_summary'].append({
-                                    'role': getattr(message, 'role', 'unknown'),
-                                    'content': getattr(message, 'content', '无内容')[:150] + ('...' if len(getattr(message, 'content', '')) > 150 else '')
-                                })
-
-                            context_data['qa_detail'].append(qa_detail)
-                    except Exception as e:
-                        pass
-        except Exception as e:
-            pass
+    prompt = build_report_prompt(student, data, statistics, period, subjects)
+    return ask_gemini(prompt, temperature=0.7)
 
-    # 收集旧问答数据
-    if data['old_qa_questions']:
-        try:
-            for question in data['old_qa_questions']:
-                if hasattr(question, 'answer') and question.answer:
-                    qa_detail = {
-                        'subject': getattr(question, 'subject', '未知科目'),
-                        'created_at': question.created_at.strftime('%Y-%m-%d %H:%M') if hasattr(question, 'created_at') else '未知时间',
-                        'question': getattr(question, 'question_text', '无问题')[:200] + ('...' if len(getattr(question, 'question_text', '')) > 200 else ''),
-                        'ai_answer': getattr(question.answer, 'ai_answer', '无回答')[:200] + ('...' if len(getattr(question.answer, 'ai_answer', '')) > 200 else '')
-                    }
-                    context_data['qa_detail'].append(qa_detail)
-        except Exception as e:
-            pass
 
-    # 构建AI提示词
-    prompt = f"""
-你是一位专业的教育分析师，请根据以下学生的学习数据生成一份详细的学习报告。
+async def generate_report_content_async(student, data, statistics, period, subjects):
+    """使用AI生成报告内容（异步，失败时抛出异常）"""
+    # 构建提示词需要遍历查询集，放到同步线程中执行
+    if sectioned_generation_enabled():
+        context = await sync_to_async(build_learning_report_context)(student, data, statistics, period, subjects)
+        return await generate_sections_async(
+            context, LEARNING_REPORT_OUTLINE, lambda prompt: ask_gemini_async(prompt, temperature=0.7)
+        )
 
-学生信息：
-- 姓名：{context_data['student_info']['name']}
-- 学号：{context_data['student_info']['student_id']}
-- 分析时间段：{context_data['time_period']['start_date']} 至 {context_data['time_period']['end_date']} ({period})
-- 涉及科目：{', '.join(context_data['subjects'])}
+    prompt = await sync_to_async(build_report_prompt)(student, data, statistics, period, subjects)
+    return await ask_gemini_async(prompt, temperature=0.7)
 
-学习统计：
-- 总作业数：{statistics['total_assignments']}
-- 已完成作业数：{statistics['completed_assignments']}
-- 平均得分：{statistics['average_score']}%
-- 提问次数：{statistics['total_questions']}
 
-作业详情：
-{json.dumps(context_data['assignments_detail'], ensure_ascii=False, indent=2)}
+def get_delta_settings():
+    config = getattr(settings, 'REPORT_DELTA', {})
+    return {
+        'MAX_AGE': config.get('MAX_AGE', 14 * 24 * 3600),
+        'MAX_CHAIN': config.get('MAX_CHAIN', 3),
+    }
 
-问答记录：
-{json.dumps(context_data['qa_detail'], ensure_ascii=False, indent=2)}
 
-请生成一份结构化的学习报告，包含以下部分：
+def find_delta_base(student, period, subjects):
+    """
+    增量报告的基准：同一学生、时间段和科目最近一份已完成的报告
 
-1. **学习概况总结**
-   - 整体学习表现评价
-   - 主要学习成果
+    基准报告过旧，或连续增量次数超过上限（误差会逐次累积）时返回None，改为完整生成。
+    """
+    config = get_delta_settings()
+    base = LearningReport.objects.filter(
+        student=student,
+        period=period,
+        subjects=subjects,
+        status='completed',
+        content_phase='ai'
+    ).exclude(report_content='').exclude(report_content__startswith='报告生成失败').order_by('-created_at').first()
+    if base is None:
+        return None
+    if config['MAX_AGE'] and (timezone.now() - base.created_at).total_seconds() > config['MAX_AGE']:
+        return None
 
-2. **作业完成情况分析**
-   - 作业完成率分析
-   - 得分情况分析
-   - 各科目表现对比
+    depth = 1
+    current = base
+    while current.base_report_id is not None:
+        depth += 1
+        if depth > config['MAX_CHAIN']:
+            return None
+        current = LearningReport.objects.only('id', 'base_report_id').get(id=current.base_report_id)
+    return base
 
-3. **知识掌握情况**
-   - 强项知识点
-   - 薄弱环节识别
-   - 具体问题分析
 
-4. **学习行为分析**
-   - 提问频率和质量
-   - 学习主动性评价
-   - 问题解决能力
+def build_delta_prompt(student, base_report, statistics, period, subjects):
+    """收集基准报告之后新增的数据并构建增量提示词"""
+    data = collect_student_activity_since(student, period, subjects, base_report.created_at)
+    return build_delta_report_prompt(student, base_report, data, statistics, period, subjects)
 
-5. **改进建议**
-   - 针对性学习建议
-   - 具体改进措施
-   - 推荐学习资源
 
-请用专业、客观、建设性的语言撰写报告，字数控制在1000-1500字。
-"""
+def generate_delta_report_content(student, base_report, statistics, period, subjects):
+    """在基准报告的基础上生成增量报告（失败时抛出异常，由调用方改为完整生成）"""
+    prompt = build_delta_prompt(student, base_report, statistics, period, subjects)
+    return ask_gemini(prompt, temperature=0.7)
 
-    try:
-        ai_response = ask_gemini(prompt, temperature=0.7)
-        return ai_response
-    except Exception as e:
-        return f"报告生成失败，错误信息：{str(e)}"
+
+async def generate_delta_report_content_async(student, base_report, statistics, period, subjects):
+    """在基准报告的基础上生成增量报告（异步）"""
+    prompt = await sync_to_async(build_delta_prompt)(student, base_report, statistics, period, subjects)
+    return await ask_gemini_async(prompt, temperature=0.7)
 
 
 def generate_simple_report(student, period, subjects, statistics, data=None):
@@ -512,14 +560,161 @@ def generate_simple_report(student, period, subjects, statistics, data=None):
     return basic_info + assignment_analysis + behavior_analysis + suggestions + footer
 
 
+def prepare_report_context(student, period, subjects):
+    """收集学生学习数据并计算统计数据，失败时返回空数据"""
+    try:
+        data = collect_student_data(student, period, subjects)
+    except Exception as e:
+        data = {
+            'assignments': [],
+            'submissions': [],
+            'qa_sessions': [],
+            'old_qa_questions': [],
+            'time_range': (None, None)
+        }
+
+    try:
+        if getattr(settings, 'REPORT_DAILY_ROLLUP', False):
+            start_time, end_time = get_time_range(period)
+            statistics = student_statistics_from_rollup(student, start_time, end_time, subjects)
+        else:
+            statistics = calculate_statistics(data)
+    except Exception as e:
+        statistics = {
+            'total_assignments': 0,
+            'completed_assignments': 0,
+            'average_score': 0.0,
+            'total_questions': 0
+        }
+
+    return data, statistics
+
+
+def reusable_reports():
+    """可复用的近期报告（已完成或正在生成；AI分析失败、只有本地统计内容的报告不复用）"""
+    reports = LearningReport.objects.filter(status__in=['generating', 'completed']).exclude(
+        status='completed', content_phase='local'
+    )
+    max_age = getattr(settings, 'REPORT_REUSE_MAX_AGE', None)
+    if max_age:
+        reports = reports.filter(created_at__gte=timezone.now() - timedelta(seconds=max_age))
+    return reports
+
+
+def find_reusable_report(student, fingerprint):
+    """查找数据指纹相同的近期报告，没有时返回None"""
+    report = reusable_reports().filter(
+        student=student,
+        data_fingerprint=fingerprint
+    ).order_by('-created_at').first()
+    if report is not None and expire_stale_report(report):
+        return None
+    return report
+
+
+def reused_report_response_data(report):
+    return {
+        'report_id': str(report.id),
+        'status': report.status,
+        'created_at': report.created_at,
+        'reused': True
+    }
+
+
+def new_report_response_data(report, include_content=False):
+    """新建报告的响应数据，include_content为True时同时返回统计数据与当前阶段的报告内容"""
+    data = {
+        'report_id': str(report.id),
+        'status': report.status,
+        'created_at': report.created_at,
+        'reused': False,
+        'mode': 'delta' if report.base_report_id else 'full',
+        'base_report_id': str(report.base_report_id) if report.base_report_id else None,
+        'content_phase': report.content_phase
+    }
+    if include_content:
+        data['statistics'] = {
+            'total_assignments': report.total_assignments,
+            'completed_assignments': report.completed_assignments,
+            'average_score': report.average_score,
+            'total_questions': report.total_questions
+        }
+        data['report_content'] = report.report_content
+    return data
+
+
+def apply_report_statistics(report, statistics):
+    """将统计数据写入报告记录"""
+    report.total_assignments = statistics['total_assignments']
+    report.completed_assignments = statistics['completed_assignments']
+    report.average_score = statistics['average_score']
+    report.total_questions = statistics['total_questions']
+
+
+def resolve_report_student(request, validated_data):
+    """
+    确定报告的目标学生：教师为指定学生生成，学生只能为自己生成
+
+    Returns:
+        (学生, None)，参数错误或学生不存在时返回 (None, 错误响应)
+    """
+    if request.user.role != 'teacher':
+        return request.user, None
+
+    student_id = validated_data.get('student_id')
+    if not student_id:
+        return None, Response({
+            'code': 400,
+            'message': '教师生成报告时必须指定学生ID'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return visible_students(request.user).get(id=student_id), None
+    except User.DoesNotExist:
+        return None, Response({
+            'code': 404,
+            'message': '指定的学生不存在'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+
+def visible_learning_reports(user):
+    """
+    用户可见的学习报告
+
+    - 学生：自己的报告
+    - 教师：所教课程学生的报告与自己生成的报告，没有课程时为全部报告
+    """
+    if user.role == 'student':
+        return LearningReport.objects.filter(student=user)
+    roster = roster_students(user)
+    if roster is None:
+        return LearningReport.objects.all()
+    return LearningReport.objects.filter(Q(student_id__in=roster.values('id')) | Q(generated_by=user))
+
+
+def visible_class_reports(teacher):
+    """教师可见的班级报告：加入课程的教师只看自己生成的报告，没有课程时为全部报告"""
+    if roster_students(teacher) is None:
+        return ClassReport.objects.all()
+    return ClassReport.objects.filter(generated_by=teacher)
+
+
+def visible_report_batches(teacher):
+    """教师可见的批量任务：加入课程的教师只看自己创建的任务，没有课程时为全部任务"""
+    if roster_students(teacher) is None:
+        return ReportBatch.objects.all()
+    return ReportBatch.objects.filter(created_by=teacher)
+
+
 @extend_schema(
     request=LearningReportCreateSerializer,
     responses={
-        201: OpenApiResponse(description="报告生成成功"),
+        202: OpenApiResponse(description="已生成统计报告，AI分析正在后台生成"),
         400: OpenApiResponse(description="请求参数错误"),
         403: OpenApiResponse(description="权限不足"),
     },
-    description="生成学习报告"
+    description="生成学习报告：立即返回本地统计报告（content_phase=local），AI分析在后台生成，"
+                "完成后替换报告内容（content_phase=ai），通过报告详情接口轮询或订阅 report_progress 事件获取结果"
 )
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -538,107 +733,285 @@ def generate_report(request):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        student, error_response = resolve_report_student(request, serializer.validated_data)
+        if error_response is not None:
+            return error_response
+
+        period = serializer.validated_data['period']
+        subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+
+        # 数据自上次生成后没有变化时直接返回已有报告
+        start_time, end_time = get_time_range(period)
+        fingerprint = data_fingerprint(
+            start_time, end_time, period, subjects, student=student, mode=serializer.validated_data['mode']
+        )
+        if not serializer.validated_data['force']:
+            existing = find_reusable_report(student, fingerprint)
+            if existing is not None:
+                return Response({
+                    'code': 200,
+                    'message': '学习数据未变化，返回已有报告',
+                    'data': reused_report_response_data(existing)
+                }, status=status.HTTP_200_OK)
+
+        # 增量模式：有可用的基准报告时只结合之后新增的数据更新
+        base_report = None
+        if serializer.validated_data['mode'] == 'delta':
+            base_report = find_delta_base(student, period, subjects)
+
+        # 第一阶段：在请求内计算统计数据并生成本地统计报告，立即返回给客户端
+        data, statistics = prepare_report_context(student, period, subjects)
+        report = LearningReport(
+            student=student,
+            generated_by=request.user,
+            period=period,
+            subjects=subjects,
+            status='generating',
+            content_phase='local',
+            report_content=generate_simple_report(student, period, subjects, statistics, data),
+            data_fingerprint=fingerprint,
+            base_report=base_report
+        )
+        apply_report_statistics(report, statistics)
+        report.save()
+
+        # 第二阶段：AI分析交由后台工作线程生成，完成后替换报告内容
+        enqueue_report(report.id)
+
+        return Response({
+            'code': 202,
+            'message': '已生成统计报告，AI分析正在后台生成',
+            'data': new_report_response_data(report, include_content=True)
+        }, status=status.HTTP_202_ACCEPTED)
+
+    except User.DoesNotExist:
+        return Response({
+            'code': 404,
+            'message': '指定的学生不存在'
+        }, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        # 如果报告已创建，更新状态为失败
+        if 'report' in locals():
+            report.status = 'failed'
+            report.report_content = f'生成失败：{str(e)}'
+            report.save()
+
+        return Response({
+            'code': 500,
+            'message': f'报告生成失败：{str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['POST'], permission_classes=[permissions.IsAuthenticated])
+async def generate_report_async(request):
+    """生成学习报告（异步版本，等待AI生成期间不占用工作线程）"""
+    serializer = LearningReportCreateSerializer(
+        data=request.data,
+        context={'request': request}
+    )
+
+    if not serializer.is_valid():
+        return json_response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status.HTTP_400_BAD_REQUEST)
+
     try:
         # 确定目标学生
         if request.user.role == 'teacher':
             student_id = serializer.validated_data.get('student_id')
-            
-            if not student_id:
-                return Response({
-                    'code': 400,
-                    'message': '教师生成报告时必须指定学生ID'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
             try:
-                student = User.objects.get(id=student_id, role='student')
+                # 课程范围查询是同步的，放到同步线程中解析学生名单
+                roster = await sync_to_async(visible_students)(request.user)
+                student = await roster.aget(id=student_id)
             except User.DoesNotExist:
-                return Response({
+                return json_response({
                     'code': 404,
                     'message': '指定的学生不存在'
-                }, status=status.HTTP_404_NOT_FOUND)
+                }, status.HTTP_404_NOT_FOUND)
         else:
-            # 学生只能为自己生成报告
             student = request.user
 
         period = serializer.validated_data['period']
-        subjects = serializer.validated_data.get('subjects', [])
-        
-        
-        # 创建报告记录
-        report = LearningReport.objects.create(
+        subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+
+        start_time, end_time = get_time_range(period)
+        fingerprint = await sync_to_async(data_fingerprint)(
+            start_time, end_time, period, subjects, student=student, mode=serializer.validated_data['mode']
+        )
+        if not serializer.validated_data['force']:
+            existing = await sync_to_async(find_reusable_report)(student, fingerprint)
+            if existing is not None:
+                return json_response({
+                    'code': 200,
+                    'message': '学习数据未变化，返回已有报告',
+                    'data': reused_report_response_data(existing)
+                })
+
+        base_report = None
+        if serializer.validated_data['mode'] == 'delta':
+            base_report = await sync_to_async(find_delta_base)(student, period, subjects)
+
+        report = await LearningReport.objects.acreate(
             student=student,
             generated_by=request.user,
             period=period,
             subjects=subjects,
-            status='generating'
+            status='generating',
+            data_fingerprint=fingerprint,
+            base_report=base_report
         )
 
-        # 收集学习数据
-        try:
-            data = collect_student_data(student, period, subjects)
-        except Exception as e:
-            data = {
-                'assignments': [],
-                'submissions': [],
-                'qa_sessions': [],
-                'old_qa_questions': [],
-                'time_range': (None, None)
-            }
-
-        # 计算统计数据
-        try:
-            statistics = calculate_statistics(data)
-        except Exception as e:
-            statistics = {
-                'total_assignments': 0,
-                'completed_assignments': 0,
-                'average_score': 0.0,
-                'total_questions': 0
-            }
+        data, statistics = await sync_to_async(prepare_report_context)(student, period, subjects)
+        apply_report_statistics(report, statistics)
 
-        # 更新统计信息
-        report.total_assignments = statistics['total_assignments']
-        report.completed_assignments = statistics['completed_assignments']
-        report.average_score = statistics['average_score']
-        report.total_questions = statistics['total_questions']
+        report_content = None
+        if base_report is not None:
+            try:
+                report_content = await generate_delta_report_content_async(
+                    student, base_report, statistics, period, subjects
+                )
+            except Exception as e:
+                logger.warning(f"增量报告生成失败，改为完整生成: {e}")
+                report.base_report = None
 
-        # 生成报告内容
-        try:
-            report_content = generate_report_content(student, data, statistics, period, subjects)
-        except Exception as e:
-            report_content = generate_simple_report(student, period, subjects, statistics, data)  # 传入data参数
+        if report_content is None:
+            try:
+                report_content = await generate_report_content_async(student, data, statistics, period, subjects)
+            except Exception as e:
+                logger.warning(f"AI报告生成失败，使用本地统计报告: {e}")
+                report_content = await sync_to_async(generate_simple_report)(student, period, subjects, statistics, data)
+                report.content_phase = 'local'
 
-        # 更新报告
         report.report_content = report_content
         report.status = 'completed'
-        report.save()
+        await report.asave()
 
-        return Response({
+        return json_response({
             'code': 201,
             'message': '报告生成成功',
-            'data': {
-                'report_id': str(report.id),
-                'status': report.status,
-                'created_at': report.created_at
-            }
-        }, status=status.HTTP_201_CREATED)
+            'data': new_report_response_data(report)
+        }, status.HTTP_201_CREATED)
 
-    except User.DoesNotExist:
-        return Response({
-            'code': 404,
-            'message': '指定的学生不存在'
-        }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        # 如果报告已创建，更新状态为失败
         if 'report' in locals():
             report.status = 'failed'
             report.report_content = f'生成失败：{str(e)}'
-            report.save()
+            await report.asave()
 
-        return Response({
+        return json_response({
             'code': 500,
             'message': f'报告生成失败：{str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def report_stream_done_data(report):
+    return {
+        'report_id': str(report.id),
+        'status': report.status,
+        'content_phase': report.content_phase,
+        'mode': 'delta' if report.base_report_id else 'full'
+    }
+
+
+@extend_schema(
+    request=LearningReportCreateSerializer,
+    responses={
+        200: OpenApiResponse(description="text/event-stream：report、chunk、error、done 事件"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="流式生成学习报告：先推送统计数据与本地统计报告，再逐段推送AI生成的Markdown，"
+                "生成结束后保存报告内容"
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def generate_report_stream(request):
+    """流式生成学习报告（SSE）"""
+    serializer = LearningReportCreateSerializer(
+        data=request.data,
+        context={'request': request}
+    )
+
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    student, error_response = resolve_report_student(request, serializer.validated_data)
+    if error_response is not None:
+        return error_response
+
+    period = serializer.validated_data['period']
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+
+    start_time, end_time = get_time_range(period)
+    fingerprint = data_fingerprint(
+        start_time, end_time, period, subjects, student=student, mode=serializer.validated_data['mode']
+    )
+    if not serializer.validated_data['force']:
+        existing = find_reusable_report(student, fingerprint)
+        # 正在后台生成的报告没有可推送的内容，只复用已完成的报告
+        if existing is not None and existing.status == 'completed':
+            return event_stream_response(stream_existing_report(
+                reused_report_response_data(existing),
+                existing.report_content,
+                report_stream_done_data(existing)
+            ))
+
+    base_report = None
+    if serializer.validated_data['mode'] == 'delta':
+        base_report = find_delta_base(student, period, subjects)
+
+    data, statistics = prepare_report_context(student, period, subjects)
+    report = LearningReport(
+        student=student,
+        generated_by=request.user,
+        period=period,
+        subjects=subjects,
+        status='generating',
+        content_phase='local',
+        report_content=generate_simple_report(student, period, subjects, statistics, data),
+        data_fingerprint=fingerprint,
+        base_report=base_report
+    )
+    apply_report_statistics(report, statistics)
+    report.save()
+
+    prompt = None
+    if base_report is not None:
+        try:
+            prompt = build_delta_prompt(student, base_report, statistics, period, subjects)
+        except Exception as e:
+            logger.warning(f"增量提示词构建失败，改为完整生成: {e}")
+            report.base_report = None
+    if prompt is None:
+        prompt = build_report_prompt(student, data, statistics, period, subjects)
+
+    def on_complete(content):
+        report.report_content = content
+        report.content_phase = 'ai'
+        report.status = 'completed'
+        report.save(update_fields=['report_content', 'content_phase', 'status', 'base_report', 'updated_at'])
+        publish_progress(report, 'completed', 100)
+        return report_stream_done_data(report)
+
+    def on_error(error):
+        # AI生成失败时保留本地统计报告
+        report.status = 'completed'
+        report.base_report = None
+        report.save(update_fields=['status', 'base_report', 'updated_at'])
+        publish_progress(report, 'completed', 100, error=str(error))
+        return report_stream_done_data(report)
+
+    return event_stream_response(stream_report(
+        new_report_response_data(report, include_content=True), prompt, on_complete, on_error
+    ))
 
 
 @extend_schema(
@@ -657,11 +1030,8 @@ def generate_report(request):
 @permission_classes([permissions.IsAuthenticated])
 def list_reports(request):
     """获取报告列表"""
-    # 学生只能看到自己的报告，教师可以看到所有报告
-    if request.user.role == 'student':
-        reports = LearningReport.objects.filter(student=request.user)
-    else:  # teacher
-        reports = LearningReport.objects.all()
+    # 学生只能看到自己的报告，教师看到所教课程学生的报告
+    reports = visible_learning_reports(request.user)
     
     # 获取查询参数
     page = int(request.GET.get('page', 1))
@@ -718,13 +1088,15 @@ def get_report_detail(request, report_id):
     """获取学习报告详情"""
     report = get_object_or_404(LearningReport, id=report_id)
 
-    # 权限检查：学生只能查看自己的报告，教师可以查看所有报告
-    if request.user.role == 'student' and report.student != request.user:
+    # 权限检查：学生只能查看自己的报告，教师只能查看所教课程学生的报告
+    if not visible_learning_reports(request.user).filter(id=report.id).exists():
         return Response({
             'code': 403,
-            'message': '权限不足，只能查看自己的报告'
+            'message': '权限不足，只能查看自己的报告' if request.user.role == 'student' else '权限不足，该学生不在您的课程中'
         }, status=status.HTTP_403_FORBIDDEN)
 
+    expire_stale_report(report)
+
     serializer = LearningReportDetailSerializer(report)
     return Response({
         'code': 200,
@@ -733,176 +1105,43 @@ def get_report_detail(request, report_id):
     }, status=status.HTTP_200_OK)
 
 
-def collect_class_data(period, subjects):
-    """收集班级数据"""
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    # 获取时间范围
-    start_time, end_time = get_time_range(period)
-    
-    # 获取所有学生
-    students = User.objects.filter(role='student')
-    
-    # 直接查询所有相关数据，而不是逐个学生收集
-    all_assignments = []
-    all_submissions = []
-    all_qa_sessions = []
-    all_old_qa_questions = []
-    
-    # 构建查询条件
-    assignment_filter = Q(created_at__gte=start_time, created_at__lte=end_time)
-    qa_filter = Q(created_at__gte=start_time, created_at__lte=end_time)
+def class_assignments(teacher):
+    """教师班级统计范围内的作业（自己创建的与所教课程的），没有课程时返回None（不限范围）"""
+    if Assignment is None:
+        return None
+    return roster_assignments(teacher, Assignment.objects.all())
 
-    if subjects:
-        assignment_filter &= Q(subject__in=subjects)
-        qa_filter &= Q(subject__in=subjects)
 
-    # 直接查询所有作业数据
-    if Assignment is not None and Submission is not None:
-        try:
-            all_assignments = list(Assignment.objects.filter(assignment_filter))
-            all_submissions = list(Submission.objects.filter(
-                assignment__in=all_assignments,
-                student__role='student'  # 确保只查询学生的提交
-            ).select_related('assignment', 'student').prefetch_related('answers__question'))
-            pass
-        except Exception as e:
-            pass
+def collect_class_data(period, subjects, students=None, assignments=None, time_range=None):
+    """
+    收集班级数据（返回查询集，统计在数据库中分组聚合完成）
 
-    # 直接查询所有问答数据
-    if QASession is not None:
-        try:
-            all_qa_sessions = list(QASession.objects.filter(
-                student__role='student',
-                updated_at__gte=start_time,
-                updated_at__lte=end_time
-            ).select_related('student').prefetch_related('messages'))
-            if subjects:
-                all_qa_sessions = [s for s in all_qa_sessions if s.subject in subjects]
-            pass
-        except Exception as e:
-            pass
-
-    # 查询旧的QA数据
-    if QAQuestion is not None:
-        try:
-            all_old_qa_questions = list(QAQuestion.objects.filter(
-                student__role='student',
-                created_at__gte=start_time,
-                created_at__lte=end_time
-            ).select_related('student', 'answer'))
-            if subjects:
-                all_old_qa_questions = [q for q in all_old_qa_questions if q.subject in subjects]
-            pass
-        except Exception as e:
-            pass
-    
-    return {
-        'students': list(students),
-        'assignments': all_assignments,
-        'submissions': all_submissions,
-        'qa_sessions': all_qa_sessions,
-        'old_qa_questions': all_old_qa_questions,
-        'time_range': (start_time, end_time)
-    }
+    Args:
+        students: 班级学生名单查询集（教师课程的学生），为空时为全部学生
+        assignments: 班级作业范围查询集（教师课程的作业），为空时为全部作业
+        time_range: (开始时间, 结束时间)，为空时按 period 计算
+    """
+    start_time, end_time = time_range or get_time_range(period)
+    data = build_class_scope(start_time, end_time, subjects, students=students, assignments=assignments)
+    if getattr(settings, 'REPORT_DAILY_ROLLUP', False):
+        data['qa_subject_counts'] = rollup_qa_subject_counts(data)
+    else:
+        data['qa_subject_counts'] = qa_subject_counts(data)
+    data['qa_topics'] = question_topics(data) if question_topics is not None else []
+    data['knowledge_mastery'] = class_mastery(
+        subjects, students=students, limit=get_mastery_settings()['PROMPT_LIMIT']
+    )
+    return data
 
 def calculate_class_statistics(data):
     """计算班级统计数据"""
-    students = data['students']
-    submissions = data['submissions']
-    assignments = data['assignments']
-    qa_sessions = data['qa_sessions']
-    old_qa_questions = data['old_qa_questions']
-    
-    # 基础统计
-    total_students = len(students)
-    total_assignments = len(assignments)
-    total_submissions = len(submissions)
-    
-    # 完成率统计
-    completion_rate = (total_submissions / (total_students * total_assignments) * 100) if (total_students * total_assignments) > 0 else 0
-    
-    # 按学生计算平均得分率和分数分布
-    student_averages = []
-    score_distribution = {'0-60': 0, '60-70': 0, '70-80': 0, '80-90': 0, '90-100': 0}
-    
-    for student in students:
-        student_submissions = [s for s in submissions if hasattr(s, 'student') and s.student.id == student.id]
-        student_scores = []
-        
-        for submission in student_submissions:
-            if hasattr(submission, 'obtained_score') and hasattr(submission, 'assignment'):
-                score = submission.obtained_score or 0
-                max_score = getattr(submission.assignment, 'total_score', 0)
-                if max_score > 0:
-                    percentage = (score / max_score) * 100
-                    student_scores.append(percentage)
-        
-        # 计算学生平均得分率
-        if student_scores:
-            student_avg = sum(student_scores) / len(student_scores)
-            student_averages.append(student_avg)
-            
-            # 按学生平均得分率统计分布
-            if student_avg < 60:
-                score_distribution['0-60'] += 1
-            elif student_avg < 70:
-                score_distribution['60-70'] += 1
-            elif student_avg < 80:
-                score_distribution['70-80'] += 1
-            elif student_avg < 90:
-                score_distribution['80-90'] += 1
-            else:
-                score_distribution['90-100'] += 1
-    
-    # 班级平均得分率
-    average_score = sum(student_averages) / len(student_averages) if student_averages else 0
-    
-    # 学生表现统计
-    student_performance = []
-    for student in students:
-        student_submissions = [s for s in submissions if hasattr(s, 'student') and s.student.id == student.id]
-        student_scores = []
-        
-        for submission in student_submissions:
-            if hasattr(submission, 'obtained_score') and hasattr(submission, 'assignment'):
-                score = submission.obtained_score or 0
-                max_score = getattr(submission.assignment, 'total_score', 0)
-                if max_score > 0:
-                    student_scores.append((score / max_score) * 100)
-        
-        # 学生问答统计
-        student_qa_count = 0
-        if qa_sessions:
-            student_qa_count += len([q for q in qa_sessions if hasattr(q, 'student') and q.student.id == student.id])
-        if old_qa_questions:
-            student_qa_count += len([q for q in old_qa_questions if hasattr(q, 'student') and q.student.id == student.id])
-        
-        student_performance.append({
-            'student_name': student.real_name,
-            'student_id': student.student_id,
-            'completed_assignments': len(student_submissions),
-            'average_score': round(sum(student_scores) / len(student_scores), 2) if student_scores else 0,
-            'qa_count': student_qa_count
-        })
-    
-    # 问答统计
-    total_questions = len(qa_sessions) + len(old_qa_questions)
-    
-    return {
-        'total_students': total_students,
-        'total_assignments': total_assignments,
-        'total_submissions': total_submissions,
-        'completion_rate': round(completion_rate, 2),
-        'average_score': round(average_score, 2),
-        'score_distribution': score_distribution,
-        'student_performance': sorted(student_performance, key=lambda x: x['average_score'], reverse=True),
-        'total_questions': total_questions
-    }
+    # 日汇总行不区分作业，限定了课程作业范围时按提交分组聚合
+    if getattr(settings, 'REPORT_DAILY_ROLLUP', False) and not data.get('course_scoped'):
+        return compute_class_statistics_from_rollup(data)
+    return compute_class_statistics(data)
 
-def generate_class_report_content(data, statistics, period, subjects):
-    """生成班级报告内容"""
+def build_class_report_context(data, statistics, period, subjects):
+    """构建班级报告的数据上下文（不含撰写要求）"""
     start_time, end_time = data['time_range']
     
     # 构建班级数据上下文
@@ -919,25 +1158,15 @@ def generate_class_report_content(data, statistics, period, subjects):
         'qa_analysis': []
     }
     
-    # 分析高频问题
-    try:
-        question_keywords = {}
-        for session in data.get('qa_sessions', []):
-            if hasattr(session, 'subject'):
-                subject = session.subject
-                question_keywords[subject] = question_keywords.get(subject, 0) + 1
-        
-        for question in data.get('old_qa_questions', []):
-            if hasattr(question, 'subject'):
-                subject = question.subject
-                question_keywords[subject] = question_keywords.get(subject, 0) + 1
-        
-        context_data['qa_analysis'] = sorted(question_keywords.items(), key=lambda x: x[1], reverse=True)[:5]
-    except Exception as e:
-        pass
+    # 高频问题：优先使用首轮提问的主题聚类，不可用时使用按科目统计的提问次数
+    if data.get('qa_topics'):
+        qa_title = '高频问题主题（按学生首轮提问聚类，含提问数、占比、主要科目与代表性提问）'
+        context_data['qa_analysis'] = data['qa_topics']
+    else:
+        qa_title = '高频问题科目'
+        context_data['qa_analysis'] = data.get('qa_subject_counts', [])
     
-    # 构建AI提示词
-    prompt = f"""
+    context = f"""
 你是一位专业的教育分析师，请根据以下班级的整体学习数据生成一份班级分析报告。
 
 班级信息：
@@ -960,39 +1189,77 @@ def generate_class_report_content(data, statistics, period, subjects):
 需要关注的学生：
 {json.dumps(context_data['bottom_students'], ensure_ascii=False, indent=2)}
 
-高频问题科目：
+{qa_title}：
 {json.dumps(context_data['qa_analysis'], ensure_ascii=False, indent=2)}
+"""
+    if data.get('knowledge_mastery'):
+        context += f"""
+掌握最薄弱的知识点（recency_score 为学生近期得分率的平均值%，weak_student_count 为近期得分率低于{get_mastery_settings()['WEAK_THRESHOLD']}%的学生数）：
+{json.dumps([
+    {key: value for key, value in item.items() if key != 'knowledge_point_id'} for item in data['knowledge_mastery']
+], ensure_ascii=False, indent=2)}
+"""
+    return context
 
-请生成一份结构化的班级分析报告，包含以下部分：
 
-1. **班级整体表现**
-   - 整体学习状况评价
-   - 完成率和成绩分析
+def build_class_report_prompt(data, statistics, period, subjects):
+    """构建班级报告的AI提示词"""
+    return build_class_report_context(data, statistics, period, subjects) + outline_instructions(CLASS_REPORT_OUTLINE)
 
-2. **优秀表现**
-   - 表现突出的学生
-   - 值得推广的学习方法
 
-3. **需要关注的问题**
-   - 学习困难的学生
-   - 普遍存在的问题
+def generate_class_report_content(data, statistics, period, subjects):
+    """生成班级报告内容（AI调用失败时抛出异常，由调用方记录为失败报告）"""
+    if sectioned_generation_enabled():
+        context = build_class_report_context(data, statistics, period, subjects)
+        return generate_sections(context, CLASS_REPORT_OUTLINE, lambda prompt: ask_gemini(prompt, temperature=0.7))
 
-4. **常见问题汇总**
-   - 高频提问的知识点
-   - 学生普遍困惑的内容
+    prompt = build_class_report_prompt(data, statistics, period, subjects)
+    return ask_gemini(prompt, temperature=0.7)
 
-5. **教学改进建议**
-   - 针对班级情况的教学调整
-   - 具体的改进措施
 
-请用专业、客观的语言撰写报告，字数控制在800-1200字。
-"""
+async def generate_class_report_content_async(data, statistics, period, subjects):
+    """生成班级报告内容（异步）"""
+    if sectioned_generation_enabled():
+        context = build_class_report_context(data, statistics, period, subjects)
+        return await generate_sections_async(
+            context, CLASS_REPORT_OUTLINE, lambda prompt: ask_gemini_async(prompt, temperature=0.7)
+        )
 
-    try:
-        ai_response = ask_gemini(prompt, temperature=0.7)
-        return ai_response
-    except Exception as e:
-        return f"班级报告生成失败，错误信息：{str(e)}"
+    prompt = build_class_report_prompt(data, statistics, period, subjects)
+    return await ask_gemini_async(prompt, temperature=0.7)
+
+
+def find_reusable_class_report(fingerprint, teacher):
+    """查找教师可见的、数据指纹相同的近期已完成班级报告，没有时返回None"""
+    reports = visible_class_reports(teacher).filter(data_fingerprint=fingerprint, status='completed')
+    max_age = getattr(settings, 'REPORT_REUSE_MAX_AGE', None)
+    if max_age:
+        reports = reports.filter(created_at__gte=timezone.now() - timedelta(seconds=max_age))
+    return reports.order_by('-created_at').first()
+
+
+def save_class_report(user, period, subjects, fingerprint, statistics, report_content, succeeded):
+    """保存班级报告，AI生成失败的报告记为 failed，不会被复用"""
+    return ClassReport.objects.create(
+        generated_by=user,
+        period=period,
+        subjects=subjects,
+        status='completed' if succeeded else 'failed',
+        statistics=statistics,
+        report_content=report_content,
+        data_fingerprint=fingerprint
+    )
+
+
+def class_report_response_data(report, reused):
+    return {
+        'report_id': str(report.id),
+        'status': report.status,
+        'statistics': report.statistics,
+        'report_content': report.report_content,
+        'generated_at': report.created_at,
+        'reused': reused
+    }
 
 
 @api_view(['POST'])
@@ -1012,30 +1279,47 @@ def generate_class_report(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     period = serializer.validated_data['period']
-    subjects = serializer.validated_data.get('subjects', [])
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
     
     logger.info(f"验证通过 - 时间段: {period}, 科目: {subjects}")
 
     try:
-        # 收集班级数据
-        data = collect_class_data(period, subjects)
+        # 班级数据自上次生成后没有变化时直接返回已保存的报告
+        start_time, end_time = get_time_range(period)
+        roster = roster_students(request.user)
+        assignments = class_assignments(request.user)
+        fingerprint = data_fingerprint(start_time, end_time, period, subjects, students=roster, assignments=assignments)
+        if not serializer.validated_data['force']:
+            existing = find_reusable_class_report(fingerprint, request.user)
+            if existing is not None:
+                return Response({
+                    'code': 200,
+                    'message': '班级数据未变化，返回已有报告',
+                    'data': class_report_response_data(existing, reused=True)
+                }, status=status.HTTP_200_OK)
+
+        # 收集班级数据（教师所教课程的学生）
+        data = collect_class_data(period, subjects, students=roster, assignments=assignments)
 
         # 计算统计数据
         statistics = calculate_class_statistics(data)
 
         # 生成AI报告内容
-        report_content = generate_class_report_content(data, statistics, period, subjects)
+        try:
+            report_content = generate_class_report_content(data, statistics, period, subjects)
+            succeeded = True
+        except Exception as e:
+            report_content = f"班级报告生成失败，错误信息：{str(e)}"
+            succeeded = False
 
-        response_data = {
-            'statistics': statistics,
-            'report_content': report_content,
-            'generated_at': timezone.now()
-        }
+        report = save_class_report(
+            request.user, period, subjects, fingerprint, statistics, report_content, succeeded
+        )
 
         return Response({
             'code': 200,
             'message': '班级报告生成成功',
-            'data': response_data
+            'data': class_report_response_data(report, reused=False)
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -1046,3 +1330,557 @@ def generate_class_report(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@async_api_view(['POST'], permission_classes=[IsTeacher])
+async def generate_class_report_async(request):
+    """生成班级报告（异步版本）"""
+    serializer = ClassReportCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return json_response({
+            'code': 400,
+            'message': '参数错误',
+            'errors': serializer.errors
+        }, status.HTTP_400_BAD_REQUEST)
+
+    period = serializer.validated_data['period']
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+
+    try:
+        start_time, end_time = get_time_range(period)
+        roster = await sync_to_async(roster_students)(request.user)
+        assignments = await sync_to_async(class_assignments)(request.user)
+        fingerprint = await sync_to_async(data_fingerprint)(
+            start_time, end_time, period, subjects, students=roster, assignments=assignments
+        )
+        if not serializer.validated_data['force']:
+            existing = await sync_to_async(find_reusable_class_report)(fingerprint, request.user)
+            if existing is not None:
+                return json_response({
+                    'code': 200,
+                    'message': '班级数据未变化，返回已有报告',
+                    'data': class_report_response_data(existing, reused=True)
+                })
+
+        # 数据收集与统计涉及大量同步ORM查询，放到同步线程中执行
+        data = await sync_to_async(collect_class_data)(period, subjects, students=roster, assignments=assignments)
+        statistics = await sync_to_async(calculate_class_statistics)(data)
+
+        try:
+            report_content = await generate_class_report_content_async(data, statistics, period, subjects)
+            succeeded = True
+        except Exception as e:
+            report_content = f"班级报告生成失败，错误信息：{str(e)}"
+            succeeded = False
+
+        report = await sync_to_async(save_class_report)(
+            request.user, period, subjects, fingerprint, statistics, report_content, succeeded
+        )
+
+        return json_response({
+            'code': 200,
+            'message': '班级报告生成成功',
+            'data': class_report_response_data(report, reused=False)
+        })
+
+    except Exception as e:
+        logger.error(f"班级报告生成异常: {str(e)}")
+        return json_response({
+            'code': 500,
+            'message': f'班级报告生成失败：{str(e)}'
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@extend_schema(
+    request=ClassReportCreateSerializer,
+    responses={
+        200: OpenApiResponse(description="text/event-stream：report、chunk、error、done 事件"),
+        400: OpenApiResponse(description="参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="流式生成班级报告：先推送班级统计数据，再逐段推送AI生成的Markdown，生成结束后保存报告"
+)
+@api_view(['POST'])
+@permission_classes([IsTeacher])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def generate_class_report_stream(request):
+    """流式生成班级报告（SSE）"""
+    serializer = ClassReportCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    period = serializer.validated_data['period']
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+
+    start_time, end_time = get_time_range(period)
+    roster = roster_students(request.user)
+    assignments = class_assignments(request.user)
+    fingerprint = data_fingerprint(start_time, end_time, period, subjects, students=roster, assignments=assignments)
+    if not serializer.validated_data['force']:
+        existing = find_reusable_class_report(fingerprint, request.user)
+        if existing is not None:
+            data = class_report_response_data(existing, reused=True)
+            content = data.pop('report_content')
+            return event_stream_response(stream_existing_report(
+                data, content, {'report_id': str(existing.id), 'status': existing.status}
+            ))
+
+    data = collect_class_data(period, subjects, students=roster, assignments=assignments)
+    statistics = calculate_class_statistics(data)
+    prompt = build_class_report_prompt(data, statistics, period, subjects)
+
+    def save(report_content, succeeded):
+        report = save_class_report(
+            request.user, period, subjects, fingerprint, statistics, report_content, succeeded
+        )
+        return {'report_id': str(report.id), 'status': report.status, 'generated_at': report.created_at}
+
+    return event_stream_response(stream_report(
+        {'statistics': statistics, 'reused': False},
+        prompt,
+        lambda content: save(content, True),
+        lambda error: save(f"班级报告生成失败，错误信息：{str(error)}", False)
+    ))
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('page', int, description='页码'),
+        OpenApiParameter('page_size', int, description='每页数量'),
+        OpenApiParameter('status', str, description='状态筛选'),
+        OpenApiParameter('period', str, description='时间段筛选'),
+    ],
+    responses={
+        200: OpenApiResponse(description="获取成功"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="获取班级报告列表（仅教师）"
+)
+@api_view(['GET'])
+@permission_classes([IsTeacher])
+def list_class_reports(request):
+    """获取班级报告列表"""
+    page = int(request.GET.get('page', 1))
+    page_size = int(request.GET.get('page_size', 10))
+    status_filter = request.GET.get('status', None)
+    period_filter = request.GET.get('period', None)
+
+    queryset = visible_class_reports(request.user)
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    if period_filter:
+        queryset = queryset.filter(period=period_filter)
+
+    # 分页
+    total = queryset.count()
+    start = (page - 1) * page_size
+    end = start + page_size
+    reports = queryset.select_related('generated_by')[start:end]
+
+    serializer = ClassReportListSerializer(reports, many=True)
+
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'reports': serializer.data,
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total': total,
+                'total_pages': (total + page_size - 1) // page_size
+            }
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    responses={
+        200: ClassReportDetailSerializer,
+        404: OpenApiResponse(description="报告不存在"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="获取班级报告详情（仅教师）"
+)
+@api_view(['GET'])
+@permission_classes([IsTeacher])
+def get_class_report_detail(request, report_id):
+    """获取班级报告详情"""
+    report = get_object_or_404(visible_class_reports(request.user).select_related('generated_by'), id=report_id)
+
+    serializer = ClassReportDetailSerializer(report)
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': serializer.data
+    }, status=status.HTTP_200_OK)
+
+
+def find_reusable_student_ids(fingerprints):
+    """{学生ID: 指纹} 中已有相同指纹近期报告的学生ID集合"""
+    reports = reusable_reports().filter(
+        student_id__in=list(fingerprints),
+        data_fingerprint__in=set(fingerprints.values())
+    ).values_list('student_id', 'data_fingerprint')
+    return {student_id for student_id, fingerprint in reports if fingerprints.get(student_id) == fingerprint}
+
+
+@extend_schema(
+    request=ReportBatchCreateSerializer,
+    responses={
+        202: OpenApiResponse(description="批量生成任务已提交"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="批量生成学习报告：为指定学生（默认全部学生）各生成一份个人报告，"
+                "通过任务详情接口轮询或订阅 batch_progress 事件获取进度"
+)
+@api_view(['POST'])
+@permission_classes([IsTeacher])
+def generate_report_batch(request):
+    """批量生成学习报告"""
+    serializer = ReportBatchCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    period = serializer.validated_data['period']
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+    requested_ids = serializer.validated_data.get('student_ids')
+
+    try:
+        students = visible_students(request.user)
+        if requested_ids:
+            students = students.filter(id__in=requested_ids)
+        student_ids = list(students.order_by('student_id').values_list('id', flat=True))
+        if not student_ids:
+            return Response({
+                'code': 400,
+                'message': '没有可生成报告的学生'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 数据未变化、已有报告的学生跳过
+        start_time, end_time = get_time_range(period)
+        fingerprints = student_fingerprints(start_time, end_time, period, subjects, student_ids)
+        reused = set() if serializer.validated_data['force'] else find_reusable_student_ids(fingerprints)
+        targets = [student_id for student_id in student_ids if student_id not in reused]
+
+        with transaction.atomic():
+            batch = ReportBatch.objects.create(
+                created_by=request.user,
+                period=period,
+                subjects=subjects,
+                status='generating' if targets else 'completed',
+                total_count=len(targets),
+                reused_count=len(reused)
+            )
+            LearningReport.objects.bulk_create([
+                LearningReport(
+                    student_id=student_id,
+                    generated_by=request.user,
+                    period=period,
+                    subjects=subjects,
+                    status='generating',
+                    data_fingerprint=fingerprints[student_id],
+                    batch=batch
+                )
+                for student_id in targets
+            ], batch_size=500)
+            if targets:
+                enqueue_batch(batch.id)
+
+        return Response({
+            'code': 202,
+            'message': f'批量生成任务已提交，共 {len(targets)} 份报告',
+            'data': ReportBatchSerializer(batch).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    except Exception as e:
+        logger.error(f"批量报告任务创建失败: {str(e)}")
+        return Response({
+            'code': 500,
+            'message': f'批量生成任务创建失败：{str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@extend_schema(
+    responses={
+        200: ReportBatchSerializer,
+        404: OpenApiResponse(description="任务不存在"),
+        403: OpenApiResponse(description="权限不足"),
+    },
+    description="获取批量学习报告任务详情（含各学生报告状态）"
+)
+@api_view(['GET'])
+@permission_classes([IsTeacher])
+def get_report_batch_detail(request, batch_id):
+    """获取批量学习报告任务详情"""
+    batch = get_object_or_404(visible_report_batches(request.user).select_related('created_by'), id=batch_id)
+    expire_stale_batch(batch)
+
+    reports = batch.reports.filter(
+        id__in=visible_learning_reports(request.user).values('id')
+    ).select_related('student', 'generated_by').order_by('student__student_id')
+    data = ReportBatchSerializer(batch).data
+    data['reports'] = LearningReportListSerializer(reports, many=True).data
+
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': data
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=None,
+    responses={
+        202: OpenApiResponse(description="重试任务已提交"),
+        400: OpenApiResponse(description="任务正在生成或没有失败的报告"),
+        404: OpenApiResponse(description="任务不存在"),
+    },
+    description="重新生成批量任务中失败的报告"
+)
+@api_view(['POST'])
+@permission_classes([IsTeacher])
+def retry_report_batch(request, batch_id):
+    """重试批量任务中失败的报告"""
+    batch = get_object_or_404(visible_report_batches(request.user).select_related('created_by'), id=batch_id)
+    expire_stale_batch(batch)
+
+    if batch.status == 'generating':
+        return Response({
+            'code': 400,
+            'message': '任务正在生成中，请稍后再试'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        retried = batch.reports.filter(status='failed').update(
+            status='generating', report_content='', updated_at=timezone.now()
+        )
+        if not retried:
+            return Response({
+                'code': 400,
+                'message': '没有失败的报告'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        batch.failed_count = max(batch.failed_count - retried, 0)
+        batch.status = 'generating'
+        batch.save(update_fields=['failed_count', 'status', 'updated_at'])
+        enqueue_batch(batch.id)
+
+    return Response({
+        'code': 202,
+        'message': f'已重新提交 {retried} 份失败的报告',
+        'data': ReportBatchSerializer(batch).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('granularity', str, description='分桶粒度：day|week|month（默认week）'),
+        OpenApiParameter('period', str, description='时间段：week|month|semester|all（默认month）'),
+        OpenApiParameter('subjects', str, many=True, description='科目筛选，可重复传入'),
+        OpenApiParameter('student_id', str, description='学生ID（教师可选，不传时为全班趋势）'),
+    ],
+    responses={
+        200: OpenApiResponse(description="获取成功"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+        404: OpenApiResponse(description="学生不存在"),
+    },
+    description="获取学习趋势：按天/周/月统计提交数、平均得分率与提问数，不调用AI"
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_learning_trends(request):
+    """获取学习趋势（学生只能查看自己，教师可查看指定学生或全班）"""
+    serializer = LearningTrendQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    student_id = serializer.validated_data.get('student_id')
+    roster = None
+    if request.user.role == 'teacher':
+        student = None
+        roster = roster_students(request.user)
+        if student_id:
+            try:
+                student = visible_students(request.user).get(id=student_id)
+            except User.DoesNotExist:
+                return Response({
+                    'code': 404,
+                    'message': '指定的学生不存在'
+                }, status=status.HTTP_404_NOT_FOUND)
+    else:
+        if student_id and student_id != request.user.id:
+            return Response({
+                'code': 403,
+                'message': '权限不足，只能查看自己的学习趋势'
+            }, status=status.HTTP_403_FORBIDDEN)
+        student = request.user
+
+    granularity = serializer.validated_data['granularity']
+    period = serializer.validated_data['period']
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+    start_time, end_time = get_time_range(period)
+    series = get_trend_series(
+        start_time, end_time, granularity, period, subjects, student=student,
+        students=roster if student is None else None
+    )
+
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'granularity': granularity,
+            'period': period,
+            'subjects': subjects,
+            'student_id': str(student.id) if student is not None else None,
+            'series': series
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('period', str, description='时间段：week|month|semester|all（默认all，按作业创建时间筛选）'),
+        OpenApiParameter('subjects', str, many=True, description='科目筛选，可重复传入'),
+    ],
+    responses={
+        200: OpenApiResponse(description="获取成功"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+        503: OpenApiResponse(description="分析服务不可用"),
+    },
+    description="班级成绩分析（仅教师）：分位数、标准差、分数段分布与学生排名，基于内存中的列式成绩快照计算"
+)
+@api_view(['GET'])
+@permission_classes([IsTeacher])
+def get_class_analytics(request):
+    """班级成绩分析看板数据"""
+    if get_score_snapshot is None:
+        return Response({
+            'code': 503,
+            'message': '成绩分析服务不可用（未安装numpy）'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    serializer = ClassAnalyticsQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    period = serializer.validated_data['period']
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+    start_time, end_time = get_time_range(period)
+
+    # 加入课程的教师只统计所教课程的学生与作业
+    roster = roster_students(request.user)
+    student_ids = list(roster.values_list('id', flat=True)) if roster is not None else None
+    assignments = class_assignments(request.user)
+    assignment_ids = list(assignments.values_list('id', flat=True)) if assignments is not None else None
+
+    snapshot = get_score_snapshot()
+    snapshot.refresh()
+    summary = snapshot.class_summary(
+        start_time, end_time, subjects, student_ids=student_ids, assignment_ids=assignment_ids
+    )
+
+    # 补充学生姓名与学号
+    profiles = {
+        user['id']: user
+        for user in User.objects.filter(id__in=[row['student_id'] for row in summary['students']])
+        .values('id', 'real_name', 'student_id')
+    }
+    for row in summary['students']:
+        profile = profiles.get(row['student_id'], {})
+        row['student_name'] = profile.get('real_name', '')
+        row['student_id_number'] = profile.get('student_id', '')
+        row['student_id'] = str(row['student_id'])
+
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'period': period,
+            'subjects': subjects,
+            **summary
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('subjects', str, many=True, description='科目筛选，可重复传入'),
+        OpenApiParameter('student_id', str, description='学生ID（教师可选，不传时为全班各知识点的掌握度）'),
+    ],
+    responses={
+        200: OpenApiResponse(description="获取成功"),
+        400: OpenApiResponse(description="请求参数错误"),
+        403: OpenApiResponse(description="权限不足"),
+        404: OpenApiResponse(description="学生不存在"),
+    },
+    description="获取知识点掌握度：直接读取由已批改答案增量维护的掌握度表，不调用AI"
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_knowledge_mastery(request):
+    """获取知识点掌握度（学生只能查看自己，教师可查看指定学生或全班）"""
+    serializer = KnowledgeMasteryQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response({
+            'code': 400,
+            'message': '请求参数错误',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    student_id = serializer.validated_data.get('student_id')
+    subjects = normalize_subjects(serializer.validated_data.get('subjects', []))
+    if request.user.role == 'teacher':
+        if not student_id:
+            return Response({
+                'code': 200,
+                'message': '获取成功',
+                'data': {
+                    'subjects': subjects,
+                    'student_id': None,
+                    'weak_threshold': get_mastery_settings()['WEAK_THRESHOLD'],
+                    'knowledge_points': class_mastery(subjects, students=roster_students(request.user))
+                }
+            }, status=status.HTTP_200_OK)
+        try:
+            student = visible_students(request.user).get(id=student_id)
+        except User.DoesNotExist:
+            return Response({
+                'code': 404,
+                'message': '指定的学生不存在'
+            }, status=status.HTTP_404_NOT_FOUND)
+    else:
+        if student_id and student_id != request.user.id:
+            return Response({
+                'code': 403,
+                'message': '权限不足，只能查看自己的知识点掌握度'
+            }, status=status.HTTP_403_FORBIDDEN)
+        student = request.user
+
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'subjects': subjects,
+            'student_id': str(student.id),
+            'weak_threshold': get_mastery_settings()['WEAK_THRESHOLD'],
+            'knowledge_points': student_mastery(student, subjects)
+        }
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+同步/异步AI调用并发基准测试
+
+使用模拟的慢速Gemini后端（固定延迟），比较：
+- threads: 同步 generate_text + 线程池（对应WSGI下每个请求占用一个工作线程）
+- async:   generate_text_async + asyncio（对应ASGI异步视图）
+
+每个测试点在独立子进程中运行以测量峰值内存（RSS），
+最后给出在固定内存预算下两种方式可同时承载的在途请求数。
+
+用法：
+    python tests/bench_async_ai.py --delay 2 --levels 50 100 200 400 --memory-budget 200
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GOOGLE_AI_API_KEY', 'benchmark-fake-key')
+
+
+class FakeResponse:
+    """模拟的Gemini响应"""
+    text = "这是一个模拟的AI回答。"
+
+
+def install_fake_backend(delay):
+    """用固定延迟的模拟模型替换 genai.GenerativeModel"""
+    import ai_services
+
+    class FakeGenerativeModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, content, generation_config=None, stream=False):
+            time.sleep(delay)
+            return FakeResponse()
+
+        async def generate_content_async(self, content, generation_config=None, stream=False):
+            await asyncio.sleep(delay)
+            return FakeResponse()
+
+    ai_services.genai.GenerativeModel = FakeGenerativeModel
+    return ai_services.GeminiAIService()
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 下单位为KB，macOS 下为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_threads(service, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(service.generate_text, f"问题 {i}")
+            for i in range(concurrency)
+        ]
+        return [future.result() for future in futures]
+
+
+def run_async(service, concurrency):
+    async def main():
+        return await asyncio.gather(*[
+            service.generate_text_async(f"问题 {i}")
+            for i in range(concurrency)
+        ])
+    return asyncio.run(main())
+
+
+def run_single(mode, concurrency, delay):
+    """子进程入口：运行一个测试点并输出JSON结果"""
+    service = install_fake_backend(delay)
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'threads':
+        results = run_threads(service, concurrency)
+    else:
+        results = run_async(service, concurrency)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'concurrency': concurrency,
+        'completed': len(results),
+        'elapsed': elapsed,
+        'baseline_mb': baseline,
+        'peak_mb': peak_rss_mb(),
+    }))
+
+
+def run_point(mode, concurrency, delay):
+    output = subprocess.run(
+        [sys.executable, __file__, '--single', mode, str(concurrency), '--delay', str(delay)],
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步/异步AI调用并发基准测试")
+    parser.add_argument('--delay', type=float, default=2.0, help='模拟的单次AI调用延迟（秒）')
+    parser.add_argument('--levels', type=int, nargs='+', default=[50, 100, 200, 400, 800],
+                        help='测试的并发在途请求数')
+    parser.add_argument('--memory-budget', type=float, default=200.0, help='单进程内存预算（MB）')
+    parser.add_argument('--single', nargs=2, metavar=('MODE', 'CONCURRENCY'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single[0], int(args.single[1]), args.delay)
+        return
+
+    print("=== 同步/异步AI调用并发基准测试 ===")
+    print(f"模拟AI延迟: {args.delay}s, 内存预算: {args.memory_budget}MB\n")
+    print(f"{'模式':<8}{'并发数':>8}{'耗时(s)':>10}{'吞吐(req/s)':>14}{'峰值内存(MB)':>16}{'每请求(KB)':>12}")
+
+    best = {'threads': 0, 'async': 0}
+    estimates = {}
+    for concurrency in args.levels:
+        for mode in ('threads', 'async'):
+            result = run_point(mode, concurrency, args.delay)
+            per_request_kb = (result['peak_mb'] - result['baseline_mb']) * 1024 / concurrency
+            print(
+                f"{mode:<8}{concurrency:>8}{result['elapsed']:>10.2f}"
+                f"{concurrency / result['elapsed']:>14.1f}{result['peak_mb']:>16.1f}{per_request_kb:>12.1f}"
+            )
+            if result['peak_mb'] <= args.memory_budget:
+                best[mode] = max(best[mode], concurrency)
+            if per_request_kb > 0:
+                estimates[mode] = int((args.memory_budget - result['baseline_mb']) * 1024 / per_request_kb)
+
+    print(f"\n在 {args.memory_budget}MB 内存预算下可承载的在途请求数：")
+    for mode, concurrency in best.items():
+        print(f"- {mode}: 实测 {concurrency}，按单请求内存外推约 {estimates.get(mode, '-')}")
+
+
+if __name__ == "__main__":
+    main()
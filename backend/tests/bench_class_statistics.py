@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+班级统计基准测试
+
+在独立的临时SQLite数据库中生成 学生数 × 作业数 的提交数据，比较：
+- legacy: 原实现（加载全部提交及答案到内存，逐个学生扫描提交列表）
+- sql:    reports.statistics 中的分组聚合实现
+每种实现在独立子进程中运行以测量峰值内存（RSS），并校验两者结果一致。
+
+原实现的复杂度为 O(学生数 × 提交数)，规模较大时可用 --legacy-sample 只对前N名学生
+运行逐学生扫描部分，再按学生数线性外推耗时。
+
+用法：
+    python tests/bench_class_statistics.py --students 5000 --assignments 200 --legacy-sample 200
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ai_tutor_system.settings')
+os.environ.setdefault('GOOGLE_AI_API_KEY', 'benchmark-fake-key')
+
+
+def setup_django(db_path):
+    """使用指定的SQLite文件初始化Django"""
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+
+    import django
+    django.setup()
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 下单位为KB，macOS 下为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def populate(students, assignments, submit_rate, seed=42):
+    """生成基准数据"""
+    from django.core.management import call_command
+    from accounts.models import User
+    from assignments.models import Assignment, Submission
+    from qa.models import QASession, QAQuestion
+    from django.utils import timezone
+
+    call_command('migrate', verbosity=0)
+    rng = random.Random(seed)
+
+    teacher = User.objects.create(username='bench_teacher', role='teacher', real_name='基准教师')
+    student_objs = User.objects.bulk_create([
+        User(username=f'bench_s{i}', role='student', real_name=f'学生{i}', student_id=f'S{i:06d}', password='!')
+        for i in range(students)
+    ], batch_size=1000)
+
+    subjects = ['数学', '物理', '化学', '英语']
+    deadline = timezone.now() + timezone.timedelta(days=7)
+    assignment_objs = Assignment.objects.bulk_create([
+        Assignment(
+            title=f'作业{i}', description='基准测试', subject=subjects[i % len(subjects)],
+            created_by=teacher, deadline=deadline, total_score=rng.choice([50, 100, 120])
+        )
+        for i in range(assignments)
+    ])
+
+    batch = []
+    total = 0
+    for assignment in assignment_objs:
+        for student in student_objs:
+            if rng.random() >= submit_rate:
+                continue
+            batch.append(Submission(
+                assignment=assignment, student=student, status='graded',
+                obtained_score=rng.randint(0, assignment.total_score)
+            ))
+            if len(batch) >= 20000:
+                Submission.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+    Submission.objects.bulk_create(batch)
+    total += len(batch)
+
+    QASession.objects.bulk_create([
+        QASession(student=rng.choice(student_objs), subject=rng.choice(subjects))
+        for _ in range(students * 2)
+    ], batch_size=5000)
+    QAQuestion.objects.bulk_create([
+        QAQuestion(student=rng.choice(student_objs), subject=rng.choice(subjects), question_text='问题')
+        for _ in range(students)
+    ], batch_size=5000)
+    return total
+
+
+# ---------------- 原实现（保留用于对比） ----------------
+
+def legacy_collect_class_data(start_time, end_time, subjects):
+    from django.db.models import Q
+    from accounts.models import User
+    from assignments.models import Assignment, Submission
+    from qa.models import QASession, QAQuestion
+
+    students = User.objects.filter(role='student')
+    assignment_filter = Q(created_at__gte=start_time, created_at__lte=end_time)
+    if subjects:
+        assignment_filter &= Q(subject__in=subjects)
+
+    all_assignments = list(Assignment.objects.filter(assignment_filter))
+    all_submissions = list(Submission.objects.filter(
+        assignment__in=all_assignments,
+        student__role='student'
+    ).select_related('assignment', 'student').prefetch_related('answers__question'))
+
+    all_qa_sessions = list(QASession.objects.filter(
+        student__role='student',
+        updated_at__gte=start_time,
+        updated_at__lte=end_time
+    ).select_related('student').prefetch_related('messages'))
+    if subjects:
+        all_qa_sessions = [s for s in all_qa_sessions if s.subject in subjects]
+
+    all_old_qa_questions = list(QAQuestion.objects.filter(
+        student__role='student',
+        created_at__gte=start_time,
+        created_at__lte=end_time
+    ).select_related('student', 'answer'))
+    if subjects:
+        all_old_qa_questions = [q for q in all_old_qa_questions if q.subject in subjects]
+
+    return {
+        'students': list(students),
+        'assignments': all_assignments,
+        'submissions': all_submissions,
+        'qa_sessions': all_qa_sessions,
+        'old_qa_questions': all_old_qa_questions,
+    }
+
+
+def legacy_calculate_class_statistics(data, sample=None):
+    students = data['students']
+    submissions = data['submissions']
+    assignments = data['assignments']
+    qa_sessions = data['qa_sessions']
+    old_qa_questions = data['old_qa_questions']
+    scanned_students = students[:sample] if sample else students
+
+    total_students = len(students)
+    total_assignments = len(assignments)
+    total_submissions = len(submissions)
+    completion_rate = (total_submissions / (total_students * total_assignments) * 100) if (total_students * total_assignments) > 0 else 0
+
+    student_averages = []
+    score_distribution = {'0-60': 0, '60-70': 0, '70-80': 0, '80-90': 0, '90-100': 0}
+    for student in scanned_students:
+        student_submissions = [s for s in submissions if s.student.id == student.id]
+        student_scores = []
+        for submission in student_submissions:
+            score = submission.obtained_score or 0
+            max_score = submission.assignment.total_score
+            if max_score > 0:
+                student_scores.append((score / max_score) * 100)
+        if student_scores:
+            # 与 reports.statistics 相同的口径：先保留9位小数消除浮点累加误差，再分段和四舍五入
+            student_avg = round(sum(student_scores) / len(student_scores), 9)
+            student_averages.append(student_avg)
+            if student_avg < 60:
+                score_distribution['0-60'] += 1
+            elif student_avg < 70:
+                score_distribution['60-70'] += 1
+            elif student_avg < 80:
+                score_distribution['70-80'] += 1
+            elif student_avg < 90:
+                score_distribution['80-90'] += 1
+            else:
+                score_distribution['90-100'] += 1
+
+    average_score = sum(student_averages) / len(student_averages) if student_averages else 0
+
+    student_performance = []
+    for student in scanned_students:
+        student_submissions = [s for s in submissions if s.student.id == student.id]
+        student_scores = []
+        for submission in student_submissions:
+            score = submission.obtained_score or 0
+            max_score = submission.assignment.total_score
+            if max_score > 0:
+                student_scores.append((score / max_score) * 100)
+        student_qa_count = len([q for q in qa_sessions if q.student.id == student.id])
+        student_qa_count += len([q for q in old_qa_questions if q.student.id == student.id])
+        student_performance.append({
+            'student_name': student.real_name,
+            'student_id': student.student_id,
+            'completed_assignments': len(student_submissions),
+            'average_score': round(round(sum(student_scores) / len(student_scores), 9), 2) if student_scores else 0,
+            'qa_count': student_qa_count
+        })
+
+    return {
+        'total_students': total_students,
+        'total_assignments': total_assignments,
+        'total_submissions': total_submissions,
+        'completion_rate': round(completion_rate, 2),
+        'average_score': round(average_score, 2),
+        'score_distribution': score_distribution,
+        'student_performance': sorted(student_performance, key=lambda x: x['average_score'], reverse=True),
+        'total_questions': len(qa_sessions) + len(old_qa_questions)
+    }
+
+
+# ---------------- 子进程入口 ----------------
+
+def run_single(mode, db_path, sample):
+    setup_django(db_path)
+    from reports.views import get_time_range
+    start_time, end_time = get_time_range('month')
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        data = legacy_collect_class_data(start_time, end_time, [])
+        collect_elapsed = time.perf_counter() - start
+        statistics = legacy_calculate_class_statistics(data, sample=sample)
+        elapsed = time.perf_counter() - start
+        if sample and sample < statistics['total_students']:
+            # 逐学生扫描部分按学生数线性外推
+            scan_elapsed = elapsed - collect_elapsed
+            elapsed = collect_elapsed + scan_elapsed * statistics['total_students'] / sample
+    else:
+        from reports.statistics import build_class_scope, compute_class_statistics
+        statistics = compute_class_statistics(build_class_scope(start_time, end_time, []))
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'elapsed': elapsed,
+        'baseline_mb': baseline,
+        'peak_mb': peak_rss_mb(),
+        'statistics': statistics,
+    }, ensure_ascii=False))
+
+
+def run_point(mode, db_path, sample):
+    command = [sys.executable, __file__, '--single', mode, '--db', db_path]
+    if sample:
+        command += ['--legacy-sample', str(sample)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(legacy, sql, sample):
+    """校验两种实现的结果一致（抽样运行时只比较汇总项）"""
+    keys = ['total_students', 'total_assignments', 'total_submissions', 'completion_rate', 'total_questions']
+    if not sample:
+        keys += ['average_score', 'score_distribution']
+    mismatched = [key for key in keys if legacy[key] != sql[key]]
+
+    if not sample:
+        legacy_rows = {row['student_id']: row for row in legacy['student_performance']}
+        for row in sql['student_performance']:
+            if legacy_rows.get(row['student_id']) != row:
+                mismatched.append(f"student_performance[{row['student_id']}]")
+                break
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="班级统计基准测试")
+    parser.add_argument('--students', type=int, default=5000, help='学生数')
+    parser.add_argument('--assignments', type=int, default=200, help='作业数')
+    parser.add_argument('--submit-rate', type=float, default=0.9, help='提交率')
+    parser.add_argument('--legacy-sample', type=int, default=0,
+                        help='原实现只扫描前N名学生并外推耗时（0表示全部）')
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--single', metavar='MODE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single, args.db, args.legacy_sample)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+
+        print("=== 班级统计基准测试 ===")
+        print(f"学生数: {args.students}, 作业数: {args.assignments}, 提交率: {args.submit_rate}")
+        start = time.perf_counter()
+        setup_django(db_path)
+        total = populate(args.students, args.assignments, args.submit_rate)
+        print(f"生成 {total} 条提交，用时 {time.perf_counter() - start:.1f}s\n")
+
+        results = {mode: run_point(mode, db_path, args.legacy_sample) for mode in ('legacy', 'sql')}
+
+    print(f"{'实现':<8}{'耗时(s)':>12}{'峰值内存(MB)':>16}{'增量内存(MB)':>16}")
+    for mode, result in results.items():
+        note = '（外推）' if mode == 'legacy' and args.legacy_sample else ''
+        print(
+            f"{mode:<8}{result['elapsed']:>12.2f}{result['peak_mb']:>16.1f}"
+            f"{result['peak_mb'] - result['baseline_mb']:>16.1f}{note}"
+        )
+
+    legacy, sql = results['legacy'], results['sql']
+    print(f"\n加速比: {legacy['elapsed'] / sql['elapsed']:.1f}x")
+    mismatched = compare(legacy['statistics'], sql['statistics'], args.legacy_sample)
+    print("结果一致" if not mismatched else f"结果不一致: {', '.join(mismatched)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ export interface LearningReport {
   average_score: number
   total_questions: number
   report_content: string
+  content_phase: 'local' | 'ai'  // local: 本地统计报告，ai: AI分析报告
   created_at: string
   updated_at: string
 }
@@ -34,6 +35,7 @@ export interface LearningReportListItem {
   completed_assignments: number
   average_score: number
   total_questions: number
+  content_phase: 'local' | 'ai'
   created_at: string
   updated_at: string
 }
@@ -48,6 +50,8 @@ export interface GenerateReportResponse {
   report_id: string
   status: string
   created_at: string
+  content_phase?: 'local' | 'ai'
+  report_content?: string  // 本地统计报告，AI分析在后台生成
 }
 
 export interface ClassReportRequest {
@@ -84,6 +88,29 @@ export interface ClassReportResponse {
   generated_at: string
 }
 
+export interface LearningTrendPoint {
+  bucket: string  // 桶起始日期 YYYY-MM-DD
+  submission_count: number
+  graded_count: number
+  average_score: number | null  // 没有已批改提交时为 null
+  qa_count: number
+}
+
+export interface LearningTrendParams {
+  granularity?: 'day' | 'week' | 'month'
+  period?: 'week' | 'month' | 'semester' | 'all'
+  subjects?: string[]
+  student_id?: string  // 教师可选，不传时为全班趋势
+}
+
+export interface LearningTrendResponse {
+  granularity: string
+  period: string
+  subjects: string[]
+  student_id: string | null
+  series: LearningTrendPoint[]
+}
+
 /**
  * 学习报告相关API
  */
@@ -127,6 +154,14 @@ export const reportsApi = {
    */
   generateClassReport(data: ClassReportRequest): Promise<ApiResponse<ClassReportResponse>> {
     return request.post('/reports/class/generate/', data)
+  },
+
+  /**
+   * 获取学习趋势（按天/周/月的提交数、平均得分率与提问数）
+   */
+  getTrends(params?: LearningTrendParams): Promise<ApiResponse<LearningTrendResponse>> {
+    // subjects 以重复参数传递（subjects=a&subjects=b）
+    return request.get('/reports/trends/', { params, paramsSerializer: { indexes: null } })
   }
 }
 
@@ -36,7 +36,7 @@ export const useReportsStore = defineStore('reports', () => {
     generating.value = true
     try {
       const response = await reportsApi.generateReport(data)
-      ElMessage.success('报告生成请求已提交，请稍后查看结果')
+      ElMessage.success('统计报告已生成，AI分析正在后台生成')
       
       // 重新获取报告列表
       await fetchReports()
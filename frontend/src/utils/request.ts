@@ -38,7 +38,7 @@ request.interceptors.response.use(
     // 如果是标准的API响应格式
     if (data && typeof data === 'object' && data.code !== undefined) {
       console.log('[DEBUG] 响应拦截器 - 检测到标准API格式, code:', data.code)
-      if (data.code === 200 || data.code === 201) {
+      if (data.code === 200 || data.code === 201 || data.code === 202) {
         console.log('[DEBUG] 响应拦截器 - 返回成功数据:', data)
         return data
       } else {